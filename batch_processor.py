@@ -0,0 +1,140 @@
+"""Module for running the frame processor on all recordings concurrently"""
+import argparse
+import concurrent.futures
+import contextlib
+import os
+import time
+import traceback
+from concurrent.futures.process import BrokenProcessPool
+
+import frame_processor
+from frame_writer import OUTPUT_MODE_COPY, OUTPUT_MODES
+
+LOG_DIR_LOC = './logs'
+
+
+def find_recordings(recordings_dir: str) -> list:
+    """Function returning the names of all recording folders, sorted"""
+    return sorted(
+        name for name in os.listdir(recordings_dir)
+        if os.path.isdir(os.path.join(recordings_dir, name))
+    )
+
+
+def process_recording(rec_name: str, log_dir: str, output_mode: str = OUTPUT_MODE_COPY, force: bool = False) -> tuple:
+    """Function processing a single recording inside a worker process.
+
+    Everything the frame processor prints is written to the log file of the recording,
+    and an exception is reported as a failure instead of being raised to the pool.
+
+    Returns:
+        tuple: (recording name, status, duration in seconds, log file path, ProcessingResult or None)
+    """
+    log_path = os.path.join(log_dir, rec_name + ".log")
+    start_time = time.perf_counter()
+    status = "ok"
+    result = None
+    with open(log_path, "w") as log_file, contextlib.redirect_stdout(log_file), contextlib.redirect_stderr(log_file):
+        try:
+            result = frame_processor.process_frames(os.path.join(frame_processor.REC_DIR_LOC, rec_name),
+                                                    os.path.join(frame_processor.POST_DIR_LOC, rec_name),
+                                                    output_mode=output_mode,
+                                                    force=force)
+            if result.skipped:
+                status = "skipped"
+            print("Recording \"" + rec_name + "\" processing completed: " + str(result))
+        except Exception:
+            traceback.print_exc()
+            status = "failed"
+    return (rec_name, status, time.perf_counter() - start_time, log_path, result)
+
+
+def crashed_result(rec_name: str, log_dir: str, exception: Exception) -> tuple:
+    """Function returning the result of a recording whose worker process died, its log may be incomplete"""
+    print(f"Error: worker processing \"{rec_name}\" crashed: {exception!r}")
+    return (rec_name, "crashed", 0.0, os.path.join(log_dir, rec_name + ".log"), None)
+
+
+def process_isolated(rec_name: str, log_dir: str, output_mode: str = OUTPUT_MODE_COPY, force: bool = False) -> tuple:
+    """Function processing a single recording in a worker process of its own, so a crash is only charged to it"""
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+        try:
+            return executor.submit(process_recording, rec_name, log_dir, output_mode, force).result()
+        except Exception as exception:
+            return crashed_result(rec_name, log_dir, exception)
+
+
+def print_summary(results: list, total_time: float) -> None:
+    """Function printing a summary table of all processed recordings"""
+    name_width = max([len("Recording")] + [len(result[0]) for result in results])
+    print(f"{'Recording':<{name_width}}  {'Status':<8}  {'Frames':>13}  {'Time (s)':>9}  Log")
+    for rec_name, status, duration, log_path, result in results:
+        frames = f"{result.saved_frames}/{result.kinect_frames}" if result is not None else "-"
+        print(f"{rec_name:<{name_width}}  {status:<8}  {frames:>13}  {duration:>9.2f}  {log_path}")
+    failed = sum(1 for result in results if result[1] not in ("ok", "skipped"))
+    print(f"{len(results) - failed} succeeded, {failed} failed, total time {total_time:.2f} s")
+
+
+def process_all_recordings(workers: int = None, log_dir: str = LOG_DIR_LOC,
+                           output_mode: str = OUTPUT_MODE_COPY, force: bool = False) -> list:
+    """Function processing every recording under the recordings folder in a process pool.
+
+    Args:
+        workers (int): Number of worker processes, defaults to the number of CPUs.
+        log_dir (str): Folder in which a log file is written per recording.
+        output_mode (str): How the kinect files are placed in the output, one of OUTPUT_MODES.
+        force (bool): Reprocess recordings whose output is already up to date.
+
+    Returns:
+        list: (recording name, status, duration, log file path, ProcessingResult or None) for every recording.
+    """
+    rec_names = find_recordings(frame_processor.REC_DIR_LOC)
+    os.makedirs(frame_processor.POST_DIR_LOC, exist_ok=True)
+    os.makedirs(log_dir, exist_ok=True)
+
+    start_time = time.perf_counter()
+    results = []
+    unfinished = []     # recordings of a pool a worker died in, any of them may have killed it
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(process_recording, rec_name, log_dir, output_mode, force): rec_name for rec_name in rec_names
+        }
+        for future in concurrent.futures.as_completed(futures):
+            rec_name = futures[future]
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                unfinished.append(rec_name)
+                continue
+            except Exception as exception:
+                result = crashed_result(rec_name, log_dir, exception)
+            print(f"Recording \"{result[0]}\": {result[1]} ({result[2]:.2f} s)")
+            results.append(result)
+
+    if unfinished:
+        # a dead worker breaks the whole pool, run the recordings it left each in a process of its own
+        print(f"Warning: a worker process died, processing the {len(unfinished)} unfinished recordings one per process")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            futures = [executor.submit(process_isolated, rec_name, log_dir, output_mode, force) for rec_name in sorted(unfinished)]
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                print(f"Recording \"{result[0]}\": {result[1]} ({result[2]:.2f} s)")
+                results.append(result)
+
+    results.sort(key=lambda result: result[0])
+    print_summary(results, time.perf_counter() - start_time)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the frame processor on all recordings in " + frame_processor.REC_DIR_LOC)
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="number of recordings processed at once (default: number of CPUs)")
+    parser.add_argument("--log-dir", default=LOG_DIR_LOC,
+                        help="folder for the per-recording log files (default: %(default)s)")
+    parser.add_argument("--output-mode", choices=OUTPUT_MODES, default=OUTPUT_MODE_COPY,
+                        help="how the kinect files are placed in the output (default: %(default)s)")
+    parser.add_argument("--force", action="store_true",
+                        help="reprocess every recording even if its output is up to date")
+    args = parser.parse_args()
+    process_all_recordings(args.workers, args.log_dir, args.output_mode, args.force)
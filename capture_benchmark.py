@@ -0,0 +1,104 @@
+"""Module benchmarking the kinect recording pipeline end to end on a replayed recording, without the device.
+
+The frames of a replay source go through the same capture pipeline, write queue and recording writer the
+kinect hub records with, and the throughput and telemetry of the run are printed.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from depth_io import DEPTH_FORMAT_NPY, DEPTH_FORMATS
+from custom_made_libs.capture_pipeline import (
+    CapturePipeline,
+    STAGE_COLOR,
+    STAGE_TRANSFORMED_DEPTH,
+    STAGE_WRITER,
+    parse_stages,
+)
+from custom_made_libs.capture_telemetry import CaptureTelemetry, TELEMETRY_FILE_NAME
+from custom_made_libs.frame_pool import FRAME_POOL_MARGIN, FramePool
+from custom_made_libs.frame_write_queue import FrameWriteQueue, OVERFLOW_BLOCK, OVERFLOW_POLICIES, queue_capacity
+from custom_made_libs.recording_writer import RECORDING_LAYOUTS, RecordingWriter
+from custom_made_libs.replay_device import REPLAY_UNSUPPORTED_STAGES, ReplayDevice, open_replay_source
+
+# the stages of a recording with depth, without the preview and the imu a replay does not have
+BENCHMARK_STAGES = (STAGE_COLOR, STAGE_TRANSFORMED_DEPTH, STAGE_WRITER)
+
+
+def run_benchmark(device: ReplayDevice, kinect_dir: str, stages: tuple = BENCHMARK_STAGES, layout: str = "container",
+                  depth_format: str = DEPTH_FORMAT_NPY, queue_size: int = 30,
+                  overflow_policy: str = OVERFLOW_BLOCK, writers: int = 2) -> dict:
+    """Function recording the frames of a replay device into kinect_dir like the kinect hub does.
+
+    Returns:
+        dict: frames, seconds, fps, written megabytes per second, and the telemetry, write queue and
+            frame pool of the run.
+    """
+    for stage in stages:
+        if stage in REPLAY_UNSUPPORTED_STAGES:
+            raise Exception(f"the {stage} stage can not be replayed")
+    os.makedirs(kinect_dir, exist_ok=True)
+    telemetry = CaptureTelemetry()
+    frame_pool = FramePool(queue_capacity(queue_size, overflow_policy) + FRAME_POOL_MARGIN)
+    recording_writer = RecordingWriter(kinect_dir, layout, depth_format, telemetry)
+    write_queue = FrameWriteQueue(recording_writer.write, queue_size, overflow_policy, writers)
+    pipeline = CapturePipeline(device, stages, write_queue=write_queue, telemetry=telemetry, frame_pool=frame_pool)
+    device.start()
+    start_time = time.perf_counter()
+    try:
+        pipeline.run(device.is_valid)
+    finally:
+        # the run only ends once every frame is written
+        write_queue.close()
+        recording_writer.close()
+    seconds = time.perf_counter() - start_time
+    telemetry.write(os.path.join(kinect_dir, TELEMETRY_FILE_NAME))
+    return {
+        "frames": telemetry.frames,
+        "seconds": seconds,
+        "fps": telemetry.frames / seconds if seconds else 0,
+        "mb_per_second": recording_writer.bytes_written / seconds / 1000000 if seconds else 0,
+        "telemetry": telemetry,
+        "write_queue": write_queue,
+        "frame_pool": frame_pool,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the kinect recording pipeline on a replayed recording")
+    parser.add_argument("source", nargs="?", default="synthetic:300",
+                        help="\"synthetic:<frames>\", an mkv file or a recording folder to replay (default: %(default)s)")
+    parser.add_argument("--realtime", action="store_true",
+                        help="replay at the pace of the device timestamps instead of as fast as possible")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="read the source during the replay instead of before it, so reading it is measured too")
+    parser.add_argument("--stages", default=",".join(BENCHMARK_STAGES),
+                        help="comma separated capture stages (default: %(default)s)")
+    parser.add_argument("--layout", default="container", choices=RECORDING_LAYOUTS,
+                        help="recording layout (default: %(default)s)")
+    parser.add_argument("--depth-format", default=DEPTH_FORMAT_NPY, choices=DEPTH_FORMATS,
+                        help="format of the depth files (default: %(default)s)")
+    parser.add_argument("--queue-size", type=int, default=30, help="frames the write queue holds (default: %(default)s)")
+    parser.add_argument("--overflow-policy", default=OVERFLOW_BLOCK, choices=OVERFLOW_POLICIES,
+                        help="what to do when the write queue is full (default: %(default)s)")
+    parser.add_argument("--writers", type=int, default=2, help="writer threads (default: %(default)s)")
+    parser.add_argument("--output-dir", default=None,
+                        help="Kinect folder to record into, kept after the run (default: a temporary folder)")
+    args = parser.parse_args()
+    source = open_replay_source(args.source)
+    device = ReplayDevice(source, args.realtime, preload=not args.no_preload)
+    output_dir = args.output_dir if args.output_dir is not None else tempfile.mkdtemp(prefix="capture_benchmark_")
+    try:
+        result = run_benchmark(device, output_dir, parse_stages(args.stages), args.layout, args.depth_format,
+                               args.queue_size, args.overflow_policy, args.writers)
+    finally:
+        device.close()
+        if args.output_dir is None:
+            shutil.rmtree(output_dir)
+    print(f"Recorded {result['frames']} frames in {result['seconds']:.2f} s: "
+          f"{result['fps']:.1f} fps, {result['mb_per_second']:.1f} MB/s written.")
+    print("Write queue: " + result["write_queue"].report())
+    print("Frames: " + result["frame_pool"].report())
+    print("Telemetry: " + result["telemetry"].readout())
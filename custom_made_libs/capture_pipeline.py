@@ -0,0 +1,212 @@
+"""Module with the capture pipeline every kinect session runs, made of the stages the session enables"""
+import ctypes
+import time
+
+import numpy as np
+from pykinect_azure.k4a import _k4a, Capture, Device, Image
+from pykinect_azure.k4a._k4a import k4a_image_get_device_timestamp_usec
+
+from depth_io import colorize_depth
+from custom_made_libs.capture_telemetry import CaptureTelemetry
+from custom_made_libs.frame_pool import CaptureFrame, FramePool
+from custom_made_libs.frame_preview import FramePreview
+from custom_made_libs.frame_write_queue import FrameWriteQueue
+from custom_made_libs.imu_capture import ImuCapture
+
+# stages of a capture session, a capture only pays for the stages its session enables
+STAGE_COLOR = "color"                           # color image, the jpeg buffer or a BGR(A) array
+STAGE_DEPTH = "depth"                           # depth in millimeters as seen by the depth camera
+STAGE_TRANSFORMED_DEPTH = "transformed_depth"   # depth in millimeters transformed to the color camera
+STAGE_COLORED_DEPTH = "colored_depth"           # colored transformed depth, only for looking at it
+STAGE_IR = "ir"                                 # infrared image of the depth camera
+STAGE_IMU = "imu"                               # imu samples, captured from their own thread
+STAGE_PREVIEW = "preview"                       # latest frame handed to the preview window
+STAGE_WRITER = "writer"                         # every frame handed to the write queue
+STAGES = (STAGE_COLOR, STAGE_DEPTH, STAGE_TRANSFORMED_DEPTH, STAGE_COLORED_DEPTH, STAGE_IR,
+          STAGE_IMU, STAGE_PREVIEW, STAGE_WRITER)
+# stages that need the result of another stage
+STAGE_DEPENDENCIES = {STAGE_COLORED_DEPTH: STAGE_TRANSFORMED_DEPTH}
+FRAME_POOL_SIZE = 4                             # frames of a pipeline without a write queue
+
+
+def parse_stages(text: str) -> tuple:
+    """Function returning the stages of a comma separated list, for example "ir,imu" """
+    stages = tuple(stage.strip() for stage in text.split(",") if stage.strip())
+    for stage in stages:
+        if stage not in STAGES:
+            raise Exception(f"unknown capture stage \"{stage}\", expected one of {STAGES}")
+    return stages
+
+
+def copy_image(image: Image, frame: CaptureFrame, name: str, dtype=np.uint8, channels: int = 0) -> np.ndarray:
+    """Function copying an sdk image into the buffer of a frame, returns None if the image is empty.
+
+    Args:
+        channels (int): Channels per pixel, 0 returns the buffer as it is, for the jpeg of an mjpg image.
+    """
+    size = image.get_size()
+    if not size:
+        return None
+    buffer = frame.buffer(name, size)
+    ctypes.memmove(buffer.ctypes.data, image.buffer_pointer, size)
+    if channels == 0:
+        return buffer[:size]
+    height = image.get_height_pixels()
+    width = image.get_width_pixels()
+    rows = buffer[:size].view(dtype).reshape(height, -1)
+    if channels == 1:
+        return rows[:, :width]
+    return rows[:, :width * channels].reshape(height, width, channels)
+
+
+def image_timestamp_usec(image: Image) -> int:
+    """Function returning the device timestamp of an image, of the sdk or of a replayed capture"""
+    if isinstance(image, Image):
+        return k4a_image_get_device_timestamp_usec(image.handle())
+    return image.get_device_timestamp_usec()
+
+
+class CapturePipeline:
+    """Class running the enabled stages of a capture session for every capture of the device.
+
+    The image stages fill a CaptureFrame, a capture missing an image of an enabled stage is counted as
+    failed. The capture sinks get every capture as it is (the mkv recorder), the write queue gets every
+    frame and the preview the latest one. The imu capture runs on its own threads while the pipeline runs.
+
+    The images are copied, or transformed by the sdk, straight into the buffers of a frame of the frame
+    pool. The write queue and the preview share that frame and release it once they are done with it,
+    so a running capture allocates no images.
+    """
+
+    def __init__(self, device: Device, stages, decode_color: bool = False, write_queue: FrameWriteQueue = None,
+                 preview: FramePreview = None, telemetry: CaptureTelemetry = None, capture_sinks: tuple = (),
+                 imu_capture: ImuCapture = None, frame_pool: FramePool = None):
+        self.device: Device = device
+        self.stages: frozenset = frozenset(stages)
+        for stage, needed_stage in STAGE_DEPENDENCIES.items():
+            if stage in self.stages:
+                self.stages |= {needed_stage}
+        # False keeps the jpeg buffer of mjpg color images, True decodes every color image
+        self.decode_color: bool = decode_color
+        self.frame_pool: FramePool = frame_pool if frame_pool is not None else FramePool(FRAME_POOL_SIZE)
+        self.write_queue: FrameWriteQueue = write_queue if STAGE_WRITER in self.stages else None
+        self.preview: FramePreview = preview if STAGE_PREVIEW in self.stages else None
+        self.telemetry: CaptureTelemetry = telemetry
+        self.capture_sinks: tuple = tuple(capture_sinks)
+        self.imu_capture: ImuCapture = imu_capture if STAGE_IMU in self.stages else None
+        if self.write_queue is None and STAGE_WRITER in self.stages:
+            raise Exception("the writer stage needs a write queue")
+        if self.imu_capture is None and STAGE_IMU in self.stages:
+            raise Exception("the imu stage needs an imu capture")
+        if self.preview is not None and self.preview.release_function is None:
+            raise Exception("the preview must release the offered frames")
+        # frame -> (buffer, sdk image over the buffer) the depth is transformed into
+        self._transformed_depth_images: dict = {}
+
+    def process(self, capture: Capture) -> CaptureFrame:
+        """Function running the image stages on a capture, returns None if an enabled stage got no image"""
+        color_object: Image = capture.get_color_image_object()
+        if not color_object.is_valid():
+            return None
+        frame = self.frame_pool.acquire(image_timestamp_usec(color_object))
+        ret = True
+        if STAGE_COLOR in self.stages:
+            frame.color = self.read_color(color_object, frame)
+            ret = frame.color is not None
+        if ret and STAGE_DEPTH in self.stages:
+            frame.depth = copy_image(capture.get_depth_image_object(), frame, "depth", "<u2", 1)
+            ret = frame.depth is not None
+        if ret and STAGE_TRANSFORMED_DEPTH in self.stages:
+            frame.transformed_depth = self.transform_depth(capture, frame)
+            ret = frame.transformed_depth is not None
+        if ret and STAGE_COLORED_DEPTH in self.stages:
+            # colored from the transformed depth instead of transforming the depth a second time
+            frame.colored_depth = colorize_depth(frame.transformed_depth)
+        if ret and STAGE_IR in self.stages:
+            frame.ir = copy_image(capture.get_ir_image_object(), frame, "ir", "<u2", 1)
+            ret = frame.ir is not None
+        if not ret:
+            frame.release()
+            return None
+        return frame
+
+    def read_color(self, color_object: Image, frame: CaptureFrame):
+        """Function returning the color image of a capture in the buffer of the frame, or None if it has none"""
+        image_format = color_object.get_format()
+        if image_format == _k4a.K4A_IMAGE_FORMAT_COLOR_MJPG and not self.decode_color:
+            # the jpeg buffer of the device, saved without decoding it
+            return copy_image(color_object, frame, "color")
+        if image_format == _k4a.K4A_IMAGE_FORMAT_COLOR_BGRA32:
+            return copy_image(color_object, frame, "color", np.uint8, 4)
+        # decoded by the sdk wrapper into a new array
+        ret, color_image = color_object.to_numpy()
+        return color_image if ret else None
+
+    def transform_depth(self, capture: Capture, frame: CaptureFrame) -> np.ndarray:
+        """Function transforming the depth of a capture to the color camera, into the buffer of the frame"""
+        depth_object: Image = capture.get_depth_image_object()
+        if not depth_object.is_valid():
+            return None
+        if not isinstance(capture, Capture):
+            # a replayed capture, its depth was transformed when it was recorded
+            ret, depth_image = capture.get_transformed_depth_image()
+            if not ret:
+                return None
+            buffer = frame.buffer("transformed_depth", depth_image.nbytes)
+            transformed_depth = buffer[:depth_image.nbytes].view("<u2").reshape(depth_image.shape)
+            np.copyto(transformed_depth, depth_image)
+            return transformed_depth
+        transformation = capture.camera_transform
+        width = transformation.color_resolution.width
+        height = transformation.color_resolution.height
+        buffer = frame.buffer("transformed_depth", width * height * 2)
+        buffer_image = self._transformed_depth_images.get(frame)
+        if buffer_image is None or buffer_image[0] is not buffer:
+            # an sdk image over the buffer of the frame, made once per frame of the pool
+            image_handle = _k4a.k4a_image_t()
+            if _k4a.k4a_image_create_from_buffer(_k4a.K4A_IMAGE_FORMAT_DEPTH16, width, height, width * 2,
+                                                 buffer.ctypes.data_as(ctypes.POINTER(ctypes.c_uint8)), buffer.size,
+                                                 None, None, image_handle) != _k4a.K4A_RESULT_SUCCEEDED:
+                raise Exception("failed to create the transformed depth image")
+            buffer_image = (buffer, Image(image_handle))
+            self._transformed_depth_images[frame] = buffer_image
+        if _k4a.k4a_transformation_depth_image_to_color_camera(transformation.handle(), depth_object.handle(),
+                                                               buffer_image[1].handle()) != _k4a.K4A_RESULT_SUCCEEDED:
+            return None
+        return buffer[:width * height * 2].view("<u2").reshape(height, width)
+
+    def run(self, is_running) -> None:
+        """Function capturing and processing frames until is_running() is False or q is pressed in the preview"""
+        if self.imu_capture is not None:
+            self.imu_capture.start()
+        try:
+            while is_running():
+                capture: Capture = self.device.update()
+                if self.capture_sinks:
+                    write_start_time = time.perf_counter()
+                    for capture_sink in self.capture_sinks:
+                        capture_sink(capture)
+                    if self.telemetry is not None:
+                        self.telemetry.write_latency.record(time.perf_counter() - write_start_time)
+                frame = self.process(capture)
+                if frame is None:
+                    if self.telemetry is not None:
+                        self.telemetry.record_failed_capture()
+                else:
+                    if self.telemetry is not None:
+                        self.telemetry.record_capture(frame.timestamp_usec)
+                    # the write queue and the preview share the frame, each with its own reference
+                    if self.write_queue is not None:
+                        self.write_queue.put(frame.retain())
+                        if self.telemetry is not None:
+                            self.telemetry.record_queue_depth(self.write_queue.depth())
+                    if self.preview is not None:
+                        self.preview.offer(frame.retain())
+                    frame.release()
+
+                # Press q in the preview to exit
+                if self.preview is not None and self.preview.stop_requested:
+                    break
+        finally:
+            if self.imu_capture is not None:
+                self.imu_capture.close()
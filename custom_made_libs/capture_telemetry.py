@@ -0,0 +1,154 @@
+"""Module collecting telemetry of a kinect recording: frame gaps, failed captures, queue depth and latencies"""
+import bisect
+import json
+import threading
+import time
+
+TELEMETRY_FILE_NAME = "telemetry.json"
+TELEMETRY_VERSION = 1
+# upper bounds of the latency histogram buckets in milliseconds, the last bucket holds everything slower
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+GAP_FACTOR = 1.5            # a frame interval longer than this many expected intervals is a gap
+SAMPLE_INTERVAL = 1.0       # seconds between the samples of the time series
+
+
+class LatencyHistogram:
+    """Class counting latencies in fixed buckets, cheap enough to record every frame"""
+
+    def __init__(self):
+        self.counts: list = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_ms: float = 0
+        self.max_ms: float = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Function counting a latency given in seconds"""
+        milliseconds = seconds * 1000
+        bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, milliseconds)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.total_ms += milliseconds
+            self.max_ms = max(self.max_ms, milliseconds)
+
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def percentile(self, fraction: float) -> float:
+        """Function returning the upper bound of the bucket holding the given fraction of the latencies"""
+        total = self.count()
+        if total == 0:
+            return 0
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= fraction * total:
+                return min(LATENCY_BUCKETS_MS[bucket], round(self.max_ms, 3)) if bucket < len(LATENCY_BUCKETS_MS) else round(self.max_ms, 3)
+        return self.max_ms
+
+    def summary(self) -> dict:
+        total = self.count()
+        return {
+            "buckets_ms": list(LATENCY_BUCKETS_MS),
+            "counts": list(self.counts),
+            "mean_ms": round(self.total_ms / total, 3) if total else 0,
+            "p50_ms": self.percentile(0.5),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+class CaptureTelemetry:
+    """Class collecting the telemetry of a recording.
+
+    The capture loop calls record_capture or record_failed_capture for every capture and record_queue_depth
+    with the depth of the write queue, the writers record their encode and write latencies. Every call only
+    updates a few counters, a time series is sampled once a second.
+    """
+
+    def __init__(self, fps: float = 30):
+        self.expected_interval_usec: float = 1000000 / fps
+        self.frames: int = 0                # successful captures
+        self.failed_captures: int = 0       # captures without the needed images
+        self.gaps: int = 0                  # intervals between device timestamps longer than GAP_FACTOR frames
+        self.missed_frames: int = 0         # frames the device timestamps show were never captured
+        self.longest_gap_usec: int = 0
+        self.first_timestamp_usec: int = None
+        self.last_timestamp_usec: int = None
+        self.queue_depth: int = 0           # last sampled depth of the write queue
+        self.max_queue_depth: int = 0
+        self.encode_latency = LatencyHistogram()
+        self.write_latency = LatencyHistogram()
+        self.samples: list = []             # [seconds, frames, failed captures, missed frames, queue depth] every second
+        self.start_time: float = time.perf_counter()
+        self._next_sample_time: float = self.start_time + SAMPLE_INTERVAL
+        self._window_time: float = self.start_time
+        self._window_frames: int = 0
+        self.current_fps: float = 0         # fps over the last sample interval
+
+    def record_capture(self, device_timestamp_usec: int) -> None:
+        """Function recording a successful capture by the device timestamp of its color image"""
+        self.frames += 1
+        if self.last_timestamp_usec is None:
+            self.first_timestamp_usec = device_timestamp_usec
+        else:
+            interval = device_timestamp_usec - self.last_timestamp_usec
+            if interval > GAP_FACTOR * self.expected_interval_usec:
+                self.gaps += 1
+                self.missed_frames += round(interval / self.expected_interval_usec) - 1
+                self.longest_gap_usec = max(self.longest_gap_usec, interval)
+        self.last_timestamp_usec = device_timestamp_usec
+        self._sample()
+
+    def record_failed_capture(self) -> None:
+        """Function recording a capture that did not have the needed images"""
+        self.failed_captures += 1
+        self._sample()
+
+    def record_queue_depth(self, depth: int) -> None:
+        """Function recording the number of frames waiting for the writers"""
+        self.queue_depth = depth
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def _sample(self) -> None:
+        now = time.perf_counter()
+        if now < self._next_sample_time:
+            return
+        self.current_fps = (self.frames - self._window_frames) / (now - self._window_time)
+        self._window_time = now
+        self._window_frames = self.frames
+        self._next_sample_time = now + SAMPLE_INTERVAL
+        self.samples.append([round(now - self.start_time, 3), self.frames, self.failed_captures,
+                             self.missed_frames, self.queue_depth])
+
+    def achieved_fps(self) -> float:
+        """Function returning the fps by the device timestamps of the captured frames"""
+        if self.frames < 2:
+            return 0
+        return (self.frames - 1) * 1000000 / (self.last_timestamp_usec - self.first_timestamp_usec)
+
+    def readout(self) -> str:
+        """Function returning a one line live status of the recording"""
+        return (f"{self.frames} frames, {self.current_fps:.1f} fps, {self.missed_frames} missed, "
+                f"{self.failed_captures} failed, queue {self.queue_depth}, "
+                f"write p99 {self.write_latency.percentile(0.99):g} ms")
+
+    def summary(self) -> dict:
+        return {
+            "version": TELEMETRY_VERSION,
+            "duration": round(time.perf_counter() - self.start_time, 3),
+            "frames": self.frames,
+            "achieved_fps": round(self.achieved_fps(), 3),
+            "failed_captures": self.failed_captures,
+            "gaps": self.gaps,
+            "missed_frames": self.missed_frames,
+            "longest_gap_usec": self.longest_gap_usec,
+            "max_queue_depth": self.max_queue_depth,
+            "encode_latency": self.encode_latency.summary(),
+            "write_latency": self.write_latency.summary(),
+            "samples": self.samples,
+        }
+
+    def write(self, path: str) -> None:
+        """Function writing the telemetry to a sidecar json file"""
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, separators=(",", ":"))
@@ -0,0 +1,110 @@
+"""Module with the pool of reusable frames the kinect capture fills, shared by the writers and the preview"""
+import collections
+import threading
+
+import numpy as np
+
+# frames of the pool beyond the write queue: the capture, the writers and the preview each hold some
+FRAME_POOL_MARGIN = 6
+
+
+class CaptureFrame:
+    """Class holding the images one capture produced, None for every stage that did not run.
+
+    A frame of a FramePool owns a buffer per image that is reused by every capture the frame holds.
+    Every consumer of the frame (the capture loop, the write queue, the preview) holds a reference,
+    and the frame goes back to its pool once the last one is released.
+    """
+
+    __slots__ = ("timestamp_usec", "color", "depth", "transformed_depth", "colored_depth", "ir",
+                 "pool", "references", "_buffers")
+
+    def __init__(self, timestamp_usec: int = 0, pool=None):
+        self.timestamp_usec: int = timestamp_usec   # device timestamp of the color image
+        self.color = None
+        self.depth: np.ndarray = None
+        self.transformed_depth: np.ndarray = None
+        self.colored_depth: np.ndarray = None
+        self.ir: np.ndarray = None
+        self.pool: FramePool = pool
+        self.references: int = 0
+        self._buffers: dict = {}    # image name -> uint8 buffer reused by every capture of the frame
+
+    def buffer(self, name: str, size: int) -> np.ndarray:
+        """Function returning the buffer of an image of the frame with room for size bytes.
+
+        The buffer is only allocated the first time or when a larger image arrives, so once every frame
+        of the pool was used, filling a frame allocates nothing.
+        """
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.size < size:
+            buffer = np.empty(size, dtype=np.uint8)
+            self._buffers[name] = buffer
+        return buffer
+
+    def retain(self):
+        """Function adding a reference to the frame for another consumer, returns the frame"""
+        if self.pool is not None:
+            self.pool.retain(self)
+        return self
+
+    def release(self) -> None:
+        """Function releasing a reference to the frame, the last one returns it to its pool"""
+        if self.pool is not None:
+            self.pool.release(self)
+
+
+class FramePool:
+    """Class holding a fixed number of reusable frames.
+
+    The capture loop acquires a free frame for every capture, waiting for one if all of them are still
+    held by the writers or the preview, so at most size frames of images are ever in memory.
+    """
+
+    def __init__(self, size: int):
+        self.size: int = max(size, 1)
+        self.acquired_frames: int = 0   # frames handed out
+        self.waits: int = 0             # times the capture loop waited for a free frame
+        self._free = collections.deque(CaptureFrame(pool=self) for _ in range(self.size))
+        self._condition = threading.Condition()
+
+    def acquire(self, timestamp_usec: int) -> CaptureFrame:
+        """Function returning a free frame with a single reference, its images cleared"""
+        with self._condition:
+            if not self._free:
+                self.waits += 1
+                while not self._free:
+                    self._condition.wait()
+            frame = self._free.popleft()
+            frame.references = 1
+            self.acquired_frames += 1
+        frame.timestamp_usec = timestamp_usec
+        frame.color = None
+        frame.depth = None
+        frame.transformed_depth = None
+        frame.colored_depth = None
+        frame.ir = None
+        return frame
+
+    def retain(self, frame: CaptureFrame) -> None:
+        with self._condition:
+            if frame.references <= 0:
+                raise Exception("retained a frame that is back in its pool")
+            frame.references += 1
+
+    def release(self, frame: CaptureFrame) -> None:
+        with self._condition:
+            if frame.references <= 0:
+                raise Exception("released a frame that is back in its pool")
+            frame.references -= 1
+            if frame.references == 0:
+                self._free.append(frame)
+                self._condition.notify()
+
+    def free_frames(self) -> int:
+        """Function returning the number of frames not held by anyone"""
+        return len(self._free)
+
+    def report(self) -> str:
+        """Function returning a short summary of the pool counters"""
+        return f"{self.acquired_frames} frames through a pool of {self.size}, waited for a free frame {self.waits} times"
@@ -0,0 +1,131 @@
+"""Module showing a preview of the kinect frames at a limited rate, apart from the capture loop"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# jpeg decoding at a reduced size, by the size divisor
+REDUCED_DECODE_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                        (2, cv2.IMREAD_REDUCED_COLOR_2), (1, cv2.IMREAD_COLOR))
+
+
+def jpeg_width(buffer: bytes) -> int:
+    """Function returning the width of a jpeg image from its frame header, or None if there is none"""
+    position = 2
+    while position + 9 <= len(buffer):
+        if buffer[position] != 0xFF:
+            return None
+        marker = buffer[position + 1]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            return int.from_bytes(buffer[position + 7:position + 9], "big")
+        position += 2 + int.from_bytes(buffer[position + 2:position + 4], "big")
+    return None
+
+
+def to_preview_image(image, width: int) -> np.ndarray:
+    """Function returning a BGR copy of a frame at most width pixels wide.
+
+    Args:
+        image: BGR or BGRA array, or the jpeg buffer of an mjpg frame (bytes or a one dimensional uint8
+            array) which is decoded at the smallest size that is still at least width pixels wide.
+        width (int): Width of the preview, 0 keeps the size of the frame.
+    """
+    if isinstance(image, bytes) or image.ndim == 1:
+        full_width = jpeg_width(image) if width > 0 else None
+        flag = cv2.IMREAD_COLOR
+        if full_width is not None:
+            flag = next(flag for divisor, flag in REDUCED_DECODE_FLAGS if full_width // divisor >= width or divisor == 1)
+        image = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), flag)
+        if image is None:
+            return None
+    image = image[:, :, :3]
+    if 0 < width < image.shape[1]:
+        height = image.shape[0] * width // image.shape[1]
+        return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    # never draw on the captured frame itself
+    return image.copy()
+
+
+class FramePreview:
+    """Class showing the latest offered frame in an OpenCV window from its own thread.
+
+    The capture loop only hands its latest frame over with offer, the preview thread renders and shows it
+    at most fps times per second, at the configured width. Pressing q in the window sets stop_requested.
+    A headless preview opens no window and ignores the offered frames. Every offered frame is handed to
+    release_function(*frame) once the preview is done with it, shown or not.
+    """
+
+    def __init__(self, window_name: str, render_function, fps: float = 10, width: int = 640, headless: bool = False,
+                 release_function=None):
+        self.window_name: str = window_name
+        self.render_function = render_function  # render_function(*frame, width) -> image to show
+        self.release_function = release_function
+        self.fps: float = fps
+        self.width: int = width
+        self.headless: bool = headless
+        self.stop_requested: bool = False       # True once q was pressed in the window
+        self.shown_frames: int = 0
+        self._frame: tuple = None
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread: threading.Thread = None
+        if not headless:
+            self._thread = threading.Thread(target=self._preview_thread, name="preview_" + window_name, daemon=True)
+            self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        self.close()
+        return False
+
+    def offer(self, *frame) -> None:
+        """Function handing the latest captured frame to the preview, replacing a frame not shown yet"""
+        if self.headless:
+            self._release(frame)
+            return
+        with self._lock:
+            replaced_frame = self._frame
+            self._frame = frame
+        self._release(replaced_frame)
+
+    def _release(self, frame: tuple) -> None:
+        if frame is not None and self.release_function is not None:
+            self.release_function(*frame)
+
+    def _preview_thread(self) -> None:
+        cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
+        interval = 1 / self.fps if self.fps > 0 else 0
+        next_time = time.monotonic()
+        while not self._closed.is_set():
+            with self._lock:
+                frame = self._frame
+                self._frame = None
+            if frame is not None:
+                try:
+                    image = self.render_function(*frame, self.width)
+                    if image is not None:
+                        cv2.imshow(self.window_name, image)
+                        self.shown_frames += 1
+                except Exception as exception:
+                    print("Error: failed showing the preview: " + repr(exception))
+                self._release(frame)
+            # Press q to exit
+            if cv2.waitKey(1) == ord("q"):
+                self.stop_requested = True
+            # skip the ticks missed while rendering instead of catching up on them
+            next_time = max(next_time + interval, time.monotonic())
+            self._closed.wait(max(next_time - time.monotonic(), 0))
+        cv2.destroyWindow(self.window_name)
+        with self._lock:
+            frame = self._frame
+            self._frame = None
+        self._release(frame)
+
+    def close(self) -> None:
+        """Function stopping the preview thread and closing its window"""
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
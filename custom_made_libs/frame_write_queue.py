@@ -0,0 +1,150 @@
+"""Module with a bounded queue between the kinect capture loop and the frame writers"""
+import collections
+import threading
+
+# what happens when a frame is captured while the queue is full
+OVERFLOW_BLOCK = "block"                # wait for the writers, the capture loop slows down
+OVERFLOW_DROP_OLDEST = "drop_oldest"    # drop the oldest queued frame
+OVERFLOW_DROP_DEPTH = "drop_depth"      # drop the depth images of the oldest queued frames, whole frames only once none is left
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_DEPTH)
+
+
+def queue_capacity(max_frames: int, overflow_policy: str) -> int:
+    """Function returning the most frames a write queue holds, the drop_depth policy holds max_frames more without depth"""
+    max_frames = max(max_frames, 1)
+    return 2 * max_frames if overflow_policy == OVERFLOW_DROP_DEPTH else max_frames
+
+
+class QueuedFrame:
+    """Class holding the images of a queued frame_pool.CaptureFrame, as the writers get them.
+
+    The queue drops images from these references only, the CaptureFrame itself stays as it is for the
+    other consumers sharing it, like the preview.
+    """
+
+    __slots__ = ("frame", "timestamp_usec", "color", "depth", "transformed_depth", "colored_depth", "ir")
+
+    def __init__(self, frame):
+        self.frame = frame      # the queue's reference to the frame, released once written or dropped
+        self.timestamp_usec: int = frame.timestamp_usec
+        self.color = frame.color
+        self.depth = frame.depth
+        self.transformed_depth = frame.transformed_depth
+        self.colored_depth = frame.colored_depth
+        self.ir = frame.ir
+
+    def has_depth(self) -> bool:
+        return self.depth is not None or self.transformed_depth is not None or self.colored_depth is not None
+
+    def drop_depth(self) -> None:
+        """Function dropping the depth images from the frame as it will be written"""
+        self.depth = None
+        self.transformed_depth = None
+        self.colored_depth = None
+
+    def release(self) -> None:
+        self.frame.release()
+
+
+class FrameWriteQueue:
+    """Bounded queue of captured frames written by a fixed number of writer threads.
+
+    Frames are handed over as frame_pool.CaptureFrame objects and written by write_function(frame), with
+    frame a QueuedFrame holding their images. The queue holds a reference to every queued frame and
+    releases it once the frame is written or dropped. The overflow policy decides what happens when a frame
+    arrives while the queue is full, and every drop is counted. The block and drop_oldest policies queue at
+    most max_frames frames. The drop_depth policy keeps at most max_frames frames with depth images,
+    dropping the depth of the oldest queued frames to make room, and queues max_frames more frames without
+    depth before it drops whole frames.
+    """
+
+    def __init__(self, write_function, max_frames: int = 30, overflow_policy: str = OVERFLOW_BLOCK,
+                 writers: int = 2):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise Exception(f"unknown overflow policy \"{overflow_policy}\", expected one of {OVERFLOW_POLICIES}")
+        self.write_function = write_function
+        self.max_frames: int = max(max_frames, 1)
+        self.overflow_policy: str = overflow_policy
+        self.capacity: int = queue_capacity(max_frames, overflow_policy)    # most frames queued at once
+        self.queued_frames: int = 0     # frames handed to the queue
+        self.written_frames: int = 0    # frames written successfully
+        self.failed_frames: int = 0     # frames whose writing raised
+        self.dropped_frames: int = 0    # whole frames dropped by the drop_oldest and drop_depth policies
+        self.dropped_depth: int = 0     # queued frames whose depth images were dropped by the drop_depth policy
+        self.max_depth: int = 0         # largest number of frames waiting at once
+        self._frames = collections.deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._writers = [
+            threading.Thread(target=self._writer_thread, name=f"frame_writer_{i}", daemon=True)
+            for i in range(max(writers, 1))
+        ]
+        for writer in self._writers:
+            writer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        self.close()
+        return False
+
+    def depth(self) -> int:
+        """Function returning the number of frames currently waiting to be written"""
+        return len(self._frames)
+
+    def put(self, frame) -> None:
+        """Function queueing a captured frame and taking over a reference to it, applying the overflow policy"""
+        queued_frame = QueuedFrame(frame)
+        with self._condition:
+            self.queued_frames += 1
+            if self.overflow_policy == OVERFLOW_DROP_DEPTH and queued_frame.has_depth():
+                with_depth = [queued for queued in self._frames if queued.has_depth()]
+                if len(with_depth) >= self.max_frames:
+                    # the oldest frame with depth is written without it, the new frame keeps its own
+                    with_depth[0].drop_depth()
+                    self.dropped_depth += 1
+            if len(self._frames) >= self.capacity:
+                if self.overflow_policy in (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_DEPTH):
+                    # only the block policy waits for a place, drop_depth once no frame is left to strip
+                    self._frames.popleft().release()
+                    self.dropped_frames += 1
+                while len(self._frames) >= self.capacity:
+                    self._condition.wait()
+            self._frames.append(queued_frame)
+            self.max_depth = max(self.max_depth, len(self._frames))
+            self._condition.notify_all()
+
+    def _writer_thread(self) -> None:
+        while True:
+            with self._condition:
+                while not self._frames and not self._closed:
+                    self._condition.wait()
+                if not self._frames:
+                    return
+                frame = self._frames.popleft()
+                self._condition.notify_all()
+            try:
+                self.write_function(frame)
+                with self._condition:
+                    self.written_frames += 1
+            except Exception as exception:
+                print("Error: failed writing frame " + str(frame.timestamp_usec) + ": " + repr(exception))
+                with self._condition:
+                    self.failed_frames += 1
+            frame.release()
+
+    def close(self) -> None:
+        """Function writing all queued frames and stopping the writer threads"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for writer in self._writers:
+            writer.join()
+
+    def report(self) -> str:
+        """Function returning a short summary of the queue counters"""
+        return (f"{self.written_frames}/{self.queued_frames} frames written, "
+                f"{self.dropped_frames} dropped, {self.dropped_depth} without depth, "
+                f"{self.failed_frames} failed, at most {self.max_depth}/{self.capacity} frames queued "
+                f"(overflow policy: {self.overflow_policy})")
@@ -0,0 +1,127 @@
+"""Module capturing the kinect imu samples at the sensor rate from their own thread"""
+import ctypes
+import threading
+
+import numpy as np
+from pykinect_azure.k4a import _k4a, Device
+
+from kinect_imu import ImuColumnWriter
+
+IMU_RING_CAPACITY = 1 << 14     # samples held between flushes, about 10 seconds at the 1.6 kHz imu rate
+IMU_FLUSH_INTERVAL = 1.0        # seconds between appending the ring buffer to the imu columns
+IMU_WAIT_TIMEOUT_MS = 10        # longest wait for a sample, bounds the time close waits for the thread
+# a k4a_imu_sample_t as a numpy record, so the sdk writes the samples straight into the ring buffer
+_SAMPLE_TYPE = _k4a.k4a_imu_sample_t
+IMU_SAMPLE_DTYPE = np.dtype({
+    "names": ["temperature", "acc", "acc_timestamp_usec", "gyro", "gyro_timestamp_usec"],
+    "formats": ["<f4", ("<f4", 3), "<u8", ("<f4", 3), "<u8"],
+    "offsets": [_SAMPLE_TYPE.temperature.offset, _SAMPLE_TYPE.acc_sample.offset, _SAMPLE_TYPE.acc_timestamp_usec.offset,
+                _SAMPLE_TYPE.gyro_sample.offset, _SAMPLE_TYPE.gyro_timestamp_usec.offset],
+    "itemsize": ctypes.sizeof(_SAMPLE_TYPE),
+})
+
+
+class ImuCapture:
+    """Class draining the imu samples of a started device into a preallocated ring buffer.
+
+    The capture thread hands a slot of the ring buffer to the sdk for every sample, so nothing is
+    converted or allocated per sample, and the flush thread appends the filled slots to the imu columns
+    of the recording once a second. Neither thread is touched by the color and depth capture loop. When
+    the ring buffer is full the new samples are dropped and counted.
+    """
+
+    def __init__(self, device: Device, kinect_dir: str, capacity: int = IMU_RING_CAPACITY,
+                 flush_interval: float = IMU_FLUSH_INTERVAL):
+        self.device: Device = device
+        self.capacity: int = capacity
+        self.flush_interval: float = flush_interval
+        self.samples: int = 0           # samples written to the imu columns
+        self.dropped_samples: int = 0   # samples dropped because the ring buffer was full
+        self.max_fill: int = 0          # most samples waiting in the ring buffer at a flush
+        self._ring = np.zeros(capacity, dtype=IMU_SAMPLE_DTYPE)
+        # a pointer per slot made up front, handing a slot to the sdk then creates no object
+        slots = (_SAMPLE_TYPE * capacity).from_buffer(self._ring)
+        self._slot_pointers: list = [ctypes.pointer(slot) for slot in slots]
+        self._overflow_sample = _SAMPLE_TYPE()
+        # samples written into the ring and flushed from it so far, only the capture thread moves the first
+        self._write_count: int = 0
+        self._read_count: int = 0
+        self._writer = ImuColumnWriter(kinect_dir)
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._threads: list = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        self.close()
+        return False
+
+    def start(self) -> None:
+        """Function starting the capture and flush threads"""
+        self._threads = [
+            threading.Thread(target=self._capture_thread, name="imu_capture", daemon=True),
+            threading.Thread(target=self._flush_thread, name="imu_flush", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _capture_thread(self) -> None:
+        # bound once, the pykinect wrapper sets the argument types again on every call
+        get_imu_sample = _k4a.k4a_dll.k4a_device_get_imu_sample
+        get_imu_sample.restype = ctypes.c_int
+        get_imu_sample.argtypes = (_k4a.k4a_device_t, ctypes.POINTER(_SAMPLE_TYPE), ctypes.c_int32)
+        device_handle = self.device.handle()
+        slot_pointers = self._slot_pointers
+        capacity = self.capacity
+        overflow_pointer = ctypes.pointer(self._overflow_sample)
+        while not self._stopped.is_set():
+            if self._write_count - self._read_count >= capacity:
+                # drain the sample anyway so the device queue does not overflow instead
+                if get_imu_sample(device_handle, overflow_pointer, IMU_WAIT_TIMEOUT_MS) == _k4a.K4A_WAIT_RESULT_SUCCEEDED:
+                    self.dropped_samples += 1
+                continue
+            result = get_imu_sample(device_handle, slot_pointers[self._write_count % capacity], IMU_WAIT_TIMEOUT_MS)
+            if result == _k4a.K4A_WAIT_RESULT_SUCCEEDED:
+                # the slot is only handed to the flush thread once the sdk filled it
+                self._write_count += 1
+            elif result == _k4a.K4A_WAIT_RESULT_FAILED:
+                print("Error: failed reading the kinect imu, no more imu samples are recorded")
+                return
+
+    def _flush_thread(self) -> None:
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as exception:
+                print("Error: failed writing the kinect imu samples: " + repr(exception))
+
+    def flush(self) -> None:
+        """Function appending the samples waiting in the ring buffer to the imu columns"""
+        with self._flush_lock:
+            end = self._write_count
+            self.max_fill = max(self.max_fill, end - self._read_count)
+            while self._read_count < end:
+                # at most two contiguous runs of slots, before and after the end of the ring
+                start = self._read_count % self.capacity
+                stop = min(self.capacity, start + end - self._read_count)
+                block = self._ring[start:stop]
+                self._writer.append({name: block[name] for name in IMU_SAMPLE_DTYPE.names})
+                self._read_count += stop - start
+                self.samples += stop - start
+            self._writer.flush()
+
+    def close(self) -> None:
+        """Function stopping the threads and writing the remaining samples"""
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+        self.flush()
+        self._writer.close()
+
+    def report(self) -> str:
+        """Function returning a short summary of the imu counters"""
+        return (f"{self.samples} imu samples written, {self.dropped_samples} dropped, "
+                f"at most {self.max_fill}/{self.capacity} buffered")
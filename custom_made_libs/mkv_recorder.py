@@ -0,0 +1,98 @@
+"""Module recording the kinect streams into the native mkv format of the Azure Kinect SDK"""
+import pykinect_azure as pykinect
+from pykinect_azure.k4a import _k4a, Capture, Configuration, Device
+from pykinect_azure.k4arecord import _k4arecord
+
+from custom_made_libs.record_configuration import RecordConfiguration
+
+
+def device_configuration_from_record(record_configuration: RecordConfiguration) -> Configuration:
+    """Function returning the device configuration producing the tracks of a record configuration"""
+    config: Configuration = Configuration()
+    config.color_format = record_configuration.color_format
+    config.color_resolution = (record_configuration.color_resolution if record_configuration.color_track_enabled
+                               else _k4a.K4A_COLOR_RESOLUTION_OFF)
+    config.depth_mode = (record_configuration.depth_mode
+                         if record_configuration.depth_track_enabled or record_configuration.ir_track_enabled
+                         else _k4a.K4A_DEPTH_MODE_OFF)
+    config.camera_fps = record_configuration.camera_fps
+    config.depth_delay_off_color_usec = record_configuration.depth_delay_off_color_usec
+    config.wired_sync_mode = record_configuration.wired_sync_mode
+    config.subordinate_delay_off_master_usec = record_configuration.subordinate_delay_off_master_usec
+    return config
+
+
+def get_record_configuration(with_depth: bool) -> RecordConfiguration:
+    """Function returning the record configuration of the kinect hub recordings, matching its low res configuration"""
+    record_configuration = RecordConfiguration()
+    record_configuration.color_format = pykinect.K4A_IMAGE_FORMAT_COLOR_MJPG
+    record_configuration.color_resolution = pykinect.K4A_COLOR_RESOLUTION_720P
+    record_configuration.depth_mode = pykinect.K4A_DEPTH_MODE_WFOV_2X2BINNED
+    record_configuration.camera_fps = pykinect.K4A_FRAMES_PER_SECOND_30
+    record_configuration.color_track_enabled = True
+    record_configuration.depth_track_enabled = with_depth
+    record_configuration.ir_track_enabled = False
+    record_configuration.imu_track_enabled = True
+    return record_configuration
+
+
+class MkvRecorder:
+    """Class writing the captures and imu samples of a started device into an mkv recording.
+
+    The captures are handed to the SDK as they are, the color, depth and imu tracks are encoded and
+    written by the SDK without any per pixel work in python. The cameras and the imu of the device
+    must already be started with device_configuration_from_record(record_configuration).
+    """
+
+    def __init__(self, device: Device, record_configuration: RecordConfiguration, path: str):
+        self.path = path
+        self.record_configuration: RecordConfiguration = record_configuration
+        self.captures: int = 0      # captures written
+        self.imu_samples: int = 0   # imu samples written
+        self._handle = _k4arecord.k4a_record_t()
+        device_configuration = device_configuration_from_record(record_configuration)
+        if _k4arecord.k4a_record_create(path.encode("utf-8"), device.handle(), device_configuration.handle(),
+                                        self._handle) != _k4a.K4A_RESULT_SUCCEEDED:
+            raise Exception("failed to create the mkv recording " + path)
+        if record_configuration.imu_track_enabled:
+            record_dll = _k4arecord.record_dll
+            record_dll.k4a_record_add_imu_track.restype = _k4a.k4a_result_t
+            record_dll.k4a_record_add_imu_track.argtypes = (_k4arecord.k4a_record_t,)
+            if record_dll.k4a_record_add_imu_track(self._handle) != _k4a.K4A_RESULT_SUCCEEDED:
+                raise Exception("failed to add the imu track to " + path)
+            record_dll.k4a_record_write_imu_sample.restype = _k4a.k4a_result_t
+            record_dll.k4a_record_write_imu_sample.argtypes = (_k4arecord.k4a_record_t, _k4a.k4a_imu_sample_t)
+        if _k4arecord.k4a_record_write_header(self._handle) != _k4a.K4A_RESULT_SUCCEEDED:
+            raise Exception("failed to write the header of " + path)
+
+    def write_capture(self, capture: Capture) -> None:
+        """Function writing all the images of a capture to their tracks"""
+        if _k4arecord.k4a_record_write_capture(self._handle, capture.handle()) != _k4a.K4A_RESULT_SUCCEEDED:
+            raise Exception("failed to write a capture to " + self.path)
+        self.captures += 1
+
+    def write_imu_sample(self, imu_sample: _k4a.k4a_imu_sample_t) -> None:
+        """Function writing an imu sample to the imu track"""
+        if _k4arecord.record_dll.k4a_record_write_imu_sample(self._handle, imu_sample) != _k4a.K4A_RESULT_SUCCEEDED:
+            raise Exception("failed to write an imu sample to " + self.path)
+        self.imu_samples += 1
+
+    def write_pending_imu_samples(self, device: Device) -> int:
+        """Function writing the imu samples the device has queued, without waiting for new ones.
+
+        Returns:
+            int: Number of written samples.
+        """
+        written = 0
+        imu_sample = _k4a.k4a_imu_sample_t()
+        while _k4a.k4a_device_get_imu_sample(device.handle(), imu_sample, 0) == _k4a.K4A_WAIT_RESULT_SUCCEEDED:
+            self.write_imu_sample(imu_sample)
+            written += 1
+        return written
+
+    def close(self) -> None:
+        """Function flushing and closing the recording"""
+        if self._handle is not None:
+            _k4arecord.k4a_record_flush(self._handle)
+            _k4arecord.k4a_record_close(self._handle)
+            self._handle = None
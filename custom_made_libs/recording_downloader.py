@@ -0,0 +1,197 @@
+"""Module downloading the files of a recording from the Glasses3 unit"""
+import concurrent.futures
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+# files of a recording on the glasses -> name used in the download messages
+GLASSES_ARTIFACTS = {
+    "scenevideo.mp4": "Recording",
+    "gazedata.gz": "Gaze data",
+    "eventdata.gz": "Event data",
+    "imudata.gz": "IMU data",
+}
+DOWNLOAD_CHUNK_SIZE = 1 << 20   # bytes copied from the connection to the file at once
+DOWNLOAD_TIMEOUT = 30           # seconds to wait for the glasses to connect or send more data
+DOWNLOAD_RETRIES = 8            # times a dropped download is resumed before giving up
+DOWNLOAD_BACKOFF = 1.0          # seconds before the first retry, doubled for every following one
+DOWNLOAD_MAX_BACKOFF = 60.0     # longest pause between two retries
+PART_FILE_SUFFIX = ".part"      # suffix of a file while it is downloaded
+
+
+def new_download_session(connections: int = len(GLASSES_ARTIFACTS) + 1) -> requests.Session:
+    """Function returning an http session keeping a connection to the glasses open for every concurrent download"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=connections)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class IncompleteDownloadError(Exception):
+    """Exception raised when the glasses sent fewer bytes of a file than they announced"""
+
+
+# errors of a dropped connection, the download is resumed after them
+RETRIED_ERRORS = (requests.RequestException, urllib3.exceptions.HTTPError, IncompleteDownloadError)
+
+
+def retry_with_backoff(function, *args, made_progress=None, retries: int = DOWNLOAD_RETRIES,
+                       backoff: float = DOWNLOAD_BACKOFF):
+    """Function calling function(*args), calling it again after a growing pause when the connection fails.
+
+    Args:
+        made_progress: Function returning whether the failed call got anywhere, the pause then starts
+            over from backoff, so a long download over a flaky connection is not given up on.
+    """
+    attempt = 0
+    while True:
+        try:
+            return function(*args)
+        except RETRIED_ERRORS as exception:
+            if made_progress is not None and made_progress():
+                attempt = 0
+            if attempt == retries:
+                raise
+            delay = min(backoff * 2 ** attempt, DOWNLOAD_MAX_BACKOFF)
+            print(f"Warning: download failed ({exception!r}), trying again in {delay:g} s")
+            time.sleep(delay)
+            attempt += 1
+
+
+def parse_content_range_total(content_range: str) -> int:
+    """Function returning the file size of a Content-Range header, "bytes 100-199/1000" or "bytes */1000" """
+    if content_range is None or "/" not in content_range or content_range.endswith("/*"):
+        return None
+    return int(content_range.rsplit("/", 1)[1])
+
+
+def is_downloaded(session: requests.Session, url: str, path: str) -> bool:
+    """Function checking if a downloaded file holds every byte of the file on the glasses, without fetching them"""
+    size = os.path.getsize(path)
+    # the glasses answer 416 when nothing follows the last byte of the file
+    with session.get(url, headers={"Accept-Encoding": "identity", "Range": f"bytes={size}-"},
+                     stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        return response.status_code == 416 and parse_content_range_total(response.headers.get("Content-Range")) == size
+
+
+def download_artifact_once(session: requests.Session, url: str, path: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> bool:
+    """Function downloading the missing bytes of a file of a recording, see download_artifact"""
+    part_path = path + PART_FILE_SUFFIX
+    if not os.path.exists(part_path) and os.path.exists(path) and is_downloaded(session, url, path):
+        return True
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    # the bytes as they are stored, so the offsets of a resumed download match the file
+    headers = {"Accept-Encoding": "identity"}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+    with session.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        if response.status_code == 416 and offset:
+            if parse_content_range_total(response.headers.get("Content-Range")) != offset:
+                # longer than the file on the glasses, start over
+                os.remove(part_path)
+                raise IncompleteDownloadError(f"{url} is shorter than the {offset} bytes downloaded")
+            expected_size = offset
+        elif response.status_code in (200, 206):
+            if response.status_code == 200:
+                # the whole file, the glasses ignored the range
+                offset = 0
+            elif not response.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+                raise IncompleteDownloadError(f"{url} sent {response.headers.get('Content-Range')} instead of the bytes from {offset}")
+            expected_size = None
+            if response.headers.get("Content-Length") is not None:
+                expected_size = offset + int(response.headers["Content-Length"])
+            with open(part_path, "ab" if offset else "wb") as f:
+                shutil.copyfileobj(response.raw, f, chunk_size)
+        elif response.status_code >= 500:
+            raise IncompleteDownloadError(f"{url} answered {response.status_code}")
+        else:
+            return False
+    size = os.path.getsize(part_path)
+    if expected_size is not None and size != expected_size:
+        raise IncompleteDownloadError(f"{url} stopped after {size} of {expected_size} bytes")
+    # the file only gets its name once it is complete
+    os.replace(part_path, path)
+    return True
+
+
+def download_artifact(session: requests.Session, url: str, path: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> bool:
+    """Function downloading a file of a recording to path, returns False if the glasses do not have it.
+
+    The bytes are written to path.part, which is renamed to path once it holds as many bytes as the
+    glasses announced. When the connection drops the download is resumed from the end of the .part file
+    with an http range request after a growing pause, and a download of a file that is already complete
+    fetches nothing, so an interrupted download can be started again.
+    """
+    part_path = path + PART_FILE_SUFFIX
+    downloaded = [os.path.getsize(part_path) if os.path.exists(part_path) else 0]
+
+    def made_progress() -> bool:
+        size = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        progress = size > downloaded[0]
+        downloaded[0] = size
+        return progress
+
+    return retry_with_backoff(download_artifact_once, session, url, path, chunk_size, made_progress=made_progress)
+
+
+def download_start_timestamp(session: requests.Session, recording_url: str, directory: str, glasses_offset=3) -> bool:
+    """Function saving the creation time of a recording to start_timestamp.txt, returns False if it is unknown"""
+    response = session.get(recording_url, timeout=DOWNLOAD_TIMEOUT)
+    if response.status_code != 200:
+        return False
+    # read the meta data as a json and extract the key "created"
+    created = response.json()["created"]
+    # convert the created string to a datetime object
+    created = datetime.strptime(created, "%Y-%m-%dT%H:%M:%S.%fZ") + timedelta(hours=glasses_offset)
+    with open(os.path.join(directory, "start_timestamp.txt"), "w") as f:
+        f.write(str(created))
+    return True
+
+
+def download_recording(rec_name: str, http_url: str, directory: str, glasses_offset=3,
+                       chunk_size: int = DOWNLOAD_CHUNK_SIZE, session: requests.Session = None) -> dict:
+    """Function downloading the files and the start time of a recording concurrently over one http session.
+
+    Args:
+        rec_name (str): Uuid of the recording on the glasses.
+        http_url (str): Http address of the glasses, for example http://192.168.80.29.
+        directory (str): Folder to save the files in.
+        glasses_offset: Hours between the clock of the glasses and the clock of this computer.
+        chunk_size (int): Bytes copied from the connection to the file at once.
+        session (requests.Session): Session to download with, a new one is made and closed if None.
+
+    Returns:
+        dict: File name -> whether it was downloaded, "start_timestamp.txt" for the meta data.
+    """
+    recording_url = http_url + f"/recordings/{rec_name}"
+    own_session = session is None
+    if own_session:
+        session = new_download_session()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(GLASSES_ARTIFACTS) + 1) as executor:
+            futures = {
+                executor.submit(download_artifact, session, recording_url + "/" + file_name,
+                                os.path.join(directory, file_name), chunk_size): file_name
+                for file_name in GLASSES_ARTIFACTS
+            }
+            futures[executor.submit(retry_with_backoff, download_start_timestamp, session, recording_url, directory, glasses_offset)] = "start_timestamp.txt"
+            results = {}
+            for future in concurrent.futures.as_completed(futures):
+                file_name = futures[future]
+                name = GLASSES_ARTIFACTS.get(file_name, "Meta data")
+                try:
+                    results[file_name] = future.result()
+                except Exception as exception:
+                    print(f"Error: downloading {file_name} failed: {exception!r}")
+                    results[file_name] = False
+                print(f"{name} downloaded." if results[file_name] else f"{name} not downloaded.")
+    finally:
+        if own_session:
+            session.close()
+    return results
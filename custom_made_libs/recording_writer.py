@@ -0,0 +1,103 @@
+"""Module writing the captured kinect frames of a recording to disk"""
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from depth_io import DEPTH_FILE_SUFFIXES, DEPTH_FORMAT_NPY, DEPTH_FORMATS, encode_depth
+from kinect_container import (
+    KinectContainerWriter,
+    STREAM_COLOR,
+    STREAM_DEPTH,
+    STREAM_DEPTH_CAMERA,
+    STREAM_DEPTH_COLORED,
+    STREAM_IR,
+)
+from custom_made_libs.capture_telemetry import CaptureTelemetry
+from custom_made_libs.frame_write_queue import QueuedFrame
+
+# "container" appends the frames to chunk files, "directories" writes a folder per frame
+RECORDING_LAYOUTS = ("container", "directories")
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    ret, encoded = cv2.imencode(".png", image)
+    if not ret:
+        raise Exception("could not encode the image as png")
+    return encoded.tobytes()
+
+
+class RecordingWriter:
+    """Class encoding the images of the captured frames and writing them into a Kinect recording folder.
+
+    write is called by the writer threads of the write queue, the encode and write latencies of every
+    frame are recorded in the telemetry.
+    """
+
+    def __init__(self, kinect_dir: str, layout: str = "container", depth_format: str = DEPTH_FORMAT_NPY,
+                 telemetry: CaptureTelemetry = None):
+        if layout not in RECORDING_LAYOUTS:
+            raise Exception(f"unknown recording layout \"{layout}\", expected one of {RECORDING_LAYOUTS}")
+        if depth_format not in DEPTH_FORMATS:
+            raise Exception(f"unknown depth format \"{depth_format}\", expected one of {DEPTH_FORMATS}")
+        self.kinect_dir: str = kinect_dir
+        self.depth_format: str = depth_format
+        self.telemetry: CaptureTelemetry = telemetry
+        self.bytes_written: int = 0     # bytes of the encoded frame files
+        self._lock = threading.Lock()
+        self.container: KinectContainerWriter = KinectContainerWriter(kinect_dir) if layout == "container" else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        self.close()
+        return False
+
+    def write(self, frame: QueuedFrame) -> None:
+        """Function to write all the images of a frame to the file, or to the recording container"""
+        start_time = time.perf_counter()
+        files = self.encode_frame(frame)
+        encoded_time = time.perf_counter()
+        timestamp = str(frame.timestamp_usec)
+        if self.container is not None:
+            for stream, suffix, content in files:
+                self.container.append(stream, suffix, frame.timestamp_usec, content)
+        else:
+            os.mkdir(os.path.join(self.kinect_dir, timestamp))
+            for stream, suffix, content in files:
+                with open(os.path.join(self.kinect_dir, timestamp, timestamp + suffix), "wb") as file:
+                    file.write(content)
+        with self._lock:
+            self.bytes_written += sum(len(content) for stream, suffix, content in files)
+        if self.telemetry is not None:
+            self.telemetry.encode_latency.record(encoded_time - start_time)
+            self.telemetry.write_latency.record(time.perf_counter() - encoded_time)
+
+    def encode_frame(self, frame: QueuedFrame) -> list:
+        """Function encoding the images of a frame, returns (stream, file suffix, file content) for every file"""
+        files = []
+        if frame.color is not None and frame.color.ndim == 1:
+            # jpeg buffer from the device, saved without decoding it
+            files.append((STREAM_COLOR, ".jpg", frame.color))
+        elif frame.color is not None:
+            files.append((STREAM_COLOR, ".png", encode_png(frame.color)))
+        if frame.colored_depth is not None:
+            files.append((STREAM_DEPTH_COLORED, "_depth.png", encode_png(frame.colored_depth)))
+        if frame.transformed_depth is not None:
+            # only the raw depth in millimeters in the configured binary format, the greyscale and colored
+            # renditions are derived from it after the recording by depth_renditions
+            files.append((STREAM_DEPTH, DEPTH_FILE_SUFFIXES[self.depth_format], encode_depth(frame.transformed_depth, self.depth_format)))
+        if frame.depth is not None:
+            files.append((STREAM_DEPTH_CAMERA, "_depth_camera.png", encode_png(frame.depth)))
+        if frame.ir is not None:
+            files.append((STREAM_IR, "_ir.png", encode_png(frame.ir)))
+        return files
+
+    def close(self) -> None:
+        """Function closing the recording container once all the frames are written"""
+        if self.container is not None:
+            self.container.close()
+            self.container = None
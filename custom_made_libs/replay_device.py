@@ -0,0 +1,280 @@
+"""Module with a kinect device replaying a recording, so the capture pipeline can run without the hardware.
+
+ReplayDevice has the part of the interface of pykinect_azure.k4a.Device the kinect hub and the capture
+pipeline use, its captures the part of Capture and Image they read. The frames come from a replay source
+of mkv_extractor, or from RecordingReplaySource for a recording the kinect hub wrote.
+"""
+import os
+import time
+
+import cv2
+import numpy as np
+from pykinect_azure.k4a import _k4a
+
+from depth_io import DEPTH_FILE_SUFFIXES, decode_depth, load_frame_depth
+from frame_writer import find_color_file
+from kinect_container import KinectContainerReader, STREAM_COLOR, STREAM_DEPTH, is_container, read_kinect_timestamps
+from mkv_extractor import MKV_FILE_NAME, MkvReplaySource, SyntheticReplaySource
+from custom_made_libs.capture_pipeline import STAGE_IMU, STAGE_IR
+
+# stages a replayed recording has no data for, the imu is only replayed by the mkv extraction
+REPLAY_UNSUPPORTED_STAGES = (STAGE_IMU, STAGE_IR)
+SYNTHETIC_REPLAY = "synthetic"  # replay source name for generated frames, "synthetic:300" for 300 frames
+
+
+class ReplayImage:
+    """Class holding a replayed image with the methods of pykinect_azure.k4a.Image the capture pipeline uses"""
+
+    def __init__(self, image_format: int = None, buffer: np.ndarray = None, width: int = 0, height: int = 0,
+                 timestamp_usec: int = 0):
+        self.image_format: int = image_format
+        self.buffer: np.ndarray = buffer    # contiguous image data, None for an image the capture does not have
+        self.width: int = width
+        self.height: int = height
+        self.timestamp_usec: int = timestamp_usec
+
+    def is_valid(self) -> bool:
+        return self.buffer is not None
+
+    def handle(self):
+        return self
+
+    @property
+    def buffer_pointer(self) -> int:
+        return self.buffer.ctypes.data
+
+    def get_size(self) -> int:
+        return self.buffer.nbytes if self.buffer is not None else 0
+
+    def get_format(self) -> int:
+        return self.image_format
+
+    def get_width_pixels(self) -> int:
+        return self.width
+
+    def get_height_pixels(self) -> int:
+        return self.height
+
+    def get_stride_bytes(self) -> int:
+        return self.buffer.nbytes // self.height if self.image_format != _k4a.K4A_IMAGE_FORMAT_COLOR_MJPG else 0
+
+    def get_device_timestamp_usec(self) -> int:
+        return self.timestamp_usec
+
+    def to_numpy(self):
+        """Function returning (True, image) like Image.to_numpy, the jpeg of an mjpg image decoded"""
+        if not self.is_valid():
+            return False, None
+        if self.image_format == _k4a.K4A_IMAGE_FORMAT_COLOR_MJPG:
+            return True, cv2.imdecode(self.buffer, cv2.IMREAD_UNCHANGED)
+        return True, self.buffer.copy()
+
+
+class ReplayCapture:
+    """Class holding a replayed capture with the methods of pykinect_azure.k4a.Capture the kinect hub uses.
+
+    A recording only holds the depth transformed to the color camera, so the depth image of the capture
+    is that depth as well, and the capture has no infrared image.
+    """
+
+    def __init__(self, color_image: ReplayImage, depth_image: ReplayImage):
+        self.color_image: ReplayImage = color_image
+        self.depth_image: ReplayImage = depth_image
+
+    def is_valid(self) -> bool:
+        return self.color_image.is_valid()
+
+    def get_color_image_object(self) -> ReplayImage:
+        return self.color_image
+
+    def get_depth_image_object(self) -> ReplayImage:
+        return self.depth_image
+
+    def get_ir_image_object(self) -> ReplayImage:
+        return ReplayImage()
+
+    def get_color_image(self):
+        return self.color_image.to_numpy()
+
+    def get_depth_image(self):
+        return self.depth_image.to_numpy()
+
+    def get_transformed_depth_image(self):
+        # the replayed array itself, the pipeline copies it into its frame anyway
+        if not self.depth_image.is_valid():
+            return False, None
+        return True, self.depth_image.buffer
+
+
+def to_replay_capture(timestamp: int, color_image, depth_image: np.ndarray) -> ReplayCapture:
+    """Function returning the capture of a frame of a replay source, see MkvReplaySource.frames"""
+    if isinstance(color_image, bytes):
+        color_object = ReplayImage(_k4a.K4A_IMAGE_FORMAT_COLOR_MJPG, np.frombuffer(color_image, dtype=np.uint8),
+                                   timestamp_usec=timestamp)
+    else:
+        # decoded frames are captured as BGRA like the device sends them
+        if color_image.ndim == 3 and color_image.shape[2] == 3:
+            color_image = cv2.cvtColor(color_image, cv2.COLOR_BGR2BGRA)
+        color_object = ReplayImage(_k4a.K4A_IMAGE_FORMAT_COLOR_BGRA32, np.ascontiguousarray(color_image),
+                                   color_image.shape[1], color_image.shape[0], timestamp)
+    depth_object = ReplayImage()
+    if depth_image is not None:
+        depth_object = ReplayImage(_k4a.K4A_IMAGE_FORMAT_DEPTH16, np.ascontiguousarray(depth_image, dtype=np.uint16),
+                                   depth_image.shape[1], depth_image.shape[0], timestamp)
+    return ReplayCapture(color_object, depth_object)
+
+
+class RecordingReplaySource:
+    """Class replaying the frames of a Kinect folder the kinect hub recorded, in the form of MkvReplaySource.
+
+    Both the container and the folder per frame layouts are read, without the imu samples.
+    """
+
+    def __init__(self, kinect_dir: str):
+        self.kinect_dir: str = kinect_dir
+
+    def frames(self):
+        """Yield (timestamp in microseconds, jpeg buffer or BGR image, depth image or None) for every frame"""
+        if is_container(self.kinect_dir):
+            reader = KinectContainerReader(self.kinect_dir)
+            color_suffix = reader.streams[STREAM_COLOR]
+            depth_format = None
+            if STREAM_DEPTH in reader.streams:
+                depth_format = next(depth_format for depth_format, suffix in DEPTH_FILE_SUFFIXES.items()
+                                    if suffix == reader.streams[STREAM_DEPTH])
+            for timestamp in reader.timestamps(STREAM_COLOR):
+                timestamp = int(timestamp)
+                color_image = reader.read(STREAM_COLOR, timestamp)
+                if color_suffix != ".jpg":
+                    color_image = cv2.imdecode(np.frombuffer(color_image, dtype=np.uint8), cv2.IMREAD_COLOR)
+                depth_image = None
+                if depth_format is not None and reader.find(STREAM_DEPTH, timestamp) is not None:
+                    depth_image = decode_depth(reader.read(STREAM_DEPTH, timestamp), depth_format)
+                yield timestamp, color_image, depth_image
+            return
+        for timestamp in read_kinect_timestamps(self.kinect_dir):
+            frame_dir = os.path.join(self.kinect_dir, str(timestamp))
+            color_path = find_color_file(frame_dir, str(timestamp))
+            if color_path is None:
+                continue
+            if color_path.endswith(".jpg"):
+                with open(color_path, "rb") as f:
+                    color_image = f.read()
+            else:
+                color_image = cv2.imread(color_path, cv2.IMREAD_COLOR)
+            try:
+                depth_image = load_frame_depth(frame_dir, str(timestamp), mmap=False)
+            except FileNotFoundError:
+                depth_image = None
+            yield timestamp, color_image, depth_image
+
+    def imu_blocks(self):
+        return iter(())
+
+    def close(self) -> None:
+        pass
+
+
+def open_replay_source(name: str):
+    """Function returning the replay source of a name.
+
+    Args:
+        name (str): "synthetic" or "synthetic:<frames>" for generated frames, an mkv file, or the Kinect
+            folder of a recording, which is replayed from its mkv recording if it has one.
+    """
+    if name == SYNTHETIC_REPLAY or name.startswith(SYNTHETIC_REPLAY + ":"):
+        frame_count = name[len(SYNTHETIC_REPLAY) + 1:]
+        return SyntheticReplaySource(int(frame_count)) if frame_count else SyntheticReplaySource()
+    if os.path.isfile(name):
+        return MkvReplaySource(name)
+    if not os.path.isdir(name):
+        raise Exception(f"no recording to replay at \"{name}\"")
+    if os.path.basename(os.path.normpath(name)) != "Kinect" and os.path.isdir(os.path.join(name, "Kinect")):
+        # the folder of a whole recording
+        name = os.path.join(name, "Kinect")
+    if os.path.exists(os.path.join(name, MKV_FILE_NAME)):
+        return MkvReplaySource(os.path.join(name, MKV_FILE_NAME))
+    return RecordingReplaySource(name)
+
+
+class ReplayDevice:
+    """Class replaying the frames of a replay source through the interface of pykinect_azure.k4a.Device.
+
+    update returns the next frame as a capture, at the pace of its device timestamps when realtime is set,
+    otherwise as fast as it is called. Once the last frame was returned is_valid is False and update raises,
+    so a capture loop has to stop on is_valid, unless the device loops, then the source starts over with
+    timestamps continuing after the last frame.
+
+    Args:
+        source: MkvReplaySource, SyntheticReplaySource or RecordingReplaySource.
+        realtime (bool): Wait between the frames like the device would.
+        loop (bool): Start the source over when it ends.
+        preload (bool): Read all the frames before the replay, so reading the source is not measured.
+    """
+
+    def __init__(self, source, realtime: bool = True, loop: bool = False, preload: bool = False):
+        self.source = source
+        self.realtime: bool = realtime
+        self.loop: bool = loop
+        self.frames: list = list(source.frames()) if preload else None
+        self.replayed_frames: int = 0
+        self.record = None
+        self.recording: bool = False
+        self._frame_iterator = None
+        self._next_frame: tuple = None
+        self._timestamp_offset: int = 0   # added to the timestamps of the current pass over a looping source
+        self._last_timestamp: int = 0
+        self._first_timestamp: int = None
+        self._start_time: float = None
+
+    def start(self, configuration=None, record: bool = False, record_filepath: str = None) -> None:
+        """Function starting the replay from the first frame, the configuration of the device is ignored"""
+        self._frame_iterator = self._iterate_frames()
+        self._next_frame = next(self._frame_iterator, None)
+        self._first_timestamp = None
+        self._start_time = None
+
+    def _iterate_frames(self):
+        while True:
+            first_timestamp = None
+            for timestamp, color_image, depth_image in (self.frames if self.frames is not None else self.source.frames()):
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+                yield timestamp + self._timestamp_offset, color_image, depth_image
+                self._last_timestamp = timestamp + self._timestamp_offset
+            if not self.loop or first_timestamp is None:
+                return
+            # one frame interval after the last frame, assuming 30 frames per second
+            self._timestamp_offset = self._last_timestamp - first_timestamp + 1000000 // 30
+
+    def is_valid(self) -> bool:
+        return self._next_frame is not None
+
+    def handle(self):
+        return self
+
+    def update(self, timeout_in_ms: int = _k4a.K4A_WAIT_INFINITE) -> ReplayCapture:
+        """Function returning the next frame as a capture, raises once the last frame was returned"""
+        if self._next_frame is None:
+            raise Exception("the replayed recording has no frames left")
+        timestamp, color_image, depth_image = self._next_frame
+        if self.realtime:
+            if self._first_timestamp is None:
+                self._first_timestamp = timestamp
+                self._start_time = time.perf_counter()
+            delay = self._start_time + (timestamp - self._first_timestamp) / 1000000 - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self._next_frame = next(self._frame_iterator, None)
+        self.replayed_frames += 1
+        return to_replay_capture(timestamp, color_image, depth_image)
+
+    def stop_cameras(self) -> None:
+        pass
+
+    def stop_imu(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self._next_frame = None
+        self.source.close()
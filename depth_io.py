@@ -0,0 +1,137 @@
+"""Module for writing and loading the kinect depth frames"""
+import argparse
+import io
+import os
+
+import cv2
+import numpy as np
+
+# formats a depth frame can be saved in, the depth is in millimeters
+DEPTH_FORMAT_NPY = "npy"        # raw uint16 array, can be memory mapped
+DEPTH_FORMAT_PNG16 = "png16"    # lossless 16 bit single channel png
+DEPTH_FORMAT_CSV = "csv"        # text, only for exporting
+DEPTH_FORMATS = (DEPTH_FORMAT_NPY, DEPTH_FORMAT_PNG16, DEPTH_FORMAT_CSV)
+DEPTH_FILE_SUFFIXES = {
+    DEPTH_FORMAT_NPY: "_depth.npy",
+    DEPTH_FORMAT_PNG16: "_depth16.png",
+    DEPTH_FORMAT_CSV: "_depth.csv",
+}
+# folder of the Kinect folder the depth renditions are written to, for recordings without frame folders
+DEPTH_RENDITIONS_DIR_NAME = "depth_renditions"
+
+
+def depth_file_path(frame_dir: str, timestamp: str, depth_format: str) -> str:
+    """Function returning the path of the depth file of a frame in the given format"""
+    return os.path.join(frame_dir, timestamp + DEPTH_FILE_SUFFIXES[depth_format])
+
+
+def encode_depth(depth_image: np.ndarray, depth_format: str = DEPTH_FORMAT_NPY) -> bytes:
+    """Function returning the content of a depth file of the given format, without writing it"""
+    depth_image = np.asarray(depth_image, dtype=np.uint16)
+    if depth_format == DEPTH_FORMAT_NPY:
+        buffer = io.BytesIO()
+        np.save(buffer, depth_image)
+        return buffer.getvalue()
+    if depth_format == DEPTH_FORMAT_PNG16:
+        ret, encoded = cv2.imencode(".png", depth_image)
+        if not ret:
+            raise OSError("could not encode the depth image as png")
+        return encoded.tobytes()
+    if depth_format == DEPTH_FORMAT_CSV:
+        buffer = io.BytesIO()
+        np.savetxt(buffer, depth_image, delimiter=",", fmt='%d')
+        return buffer.getvalue()
+    raise ValueError(f"unknown depth format \"{depth_format}\", expected one of {DEPTH_FORMATS}")
+
+
+def decode_depth(content: bytes, depth_format: str = DEPTH_FORMAT_NPY) -> np.ndarray:
+    """Function returning the depth image of the content of a depth file of the given format"""
+    if depth_format == DEPTH_FORMAT_NPY:
+        return np.load(io.BytesIO(content))
+    if depth_format == DEPTH_FORMAT_PNG16:
+        depth_image = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        if depth_image is None:
+            raise OSError("could not decode the png depth image")
+        return depth_image
+    if depth_format == DEPTH_FORMAT_CSV:
+        return np.loadtxt(io.BytesIO(content), delimiter=",", dtype=np.uint16, ndmin=2)
+    raise ValueError(f"unknown depth format \"{depth_format}\", expected one of {DEPTH_FORMATS}")
+
+
+def write_depth(frame_dir: str, timestamp: str, depth_image: np.ndarray, depth_format: str = DEPTH_FORMAT_NPY) -> str:
+    """Function writing the depth image of a frame, returns the written path"""
+    content = encode_depth(depth_image, depth_format)
+    path = depth_file_path(frame_dir, timestamp, depth_format)
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+def colorize_depth(depth_image: np.ndarray) -> np.ndarray:
+    """Function returning a BGR image of the depth colored like the Azure Kinect viewer, only for looking at it"""
+    return cv2.applyColorMap(cv2.convertScaleAbs(depth_image, alpha=0.05), cv2.COLORMAP_JET)
+
+
+def find_depth_file(frame_dir: str, timestamp: str) -> str:
+    """Function returning the depth file of a frame, preferring the binary formats, or None if there is none"""
+    for depth_format in DEPTH_FORMATS:
+        path = depth_file_path(frame_dir, timestamp, depth_format)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_depth(path: str, mmap: bool = True) -> np.ndarray:
+    """Function loading a depth file of any format as a uint16 array.
+
+    Args:
+        path (str): Path of a _depth.npy, _depth16.png or _depth.csv file.
+        mmap (bool): Memory map .npy files instead of reading them.
+    """
+    if path.endswith(DEPTH_FILE_SUFFIXES[DEPTH_FORMAT_NPY]):
+        return np.load(path, mmap_mode="r" if mmap else None)
+    if path.endswith(DEPTH_FILE_SUFFIXES[DEPTH_FORMAT_PNG16]):
+        depth_image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if depth_image is None:
+            raise OSError("could not read " + path)
+        return depth_image
+    if path.endswith(DEPTH_FILE_SUFFIXES[DEPTH_FORMAT_CSV]):
+        return np.loadtxt(path, delimiter=",", dtype=np.uint16, ndmin=2)
+    raise ValueError("unknown depth file " + path)
+
+
+def load_frame_depth(frame_dir: str, timestamp: str, mmap: bool = True) -> np.ndarray:
+    """Function loading the depth of a frame, whichever format it was saved in"""
+    path = find_depth_file(frame_dir, timestamp)
+    if path is None:
+        raise FileNotFoundError("no depth file for frame " + timestamp + " in " + frame_dir)
+    return load_depth(path, mmap)
+
+
+def export_depth_csv(kinect_dir: str) -> int:
+    """Function writing a _depth.csv next to every binary depth file of a kinect recording folder.
+
+    Returns:
+        int: Number of exported frames, frames that already have a csv are skipped.
+    """
+    exported = 0
+    for timestamp in sorted(os.listdir(kinect_dir)):
+        frame_dir = os.path.join(kinect_dir, timestamp)
+        if not os.path.isdir(frame_dir):
+            continue
+        if os.path.exists(depth_file_path(frame_dir, timestamp, DEPTH_FORMAT_CSV)):
+            continue
+        path = find_depth_file(frame_dir, timestamp)
+        if path is None:
+            continue
+        write_depth(frame_dir, timestamp, load_depth(path), DEPTH_FORMAT_CSV)
+        exported += 1
+    return exported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the binary depth frames of a recording as csv files")
+    parser.add_argument("recording_path", help="recording folder, for example ./recordings/recording_name")
+    args = parser.parse_args()
+    count = export_depth_csv(os.path.join(args.recording_path, "Kinect"))
+    print(f"Exported {count} depth frames to csv.")
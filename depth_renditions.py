@@ -0,0 +1,208 @@
+"""Module deriving the colored and greyscale renditions of the kinect depth frames after a recording.
+
+The capture only saves the raw depth of every frame. The renditions are written on demand and kept as a
+cache: a rendition is only written again when the raw depth it was derived from is newer than it. They are
+written next to the raw depth in the folder per frame layout, and to the depth_renditions folder of the
+Kinect folder for a recording container or an mkv recording that was not extracted, which are read as they
+are. A csv of the depth is not a rendition, depth_io.export_depth_csv writes it as a depth file.
+"""
+import argparse
+import concurrent.futures
+import os
+import time
+
+import cv2
+import numpy as np
+
+from depth_io import DEPTH_FILE_SUFFIXES, DEPTH_RENDITIONS_DIR_NAME, colorize_depth, decode_depth, find_depth_file, load_depth
+from kinect_container import KinectContainerReader, STREAM_DEPTH, chunk_path, is_container, read_kinect_timestamps
+from mkv_extractor import MKV_FILE_NAME, MkvReplaySource, is_extracted
+
+RENDITION_COLORED = "colored"       # BGR png of the depth colored like the Azure Kinect viewer
+RENDITION_GREYSCALE = "greyscale"   # 16 bit greyscale png of the depth in millimeters
+RENDITIONS = (RENDITION_COLORED, RENDITION_GREYSCALE)
+RENDITION_FILE_SUFFIXES = {
+    RENDITION_COLORED: "_depth.png",
+    RENDITION_GREYSCALE: "_depth_greyscale.png",
+}
+FRAMES_PER_TASK = 16                # frames rendered by a worker per task
+
+
+def rendition_path(frame_dir: str, timestamp: str, rendition: str) -> str:
+    """Function returning the path of a depth rendition of a frame"""
+    return os.path.join(frame_dir, timestamp + RENDITION_FILE_SUFFIXES[rendition])
+
+
+def encode_rendition(depth_image: np.ndarray, rendition: str) -> bytes:
+    """Function returning the file content of a depth rendition"""
+    if rendition == RENDITION_COLORED:
+        ret, encoded = cv2.imencode(".png", colorize_depth(depth_image))
+    elif rendition == RENDITION_GREYSCALE:
+        ret, encoded = cv2.imencode(".png", np.asarray(depth_image, dtype=np.uint16))
+    else:
+        raise ValueError(f"unknown depth rendition \"{rendition}\", expected one of {RENDITIONS}")
+    if not ret:
+        raise OSError(f"could not encode the {rendition} depth rendition")
+    return encoded.tobytes()
+
+
+def is_rendition_current(path: str, depth_path: str) -> bool:
+    """Function checking if a rendition was written after the raw depth it was derived from"""
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(depth_path)
+
+
+def render_depth(output_dir: str, timestamp: str, depth_path: str, load_depth_image, renditions: tuple) -> int:
+    """Function writing the renditions of a frame that are missing or older than the file holding its raw depth.
+
+    Args:
+        load_depth_image: Function returning the raw depth, only called when a rendition is written.
+
+    Returns:
+        int: Number of written renditions.
+    """
+    depth_image = None
+    written = 0
+    for rendition in renditions:
+        path = rendition_path(output_dir, timestamp, rendition)
+        if is_rendition_current(path, depth_path):
+            continue
+        if depth_image is None:
+            depth_image = load_depth_image()
+        content = encode_rendition(depth_image, rendition)
+        # the rendition only appears once it is complete, an interrupted run leaves no broken cache
+        with open(path + ".tmp", "wb") as f:
+            f.write(content)
+        os.replace(path + ".tmp", path)
+        written += 1
+    return written
+
+
+def render_frame(frame_dir: str, timestamp: str, renditions: tuple = RENDITIONS) -> int:
+    """Function writing the renditions of a frame folder that are missing or older than its raw depth.
+
+    Returns:
+        int: Number of written renditions.
+    """
+    depth_path = find_depth_file(frame_dir, timestamp)
+    if depth_path is None:
+        return 0
+    return render_depth(frame_dir, timestamp, depth_path, lambda: load_depth(depth_path), renditions)
+
+
+def get_depth_rendition(frame_dir: str, timestamp: str, rendition: str) -> str:
+    """Function returning the path of a rendition of a frame, writing it first if it is not cached"""
+    if find_depth_file(frame_dir, timestamp) is None:
+        raise FileNotFoundError("no depth file for frame " + timestamp + " in " + frame_dir)
+    render_frame(frame_dir, timestamp, (rendition,))
+    return rendition_path(frame_dir, timestamp, rendition)
+
+
+def render_frames(kinect_dir: str, timestamps: list, renditions: tuple) -> int:
+    """Function rendering a batch of frame folders inside a worker process, returns the number of written renditions"""
+    return sum(render_frame(os.path.join(kinect_dir, str(timestamp)), str(timestamp), renditions) for timestamp in timestamps)
+
+
+def render_container_frames(kinect_dir: str, timestamps: list, renditions: tuple) -> int:
+    """Function rendering a batch of frames of a recording container inside a worker process.
+
+    The renditions of a frame are compared with the chunk file its raw depth is in, chunks are only appended to.
+    """
+    reader = KinectContainerReader(kinect_dir)
+    depth_format = next(depth_format for depth_format, suffix in DEPTH_FILE_SUFFIXES.items()
+                        if suffix == reader.streams[STREAM_DEPTH])
+    output_dir = os.path.join(kinect_dir, DEPTH_RENDITIONS_DIR_NAME)
+    written = 0
+    for timestamp in timestamps:
+        record = reader.find(STREAM_DEPTH, timestamp)
+        written += render_depth(output_dir, str(timestamp), chunk_path(kinect_dir, STREAM_DEPTH, int(record["chunk"])),
+                                lambda: decode_depth(reader.read_record(STREAM_DEPTH, record), depth_format), renditions)
+    return written
+
+
+def render_images(output_dir: str, depth_path: str, frames: list, renditions: tuple) -> int:
+    """Function rendering a batch of (timestamp, depth image) read from depth_path inside a worker process"""
+    return sum(render_depth(output_dir, str(timestamp), depth_path, lambda depth_image=depth_image: depth_image, renditions)
+               for timestamp, depth_image in frames)
+
+
+def render_mkv(executor: concurrent.futures.Executor, kinect_dir: str, renditions: tuple, max_pending: int) -> int:
+    """Function rendering the frames of the mkv recording of a Kinect folder, read in order by this process.
+
+    At most max_pending batches of depth images are handed to the workers at once.
+    """
+    mkv_path = os.path.join(kinect_dir, MKV_FILE_NAME)
+    output_dir = os.path.join(kinect_dir, DEPTH_RENDITIONS_DIR_NAME)
+    written = 0
+    pending = set()
+    batch = []
+    source = MkvReplaySource(mkv_path)
+    try:
+        for timestamp, color_image, depth_image in source.frames():
+            if depth_image is None or all(is_rendition_current(rendition_path(output_dir, str(timestamp), rendition), mkv_path)
+                                          for rendition in renditions):
+                continue
+            batch.append((timestamp, depth_image))
+            if len(batch) < FRAMES_PER_TASK:
+                continue
+            pending.add(executor.submit(render_images, output_dir, mkv_path, batch, renditions))
+            batch = []
+            if len(pending) >= max_pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                written += sum(future.result() for future in done)
+        if batch:
+            pending.add(executor.submit(render_images, output_dir, mkv_path, batch, renditions))
+    finally:
+        source.close()
+        done, pending = concurrent.futures.wait(pending)
+    return written + sum(future.result() for future in done)
+
+
+def render_recording(kinect_dir: str, renditions: tuple = RENDITIONS, workers: int = None) -> int:
+    """Function writing the depth renditions of every frame of a Kinect recording folder in a process pool.
+
+    Args:
+        kinect_dir (str): Kinect folder of the recording.
+        renditions (tuple): Renditions to write, out of RENDITIONS.
+        workers (int): Number of worker processes, defaults to the number of CPUs.
+
+    Returns:
+        int: Number of written renditions, cached renditions are not counted.
+    """
+    for rendition in renditions:
+        if rendition not in RENDITIONS:
+            raise ValueError(f"unknown depth rendition \"{rendition}\", expected one of {RENDITIONS}")
+    renditions = tuple(renditions)
+    mkv_recording = os.path.exists(os.path.join(kinect_dir, MKV_FILE_NAME)) and not is_extracted(kinect_dir)
+    if is_container(kinect_dir) or mkv_recording:
+        # the recording is read as it is, its renditions get a folder of their own
+        os.makedirs(os.path.join(kinect_dir, DEPTH_RENDITIONS_DIR_NAME), exist_ok=True)
+    written = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        if mkv_recording:
+            return render_mkv(executor, kinect_dir, renditions, 2 * (workers or os.cpu_count()))
+        if is_container(kinect_dir):
+            reader = KinectContainerReader(kinect_dir)
+            timestamps = reader.timestamps(STREAM_DEPTH).tolist() if STREAM_DEPTH in reader.streams else []
+            render_function = render_container_frames
+        else:
+            timestamps = read_kinect_timestamps(kinect_dir)
+            render_function = render_frames
+        batches = [timestamps[start:start + FRAMES_PER_TASK] for start in range(0, len(timestamps), FRAMES_PER_TASK)]
+        futures = [executor.submit(render_function, kinect_dir, batch, renditions) for batch in batches]
+        for future in concurrent.futures.as_completed(futures):
+            written += future.result()
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the colored and greyscale renditions of the depth frames of a recording")
+    parser.add_argument("recording_path", help="recording folder, for example ./recordings/recording_name")
+    parser.add_argument("-r", "--renditions", default=",".join(RENDITIONS),
+                        help="comma separated renditions to write (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="number of worker processes (default: number of CPUs)")
+    args = parser.parse_args()
+    start_time = time.perf_counter()
+    count = render_recording(os.path.join(args.recording_path, "Kinect"),
+                             tuple(rendition.strip() for rendition in args.renditions.split(",") if rendition.strip()),
+                             args.workers)
+    print(f"Wrote {count} depth renditions in {time.perf_counter() - start_time:.2f} s.")
@@ -0,0 +1,176 @@
+"""Module converting the depth files of whole recording trees between the depth formats of depth_io.
+
+Every frame folder under the given folders is converted in a process pool. A converted file is decoded
+again and compared with the source before it is written, and only appears once it is complete, so a run
+can be interrupted and started again: frames whose converted file is newer than their source are skipped.
+"""
+import argparse
+import concurrent.futures
+import os
+import time
+
+import numpy as np
+
+from depth_io import DEPTH_FILE_SUFFIXES, DEPTH_FORMATS, decode_depth, depth_file_path, encode_depth, load_depth
+
+FRAMES_PER_TASK = 32    # frames converted by a worker per task
+
+
+class TranscodeResult:
+    """Class counting the frames and bytes of a conversion, added up over the tasks of the process pool"""
+
+    def __init__(self):
+        self.converted: int = 0         # frames written in the target format
+        self.skipped: int = 0           # frames already converted by an earlier run
+        self.bytes_read: int = 0        # bytes of the converted source files
+        self.bytes_written: int = 0     # bytes of the written files
+        self.failed: list = []          # (path, reason) of the frames that could not be converted
+
+    def add(self, other) -> None:
+        self.converted += other.converted
+        self.skipped += other.skipped
+        self.bytes_read += other.bytes_read
+        self.bytes_written += other.bytes_written
+        self.failed.extend(other.failed)
+
+    def report(self, seconds: float) -> str:
+        """Function returning a short summary of the conversion and its throughput"""
+        megabytes_read = self.bytes_read / 1000000
+        megabytes_written = self.bytes_written / 1000000
+        rate = (megabytes_read / seconds) if seconds else 0
+        return (f"{self.converted} depth frames converted, {self.skipped} already converted, {len(self.failed)} failed, "
+                f"{megabytes_read:.1f} MB read and {megabytes_written:.1f} MB written in {seconds:.2f} s ({rate:.1f} MB/s read)")
+
+
+def find_depth_frames(root_dirs: list, source_formats: tuple, target_format: str) -> list:
+    """Function returning (frame folder, timestamp, source path) for every frame with a depth file to convert.
+
+    A frame with depth files in several source formats is converted from the first one in DEPTH_FORMATS,
+    the binary formats before csv.
+    """
+    frames = []
+    for root_dir in root_dirs:
+        for frame_dir, dir_names, file_names in os.walk(root_dir):
+            dir_names.sort()
+            file_names = set(file_names)
+            timestamps = {}
+            for file_name in file_names:
+                for depth_format in source_formats:
+                    suffix = DEPTH_FILE_SUFFIXES[depth_format]
+                    if file_name.endswith(suffix):
+                        timestamp = file_name[:-len(suffix)]
+                        if DEPTH_FORMATS.index(depth_format) < DEPTH_FORMATS.index(timestamps.get(timestamp, DEPTH_FORMATS[-1])) \
+                                or timestamp not in timestamps:
+                            timestamps[timestamp] = depth_format
+            for timestamp in sorted(timestamps):
+                frames.append((frame_dir, timestamp, depth_file_path(frame_dir, timestamp, timestamps[timestamp])))
+    return frames
+
+
+def holds_depth(path: str, depth_image: np.ndarray) -> bool:
+    """Function checking if a depth file decodes to the given depth, a file that can not be decoded does not"""
+    try:
+        decoded_image = load_depth(path, mmap=False)
+    except Exception:
+        return False
+    return decoded_image.shape == depth_image.shape and np.array_equal(decoded_image, depth_image)
+
+
+def transcode_frame(frame_dir: str, timestamp: str, source_path: str, target_format: str,
+                    remove_source: bool = False) -> TranscodeResult:
+    """Function converting the depth file of a frame to the target format.
+
+    The converted file is decoded again and must hold the same depth as the source, otherwise the frame
+    is counted as failed and nothing is written. Before a source is removed, a converted file left by an
+    earlier run is checked the same way, and written again if it differs.
+    """
+    result = TranscodeResult()
+    target_path = depth_file_path(frame_dir, timestamp, target_format)
+    depth_image = None
+    if os.path.exists(target_path) and os.path.getmtime(target_path) >= os.path.getmtime(source_path):
+        if remove_source:
+            depth_image = load_depth(source_path, mmap=False)
+        if depth_image is None or holds_depth(target_path, depth_image):
+            result.skipped += 1
+            if remove_source:
+                os.remove(source_path)
+            return result
+    if depth_image is None:
+        depth_image = load_depth(source_path, mmap=False)
+    content = encode_depth(depth_image, target_format)
+    decoded_image = decode_depth(content, target_format)
+    if decoded_image.shape != depth_image.shape or not np.array_equal(decoded_image, depth_image):
+        result.failed.append((source_path, "the converted depth differs from the source"))
+        return result
+    with open(target_path + ".tmp", "wb") as f:
+        f.write(content)
+    os.replace(target_path + ".tmp", target_path)
+    result.converted += 1
+    result.bytes_read += os.path.getsize(source_path)
+    result.bytes_written += len(content)
+    if remove_source:
+        os.remove(source_path)
+    return result
+
+
+def transcode_frames(frames: list, target_format: str, remove_source: bool) -> TranscodeResult:
+    """Function converting a batch of frames inside a worker process"""
+    result = TranscodeResult()
+    for frame_dir, timestamp, source_path in frames:
+        try:
+            result.add(transcode_frame(frame_dir, timestamp, source_path, target_format, remove_source))
+        except Exception as exception:
+            result.failed.append((source_path, repr(exception)))
+    return result
+
+
+def transcode_depth(root_dirs: list, target_format: str, source_formats: tuple = None, workers: int = None,
+                    remove_source: bool = False) -> TranscodeResult:
+    """Function converting the depth files of every frame under the given folders in a process pool.
+
+    Args:
+        root_dirs (list): Folders searched for frame folders, a recording, a Kinect folder or a whole archive.
+        target_format (str): Format to convert to, one of depth_io.DEPTH_FORMATS.
+        source_formats (tuple): Formats to convert from, defaults to every other format.
+        workers (int): Number of worker processes, defaults to the number of CPUs.
+        remove_source (bool): Remove a source file once its frame is converted and verified.
+
+    Returns:
+        TranscodeResult: Counts of the converted, skipped and failed frames and of the bytes.
+    """
+    if target_format not in DEPTH_FORMATS:
+        raise ValueError(f"unknown depth format \"{target_format}\", expected one of {DEPTH_FORMATS}")
+    if source_formats is None:
+        source_formats = tuple(depth_format for depth_format in DEPTH_FORMATS if depth_format != target_format)
+    for depth_format in source_formats:
+        if depth_format not in DEPTH_FORMATS or depth_format == target_format:
+            raise ValueError(f"can not convert from \"{depth_format}\" to \"{target_format}\"")
+    frames = find_depth_frames(root_dirs, source_formats, target_format)
+    batches = [frames[start:start + FRAMES_PER_TASK] for start in range(0, len(frames), FRAMES_PER_TASK)]
+    result = TranscodeResult()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(transcode_frames, batch, target_format, remove_source) for batch in batches]
+        for future in concurrent.futures.as_completed(futures):
+            result.add(future.result())
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the depth files of recordings between csv, npy and 16 bit png")
+    parser.add_argument("paths", nargs="+", help="folders to convert, for example ./recordings or ./recordings/recording_name")
+    parser.add_argument("-t", "--to", required=True, choices=DEPTH_FORMATS, help="format to convert to")
+    parser.add_argument("-f", "--from", dest="source_formats", default=None,
+                        help="comma separated formats to convert from (default: every other format)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--remove-source", action="store_true",
+                        help="remove the source files once they are converted and verified")
+    args = parser.parse_args()
+    source_formats = None
+    if args.source_formats is not None:
+        source_formats = tuple(depth_format.strip() for depth_format in args.source_formats.split(",") if depth_format.strip())
+    start_time = time.perf_counter()
+    result = transcode_depth(args.paths, args.to, source_formats, args.workers, args.remove_source)
+    for path, reason in result.failed:
+        print(f"Error: could not convert {path}: {reason}")
+    print(result.report(time.perf_counter() - start_time))
@@ -1,134 +1,363 @@
 import json # import somewhere else
 import os   # later do for the entire directory
 import cv2
-import shutil
 import gzip
 import heapq
 import numpy as np
-from datetime import datetime, timedelta
-import copy
-import sys
+from datetime import datetime
+import time
+import argparse
+from frame_writer import OUTPUT_MODE_COPY, OUTPUT_MODES, FrameWriter, write_frame
+from processing_manifest import ProcessingManifest, frame_sources
+from sensor_cache import load_gaze_columns, load_glasses_imu_columns
+from kinect_container import KinectContainerReader, STREAM_COLOR, STREAM_DEPTH, is_container, read_kinect_timestamps
+from mkv_extractor import MKV_FILE_NAME, extract_mkv, is_extracted
+from gaze_validator import GazeThresholds, GazeWindow, GazeWindowView, find_gaze_windows, validate_gaze_window, validate_gaze_windows
 
-REC_DIR_LOC = './recordings'
+REC_DIR_LOC = './recordings'   # default folders for the command line
 POST_DIR_LOC = './processed_recordings'
-rec_name = ''
 
 class FrameData:
     # NOTE: all timestamps must already be synchronized to the kinect image at this point
     # NOTE: imu data updating is not properly implemented
-    def __init__(self, recording_name: str, glasses_gyro : np.array):
-        self.recording_name = recording_name
+    def __init__(self, recording_path: str, output_path: str, thresholds: GazeThresholds = None,
+                 output_mode: str = OUTPUT_MODE_COPY, writer: FrameWriter = None,
+                 manifest: ProcessingManifest = None, container: KinectContainerReader = None):
+        self.recording_path = recording_path    # recording folder with the Kinect and Glasses3 folders
+        self.container = container              # container the kinect frames are read from, None for frame folders
+        self.output_path = output_path          # folder in which the accepted frames are saved
+        self.output_mode = output_mode          # how kinect files are placed in the output, see frame_writer
+        self.writer = writer                    # background writer for the saved frames, None to write in place
+        self.manifest = manifest                # manifest of the frames already written, None to always write
+        if thresholds is None:
+            thresholds = GazeThresholds()
         
         self.kinect_image_name : str = None      # name of timestamp.png
-        self.current_gaze : list = []     # gaze data queue for the latest kinect image, changes every save
-        self.glasses_imu : dict = None      # current imu data
-        self.glasses_gaze : list = []     # gaze data queue, will keep updating after save
+        self.current_gaze : GazeWindowView = None     # read-only view of the gaze window for the latest kinect image
+        self.glasses_imu : LazyImuSample = None      # current imu data
+        self.glasses_gaze : GazeWindow = GazeWindow()     # gaze data window, will keep updating after save
         # keep enqueueing, dequeue to needed time with new kinect image
-        self.glasses_image : float = None   # cv2 float
+        self.glasses_image : LazyVideoFrame = None   # latest glasses video frame, decoded on demand
 
-        self.gaze_time_threshold : float = 1    # seconds, earliest gaze delta time to compare against
-        self.gaze_time_epsilon : float = 0.1    # seconds, earliest gaze delta time to consider saving
-        self.gaze_distance_episilon: float = .5  # ?, largest distance to allow for eye movement or something
-        self.variance_epsilon: float = 0.5
+        self.gaze_time_threshold : float = thresholds.gaze_time_threshold
+        self.gaze_time_epsilon : float = thresholds.gaze_time_epsilon
+        self.gaze_distance_episilon: float = thresholds.gaze_distance_epsilon
+        self.variance_epsilon: float = thresholds.variance_epsilon
 
     # check if this sample can be trusted
     def validate_sample(self) -> bool:
         if self.kinect_image_name == None:
             # no image to save
             return False
-        if len(self.current_gaze) == 0:
-            # not enough gaze samples
-            return False
-
-        latest_gaze = self.current_gaze[len(self.current_gaze) - 1]
+        return validate_gaze_window(float(self.kinect_image_name) * (10**-6),
+                                    self.current_gaze.timestamps,
+                                    self.current_gaze.gaze3d,
+                                    self.current_gaze.valid,
+                                    self.gaze_time_epsilon,
+                                    self.gaze_distance_episilon,
+                                    self.variance_epsilon)
 
-        def normalize(v):
-            norm = np.linalg.norm(v)
-            if norm == 0:
-                return v    # problem!
-            return np.divide(v, norm)
-        direction_list = []
-        for sample in self.current_gaze:            
-            if not sample["data"]:
-                return False
-            direction_list.append(normalize(sample["data"]["gaze3d"]))    # what if 0
 
-        # verify most recent gaze data is not too far
-        if (abs((float(self.kinect_image_name) * (10**-6)) - latest_gaze["timestamp"]) > self.gaze_time_epsilon):
-            # most recent gaze data too far back in the timeline
-            return False
-        
-        # verify most recent gaze data is not too far from the mean
-        sum_gaze = np.zeros(3)
-        for gaze in direction_list:
-            sum_gaze += gaze
-        mean_gaze = np.divide(sum_gaze, len(direction_list))
-        if (np.linalg.norm(mean_gaze - normalize(latest_gaze["data"]["gaze3d"])) > self.gaze_distance_episilon):
+    def save_frame(self, is_valid: bool = None) -> bool:
+        # is_valid can be given when the frame was already validated in a batch
+        if is_valid is None:
+            is_valid = self.validate_sample()
+        if not is_valid:
             return False
-        
-        # verify not too much movement happened
-        if (np.var(direction_list) > self.variance_epsilon):
-            return False
-
-        return True
 
+        job = write_frame
+        latest_gaze = self.current_gaze.latest()
+        if isinstance(latest_gaze, LazyGazeSample):
+            latest_gaze = latest_gaze.sample()
+        job_args = (self.recording_path, self.output_path, self.kinect_image_name,
+                    latest_gaze, self.output_mode, self.container)
+        if self.manifest is not None:
+            # skip frames already written with the same inputs, record the others once written
+            sources = frame_sources(self.recording_path, self.kinect_image_name, self.container)
+            key = ProcessingManifest.frame_key(sources, latest_gaze, self.output_mode)
+            if self.manifest.is_frame_done(self.kinect_image_name, key):
+                self.manifest.keep_frame(self.kinect_image_name)
+                return True
+            job = write_and_record_frame
+            job_args = (self.manifest, key, sources) + job_args
 
-    def save_frame(self):
-        if not self.validate_sample():
-            return
-
-        # TODO: dont let it override
-        recording_path = REC_DIR_LOC + "/" + self.recording_name
-        post_path = POST_DIR_LOC + "/" + self.recording_name
-        if (not os.path.exists(post_path)):
-            # create recording directory if none exist
-            os.mkdir(post_path)
-        if (os.path.exists(post_path + "/" + self.kinect_image_name)):
-            # remove frame to replace it if already exists
-            shutil.rmtree(post_path + "/" + self.kinect_image_name)
-        
-        os.mkdir(post_path + "/" + self.kinect_image_name)    # create dir for frame
-        shutil.copy2(recording_path + "/Kinect/" + self.kinect_image_name + "/" + self.kinect_image_name + ".png",
-                     post_path + "/" + self.kinect_image_name + "/" + self.kinect_image_name + ".png")
-        shutil.copy2(recording_path + "/Kinect/" + self.kinect_image_name + "/" + self.kinect_image_name + "_depth.csv",
-                     post_path + "/" + self.kinect_image_name + "/" + self.kinect_image_name + "_depth.csv")
-        
-        imu_file = open(post_path + "/" + self.kinect_image_name + "/gaze_data.json ", 'w')
-        imu_file.write(str(self.current_gaze[len(self.current_gaze) - 1]))
-        imu_file.close()
+        # write in the background when a writer is set, otherwise right away
+        if self.writer is None:
+            job(*job_args)
+        else:
+            self.writer.submit(job, *job_args)
+        return True
 
     def update_kinect_image(self, name : int):
         self.kinect_image_name = str(name)
         # timestamp is 10^(-6)
-        while (len(self.glasses_gaze) > 0) and (abs((float(self.kinect_image_name) * (10**-6)) - self.glasses_gaze[0]["timestamp"]) > self.gaze_time_threshold):
-            # gaze sample too far to be considered
-            self.glasses_gaze.pop(0) # remove item from the queue
-        self.current_gaze = copy.deepcopy(self.glasses_gaze) # copy current content to the current gaze
+        self.glasses_gaze.drop_older(float(self.kinect_image_name) * (10**-6), self.gaze_time_threshold)
+        self.current_gaze = self.glasses_gaze.view() # view of the current content, no copy
     
-    def update_glasses_imu(self, data : dict):
-        if "gyroscope" in data["data"]:
+    def update_glasses_imu(self, data):
+        # a raw sample or a row of the imu columns
+        if isinstance(data, LazyImuSample):
+            if data.has("gyroscope"):
+                self.glasses_imu = data
+        elif "gyroscope" in data["data"]:
             # update gyro
             self.glasses_imu = data
     
-    def update_glasses_gaze(self, data : dict):
-        # enqueue new gaze data
-        self.glasses_gaze.append(data)
+    def update_glasses_gaze(self, data):
+        # enqueue new gaze data, a raw sample or a row of the gaze arrays
+        if isinstance(data, LazyGazeSample):
+            self.glasses_gaze.append_values(data.timestamp, data.gaze3d, data.valid, data)
+        else:
+            self.glasses_gaze.append(data)
     
-    def update_glasses_image(self, image: float):
-        self.glasses_image = image
+    def update_glasses_image(self, frame):
+        self.glasses_image = frame
 
-def process_frames():
-    # arg1 = "recording folder name"
-    rec_name = sys.argv[1]
+def write_and_record_frame(manifest: ProcessingManifest, key: str, sources: list, recording_path: str,
+                           output_path: str, kinect_image_name: str, gaze_sample: dict, output_mode: str,
+                           container: KinectContainerReader = None) -> None:
+    """Function writing a frame and recording it in the manifest once it is fully written"""
+    write_frame(recording_path, output_path, kinect_image_name, gaze_sample, output_mode, container)
+    manifest.record_frame(kinect_image_name, key, sources)
 
-    current_dir = REC_DIR_LOC + '/' + rec_name
-    
+# timeline sources, in the order they are handled when timestamps are equal
+SOURCE_VIDEO = 0
+SOURCE_GAZE = 1
+SOURCE_IMU = 2
+SOURCE_KINECT = 3
+KINECT_MUL = pow(10, -6)    # kinect timestamps are in microseconds
+
+def read_glasses_samples(path: str, glasses_offset: float, indices) -> dict:
+    """Function decoding only the samples at the given indices of a gzipped glasses json stream.
+
+    The other lines are skipped without parsing them, the samples are kept as they are in the file
+    and synchronized to the kinect clock.
+
+    Returns:
+        dict: index of the sample -> sample.
+    """
+    wanted = set(int(index) for index in indices)
+    samples = {}
+    if not wanted:
+        return samples
+    last = max(wanted)
+    with gzip.open(path, 'rb') as f:
+        index = 0
+        for line in f:
+            if not line.strip():
+                continue    # blank lines are not samples, as in sensor_cache
+            if index in wanted:
+                sample = json.loads(line)
+                sample["timestamp"] -= glasses_offset # synchronize glasses with kinect
+                samples[index] = sample
+                if index == last:
+                    break
+            index += 1
+    return samples
+
+class LazyGazeSample:
+    """Handle to a row of the gaze arrays, the raw json sample is only decoded for the frames that are saved"""
+    __slots__ = ("samples", "index", "timestamp", "gaze3d", "valid")
+
+    def __init__(self, samples: dict, index: int, timestamp: float, gaze3d: np.ndarray, valid: bool):
+        self.samples = samples
+        self.index = index
+        self.timestamp = timestamp
+        self.gaze3d = gaze3d
+        self.valid = valid
+
+    def sample(self) -> dict:
+        """Function returning the gaze sample as it is read from gazedata.gz, synchronized to the kinect clock"""
+        return self.samples[self.index]
+
+def gaze_events(gaze_arrays: tuple, samples: dict):
+    """Yield (timestamp, SOURCE_GAZE, LazyGazeSample) for every gaze sample of load_gaze_arrays.
+
+    samples holds the raw samples of read_glasses_samples that the saved frames write.
+    """
+    timestamps, gaze3d, valid = gaze_arrays
+    for index, timestamp in enumerate(timestamps.tolist()):
+        yield (timestamp, SOURCE_GAZE, LazyGazeSample(samples, index, timestamp, gaze3d[index], valid[index]))
+
+class LazyImuSample:
+    """Handle to a row of the cached glasses imu columns, read only when a value is needed"""
+    __slots__ = ("columns", "index", "timestamp")
+
+    def __init__(self, columns: dict, index: int, timestamp: float):
+        self.columns = columns
+        self.index = index
+        self.timestamp = timestamp
+
+    def has(self, name: str) -> bool:
+        """Function checking if the sample holds a value of a column, missing values are NaN in the columns"""
+        return not np.isnan(self.columns[name][self.index]).all()
+
+    def value(self, name: str) -> np.ndarray:
+        return self.columns[name][self.index]
+
+def imu_events(path: str, glasses_offset: float):
+    """Yield (timestamp, SOURCE_IMU, LazyImuSample) for every imu sample, read from the cached imu columns"""
+    columns = load_glasses_imu_columns(path)
+    timestamps = columns["timestamp"] - glasses_offset # synchronize glasses with kinect
+    for index, timestamp in enumerate(timestamps.tolist()):
+        yield (timestamp, SOURCE_IMU, LazyImuSample(columns, index, timestamp))
+
+class GlassesVideo:
+    """Glasses scene video whose timeline is read without decoding the frames.
+
+    Frame pixels are only decoded when a LazyVideoFrame is asked for its image,
+    with a second capture so the timeline is never moved back by a seek.
+    """
+    MAX_GRAB_AHEAD = 50     # frames to grab forward before seeking instead
+    CHECKED_FRAMES = 30     # first frames whose timestamps are read before trusting the frame rate
+    TIMESTAMP_TOLERANCE = 10**-3    # seconds a timestamp may differ from the one the frame rate gives
+
+    def __init__(self, path: str):
+        self.path = path
+        self._timeline = cv2.VideoCapture(path)
+        self.fps : float = self._timeline.get(cv2.CAP_PROP_FPS)
+        self.frame_count : int = int(self._timeline.get(cv2.CAP_PROP_FRAME_COUNT))
+        self._decoder : cv2.VideoCapture = None
+        self._decoder_position : int = 0    # index of the next frame the decoder will grab
+
+    def frame_timestamps(self):
+        """Yield (index, seconds) of every frame in the video's own clock.
+
+        The presentation timestamps are read frame by frame, grab skips the frame conversion. Only when the
+        first CHECKED_FRAMES frames and the last frame are where the frame rate puts them, the timestamps of
+        the other frames are computed from it without touching the stream.
+        """
+        constant_rate = self.fps > 0 and self.frame_count > self.CHECKED_FRAMES
+        index = 0
+        while self._timeline.grab():
+            seconds = self._timeline.get(cv2.CAP_PROP_POS_MSEC) * (10**-3)
+            if constant_rate and abs(seconds - index / self.fps) > self.TIMESTAMP_TOLERANCE:
+                constant_rate = False
+            yield (index, seconds)
+            index += 1
+            if index == self.CHECKED_FRAMES and constant_rate:
+                if not self._is_last_frame_on_rate():
+                    constant_rate = False
+                    continue
+                for index in range(self.CHECKED_FRAMES, self.frame_count):
+                    yield (index, index / self.fps)
+                return
+
+    def _is_last_frame_on_rate(self) -> bool:
+        """Function checking that the video ends on frame_count, with the timestamp the frame rate gives it"""
+        video = cv2.VideoCapture(self.path)
+        try:
+            video.set(cv2.CAP_PROP_POS_FRAMES, self.frame_count - 1)
+            if not video.grab():
+                return False
+            seconds = video.get(cv2.CAP_PROP_POS_MSEC) * (10**-3)
+            if abs(seconds - (self.frame_count - 1) / self.fps) > self.TIMESTAMP_TOLERANCE:
+                return False
+            return not video.grab()
+        finally:
+            video.release()
+
+    def decode(self, index: int) -> np.ndarray:
+        """Function decoding the pixels of a single frame, returns None if it does not exist"""
+        if self._decoder is None:
+            self._decoder = cv2.VideoCapture(self.path)
+        if not (self._decoder_position <= index < self._decoder_position + self.MAX_GRAB_AHEAD):
+            self._decoder.set(cv2.CAP_PROP_POS_FRAMES, index)
+            self._decoder_position = index
+        while self._decoder_position < index:
+            self._decoder.grab()
+            self._decoder_position += 1
+        vid_frame_exists, image = self._decoder.read()
+        self._decoder_position += 1
+        return image if vid_frame_exists else None
+
+    def release(self) -> None:
+        self._timeline.release()
+        if self._decoder is not None:
+            self._decoder.release()
+
+
+class LazyVideoFrame:
+    """Handle to a glasses video frame, decoded only when its image is needed"""
+    __slots__ = ("video", "index", "timestamp", "_image")
+
+    def __init__(self, video: GlassesVideo, index: int, timestamp: float):
+        self.video = video
+        self.index = index
+        self.timestamp = timestamp
+        self._image = None
+
+    def image(self) -> np.ndarray:
+        """Function decoding the frame on first use"""
+        if self._image is None:
+            self._image = self.video.decode(self.index)
+        return self._image
+
+
+def video_events(path: str, glasses_offset: float):
+    """Yield (timestamp, SOURCE_VIDEO, LazyVideoFrame) for every frame of the glasses scene video"""
+    glasses_video = GlassesVideo(path)
+    try:
+        for index, seconds in glasses_video.frame_timestamps():
+            timestamp = seconds - glasses_offset # synchronize glasses with kinect
+            yield (timestamp, SOURCE_VIDEO, LazyVideoFrame(glasses_video, index, timestamp))
+    finally:
+        glasses_video.release()
+
+def load_gaze_arrays(path: str, glasses_offset: float):
+    """Load the gaze timestamps, gaze3d vectors and whether each sample has gaze data from the cached gaze columns"""
+    columns = load_gaze_columns(path)
+    valid = np.array(columns["valid"])
+    # missing values are NaN in the columns, a sample without a finite gaze3d has no gaze data
+    valid &= np.isfinite(columns["gaze3d"]).all(axis=1)
+    timestamps = columns["timestamp"] - glasses_offset # synchronize glasses with kinect
+    gaze3d = np.where(valid[:, None], columns["gaze3d"], 0)
+    return (timestamps, gaze3d, valid)
+
+def kinect_events(kinect_images_timestamps: list):
+    """Yield (timestamp, SOURCE_KINECT, name) for every kinect frame"""
+    for name in kinect_images_timestamps:
+        yield (name * KINECT_MUL, SOURCE_KINECT, name)
+
+def merge_sources(*sources):
+    """Merge already sorted sources into one lazy chronological timeline.
+    Only one pending event per source is held in memory at a time."""
+    return heapq.merge(*sources, key=lambda event: (event[0], event[1]))
+
+class ProcessingResult:
+    """Class holding the counts and timings of processing a single recording"""
+
+    def __init__(self, recording_path: str, output_path: str):
+        self.recording_path: str = recording_path
+        self.output_path: str = output_path
+        self.kinect_frames: int = 0     # kinect frames found in the recording
+        self.saved_frames: int = 0      # kinect frames that passed validation and were saved
+        self.reused_frames: int = 0     # saved frames kept unchanged from a previous run
+        self.removed_frames: int = 0    # frames of a previous run removed since they are no longer accepted
+        self.skipped: bool = False      # True if the output was already up to date
+        self.gaze_samples: int = 0      # gaze samples merged until the last kinect frame
+        self.imu_samples: int = 0       # imu samples merged until the last kinect frame
+        self.video_frames: int = 0      # glasses video frames merged until the last kinect frame
+        self.timings: dict = {}         # seconds spent in each stage, and in total
+
+    def __str__(self):
+        if self.skipped:
+            return f"up to date, {self.saved_frames}/{self.kinect_frames} kinect frames saved"
+        timings = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in self.timings.items())
+        return (f"{self.saved_frames}/{self.kinect_frames} kinect frames saved "
+                f"({self.reused_frames} reused, {self.removed_frames} removed), "
+                f"{self.gaze_samples} gaze samples, {self.imu_samples} imu samples, "
+                f"{self.video_frames} video frames ({timings})")
+
+
+def get_glasses_offset(recording_path: str) -> float:
+    """Function returning the offset in seconds to deduct from the glasses timestamps to synchronize them with the kinect"""
     # get offset of glasses and kinect
-    with open(current_dir + '/Kinect/start_timestamp.txt', 'r') as f:
+    with open(os.path.join(recording_path, 'Kinect', 'start_timestamp.txt'), 'r') as f:
         time_str = f.readline()
         kinect_start_time = datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S.%f")
 
-    with open(current_dir + '/Glasses3/start_timestamp.txt', 'r') as f:
+    with open(os.path.join(recording_path, 'Glasses3', 'start_timestamp.txt'), 'r') as f:
         time_str = f.readline()
         glasses_start_time = datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S.%f")
 
@@ -139,129 +368,163 @@ def process_frames():
          delta_start_time = kinect_start_time - glasses_start_time
          glasses_offset = delta_start_time.seconds + ((10**(-6)) * delta_start_time.microseconds)
          glasses_offset = -glasses_offset
+    return glasses_offset
+
+
+def process_frames(recording_path: str, output_path: str, thresholds: GazeThresholds = None,
+                   read_video: bool = True, output_mode: str = OUTPUT_MODE_COPY,
+                   writer_threads: int = 4, force: bool = False) -> ProcessingResult:
+    """Function synchronizing a recording and saving every kinect frame with trusted gaze data.
+
+    Args:
+        recording_path (str): Recording folder containing the Kinect and Glasses3 folders.
+        output_path (str): Folder in which a folder is saved per accepted kinect frame.
+        thresholds (GazeThresholds): Thresholds for accepting a frame, defaults to GazeThresholds().
+        read_video (bool): Whether to merge the glasses scene video into the timeline at all.
+        output_mode (str): How the kinect image and depth files are placed in the output, one of OUTPUT_MODES.
+        writer_threads (int): Threads writing the saved frames in the background, 0 writes them in the merge loop.
+        force (bool): Rewrite every frame, even if the manifest of a previous run shows it is up to date.
+
+    Returns:
+        ProcessingResult: Counts and timings of the run.
+    """
+    result = ProcessingResult(recording_path, output_path)
+    start_time = time.perf_counter()
+    if thresholds is None:
+        thresholds = GazeThresholds()
+    if os.path.exists(os.path.join(recording_path, 'Kinect', MKV_FILE_NAME)) and not is_extracted(os.path.join(recording_path, 'Kinect')):
+        # frames recorded into an mkv file are processed from their extracted folders
+        extracted = extract_mkv(os.path.join(recording_path, 'Kinect'))
+        print(f"Extracted {extracted} kinect frames from the mkv recording.")
+    kinect_images_timestamps = read_kinect_timestamps(os.path.join(recording_path, 'Kinect'))
+    container = None
+    if is_container(os.path.join(recording_path, 'Kinect')):
+        # frames recorded into a container are read from its chunks
+        container = KinectContainerReader(os.path.join(recording_path, 'Kinect'))
+        for stream in (STREAM_COLOR, STREAM_DEPTH):
+            if stream in container.streams:
+                container.index(stream)     # loaded once here, before the writer threads read it
+    result.kinect_frames = len(kinect_images_timestamps)
 
+    # skip the recording if nothing changed since the last completed run
+    manifest = ProcessingManifest(output_path)
+    manifest.load()
+    manifest.reuse_frames = not force
+    inputs = ProcessingManifest.input_signature(recording_path, kinect_images_timestamps)
+    parameters = {"thresholds": vars(thresholds), "output_mode": output_mode}
+    if not force and manifest.is_up_to_date(recording_path, inputs, parameters, container):
+        result.skipped = True
+        result.saved_frames = len(manifest.frames)
+        result.timings["total"] = time.perf_counter() - start_time
+        return result
+    manifest.begin(inputs, parameters)
+    try:
+        process_timeline(recording_path, output_path, thresholds, read_video, output_mode, writer_threads,
+                         kinect_images_timestamps, manifest, result, container)
+    finally:
+        manifest.close()
+    result.removed_frames = manifest.finish()
+    result.reused_frames = manifest.reused_frames
+    result.timings["total"] = time.perf_counter() - start_time
+    return result
 
-    with gzip.open(current_dir + '/Glasses3/gazedata.gz', 'rb') as f:
-        lines = f.readlines()
-        glasses_gaze_data = []  # keys are timestamps!
-        for line in lines:
-            dict = json.loads(line[: -1])
-            dict["timestamp"] -= glasses_offset # synchronize glasses with kinect
-            glasses_gaze_data.append((dict["timestamp"], dict))
-        heapq.heapify(glasses_gaze_data)
-
-    with gzip.open(current_dir + '/Glasses3/imudata.gz', 'rb') as f:    # split to accel and magno
-        lines = f.readlines()
-        glasses_imu_data = []
-        for line in lines:
-            dict = json.loads(line[: -1])
-            is_magnetometer = False
-            if "magnetometer" in dict["data"]:
-                is_magnetometer = True
-                # to separate equal timestamps
-            
-            dict["timestamp"] -= glasses_offset # synchronize glasses with kinect
-            glasses_imu_data.append((dict["timestamp"], is_magnetometer, dict))
-        heapq.heapify(glasses_imu_data)
-
-    glasses_video = cv2.VideoCapture(current_dir + '/Glasses3/scenevideo.mp4')
-    glasses_video_fps = glasses_video.get(cv2.CAP_PROP_FPS)
-    glasses_video_frame_total = glasses_video.get(cv2.CAP_PROP_FRAME_COUNT)  # total frame count
-
-    kinect_images_strings = os.listdir(current_dir + '/Kinect') # list of file names
-    kinect_images_timestamps = []
-    for s in kinect_images_strings:
-        if (s[-4:] != ".txt"):
-            try:
-                kinect_images_timestamps.append(int(s))
-            except:
-                print("Warning: " + s + " is not in the correct format for a Kinect recording file.")
-    heapq.heapify(kinect_images_timestamps)
 
+def process_timeline(recording_path: str, output_path: str, thresholds: GazeThresholds, read_video: bool,
+                     output_mode: str, writer_threads: int, kinect_images_timestamps: list,
+                     manifest: ProcessingManifest, result: ProcessingResult,
+                     container: KinectContainerReader = None) -> None:
+    """Function merging the recording sources chronologically and saving the accepted kinect frames"""
+    start_time = time.perf_counter()
+    glasses_offset = get_glasses_offset(recording_path)
+    writer = FrameWriter(writer_threads)
+    current_frame = FrameData(recording_path, output_path, thresholds, output_mode, writer, manifest, container)
+
+    # validate the gaze window of all kinect frames at once, the same arrays feed the timeline
+    gaze_path = os.path.join(recording_path, 'Glasses3', 'gazedata.gz')
+    gaze_arrays = load_gaze_arrays(gaze_path, glasses_offset)
+    gaze_timestamps, gaze3d, gaze_valid = gaze_arrays
+    kinect_times = np.array(kinect_images_timestamps, dtype=float) * KINECT_MUL
+    accepted_frames = validate_gaze_windows(kinect_times, gaze_timestamps, gaze3d, gaze_valid,
+                                            current_frame.gaze_time_threshold,
+                                            current_frame.gaze_time_epsilon,
+                                            current_frame.gaze_distance_episilon,
+                                            current_frame.variance_epsilon)
+    # a saved frame writes the latest sample of its window as it is in gazedata.gz, only those are decoded
+    _, window_ends = find_gaze_windows(kinect_times[accepted_frames], gaze_timestamps, current_frame.gaze_time_threshold)
+    saved_samples = read_glasses_samples(gaze_path, glasses_offset, window_ends - 1)
+    result.timings["validation"] = time.perf_counter() - start_time
+
+    sources = [
+        gaze_events(gaze_arrays, saved_samples),
+        imu_events(os.path.join(recording_path, 'Glasses3', 'imudata.gz'), glasses_offset),
+        kinect_events(kinect_images_timestamps),
+    ]
+    if read_video:
+        sources.append(video_events(os.path.join(recording_path, 'Glasses3', 'scenevideo.mp4'), glasses_offset))
+    timeline = merge_sources(*sources)
 
     #########
     # start runnign through the data chronologically and save whenever a new kinect image was taken
-    MAX_INT = pow(2, 32)
-    KINECT_MUL = pow(10, -6)
-    current_frame = FrameData(recording_name=rec_name, glasses_gyro=np.array([0, 0, 0], float))
-
-    # init minimal values
-    vid_frame_exists, image = glasses_video.read()
-    if (vid_frame_exists):
-        min_glasses_video_timestamp = glasses_video.get(cv2.CAP_PROP_POS_MSEC)
-    else:
-        min_glasses_video_timestamp = MAX_INT
-    if (len(kinect_images_timestamps) > 0):
-        min_kinect_timestamp = kinect_images_timestamps[0] * KINECT_MUL
-    else:
-        min_kinect_timestamp = MAX_INT
-    if (len(glasses_gaze_data) > 0):
-        min_gaze_timestamp = glasses_gaze_data[0][0]
-    else:
-        min_gaze_timestamp = MAX_INT
-    if (len(glasses_imu_data) > 0):
-        min_glasses_imu_timestamp = glasses_imu_data[0][0]
-    else:
-        min_glasses_imu_timestamp = MAX_INT
-
-    while len(kinect_images_timestamps) > 0:
-        min_timestamp = min(min_glasses_video_timestamp,
-                            min_glasses_imu_timestamp,
-                            min_gaze_timestamp,
-                            min_kinect_timestamp)
-
-        # prio updating before saving a new kinect image
-        if (min_timestamp == min_glasses_video_timestamp):
-            current_frame.update_glasses_image(image)
-            vid_frame_exists, image = glasses_video.read()
-            # update min glasses timestamp
-            if (vid_frame_exists):
-                min_glasses_video_timestamp = glasses_video.get(cv2.CAP_PROP_POS_MSEC)
-            else:
-                # doesnt exist, remove image?
-                min_glasses_video_timestamp = MAX_INT
-        elif (min_timestamp == min_gaze_timestamp):
-            current_frame.update_glasses_gaze(glasses_gaze_data[0][1])
-            # update min glasses timestamp
-            if (len(glasses_gaze_data) > 1):
-                # if not then cant pop
-                heapq.heappop(glasses_gaze_data)
-                min_gaze_timestamp = glasses_gaze_data[0][0]
-            else:
-                # doesnt exist, remove image cuz outdated?
-                if (len(glasses_gaze_data) == 1):
-                    # empty the queue
-                    heapq.heappop(glasses_gaze_data)
-                min_gaze_timestamp = MAX_INT
-        elif (min_timestamp == min_glasses_imu_timestamp):
-            current_frame.update_glasses_imu(glasses_imu_data[0][2])
-            # update min glasses timestamp
-            if (len(glasses_imu_data) > 1):
-                # if not then cant pop
-                heapq.heappop(glasses_imu_data)
-                min_glasses_imu_timestamp = glasses_imu_data[0][0]
+    merge_start_time = time.perf_counter()
+    # the writer is flushed, and write errors raised, when leaving the block
+    with writer:
+        kinect_frame_index = 0
+        for timestamp, source, payload in timeline:
+            if kinect_frame_index == len(kinect_images_timestamps):
+                # no kinect image left to save, the rest of the timeline is irrelevant
+                break
+            # prio updating before saving a new kinect image
+            if source == SOURCE_VIDEO:
+                current_frame.update_glasses_image(payload)
+                result.video_frames += 1
+            elif source == SOURCE_GAZE:
+                current_frame.update_glasses_gaze(payload)
+                result.gaze_samples += 1
+            elif source == SOURCE_IMU:
+                current_frame.update_glasses_imu(payload)
+                result.imu_samples += 1
+            elif source == SOURCE_KINECT:
+                current_frame.update_kinect_image(payload)
+                # save each frame of kinect data
+                if current_frame.save_frame(bool(accepted_frames[kinect_frame_index])):
+                    result.saved_frames += 1
+                kinect_frame_index += 1
             else:
-                if (len(glasses_gaze_data) == 1):
-                    # empty the queue
-                    heapq.heappop(glasses_imu_data)
-                min_glasses_imu_timestamp = MAX_INT
-        elif (min_timestamp == min_kinect_timestamp):
-            current_frame.update_kinect_image(kinect_images_timestamps[0])
-            current_frame.save_frame()  # save each frame of kinect data
-            # update min kinect timestamp
-            if (len(kinect_images_timestamps) > 1):
-                # if not then cant pop
-                heapq.heappop(kinect_images_timestamps)
-                min_kinect_timestamp = kinect_images_timestamps[0] * KINECT_MUL
-            else:
-                if (len(kinect_images_timestamps) == 1):
-                    # empty the queue
-                    heapq.heappop(kinect_images_timestamps)
-                min_kinect_timestamp = MAX_INT
-        else:
-            print ("Error: timestamp does not exist.")
+                print ("Error: timestamp does not exist.")
+        result.timings["merge"] = time.perf_counter() - merge_start_time
+    result.timings["write"] = time.perf_counter() - merge_start_time - result.timings["merge"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synchronize a recording and save the kinect frames with trusted gaze data")
+    parser.add_argument("recording_name", help="recording folder name, without the folder location")
+    parser.add_argument("--recordings-dir", default=REC_DIR_LOC, help="folder with the recordings (default: %(default)s)")
+    parser.add_argument("--output-dir", default=POST_DIR_LOC, help="folder for the processed recordings (default: %(default)s)")
+    defaults = GazeThresholds()
+    parser.add_argument("--gaze-time-threshold", type=float, default=defaults.gaze_time_threshold)
+    parser.add_argument("--gaze-time-epsilon", type=float, default=defaults.gaze_time_epsilon)
+    parser.add_argument("--gaze-distance-epsilon", type=float, default=defaults.gaze_distance_epsilon)
+    parser.add_argument("--variance-epsilon", type=float, default=defaults.variance_epsilon)
+    parser.add_argument("--no-video", action="store_true", help="skip the glasses scene video entirely")
+    parser.add_argument("--output-mode", choices=OUTPUT_MODES, default=OUTPUT_MODE_COPY,
+                        help="how the kinect files are placed in the output (default: %(default)s)")
+    parser.add_argument("--writer-threads", type=int, default=4,
+                        help="threads writing the saved frames, 0 to write them synchronously (default: %(default)s)")
+    parser.add_argument("--force", action="store_true",
+                        help="reprocess and rewrite every frame even if the output is up to date")
+    args = parser.parse_args()
 
+    thresholds = GazeThresholds(args.gaze_time_threshold, args.gaze_time_epsilon,
+                                args.gaze_distance_epsilon, args.variance_epsilon)
+    result = process_frames(os.path.join(args.recordings_dir, args.recording_name),
+                            os.path.join(args.output_dir, args.recording_name),
+                            thresholds,
+                            read_video=not args.no_video,
+                            output_mode=args.output_mode,
+                            writer_threads=args.writer_threads,
+                            force=args.force)
     # upon sucessful completion
-    print("Recording \"" + rec_name + "\" processing completed.")
+    print("Recording \"" + args.recording_name + "\" processing completed: " + str(result))
 
-process_frames()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
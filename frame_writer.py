@@ -0,0 +1,198 @@
+"""Module for writing the processed frames into the output folder"""
+import concurrent.futures
+import errno
+import os
+import shutil
+import sys
+import threading
+
+from depth_io import find_depth_file
+from kinect_container import KinectContainerReader, STREAM_COLOR, STREAM_DEPTH
+
+# how the unchanged kinect files are placed in the output folder
+OUTPUT_MODE_COPY = "copy"           # full copy of the file
+OUTPUT_MODE_HARDLINK = "hardlink"   # new name for the same file, copy across devices
+OUTPUT_MODE_REFLINK = "reflink"     # copy-on-write clone, copy where the filesystem does not support it
+OUTPUT_MODE_SYMLINK = "symlink"     # relative symbolic link to the recording file
+OUTPUT_MODES = (OUTPUT_MODE_COPY, OUTPUT_MODE_HARDLINK, OUTPUT_MODE_REFLINK, OUTPUT_MODE_SYMLINK)
+
+# kinect color image files, png for decoded frames and jpg for frames saved as the device sent them
+COLOR_FILE_SUFFIXES = (".png", ".jpg")
+
+FICLONE = 0x40049409    # linux ioctl cloning a whole file
+# errors meaning a reflink can not be made here, so the file is copied instead
+REFLINK_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EPERM}
+
+
+def find_color_file(frame_dir: str, timestamp: str) -> str:
+    """Function returning the color image file of a kinect frame, or None if there is none"""
+    for suffix in COLOR_FILE_SUFFIXES:
+        path = os.path.join(frame_dir, timestamp + suffix)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def reflink(src: str, dst: str) -> bool:
+    """Function cloning src into dst with a copy-on-write reflink.
+
+    Returns:
+        bool: False if the platform or filesystem does not support reflinks, nothing is left at dst then.
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        try:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        except OSError as exception:
+            if exception.errno not in REFLINK_UNSUPPORTED_ERRNOS:
+                raise
+            supported = False
+        else:
+            supported = True
+    if not supported:
+        os.remove(dst)
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def place_file(src: str, dst: str, mode: str = OUTPUT_MODE_COPY) -> None:
+    """Function placing the file src at dst according to the output mode.
+
+    Hardlinks and reflinks fall back to a copy when src and dst are on different devices,
+    reflinks also fall back to a copy when the filesystem does not support them.
+    """
+    if mode == OUTPUT_MODE_HARDLINK:
+        try:
+            os.link(src, dst)
+            return
+        except OSError as exception:
+            if exception.errno != errno.EXDEV:
+                raise
+    elif mode == OUTPUT_MODE_REFLINK:
+        if reflink(src, dst):
+            return
+    elif mode == OUTPUT_MODE_SYMLINK:
+        os.symlink(os.path.relpath(src, os.path.dirname(os.path.abspath(dst))), dst)
+        return
+    elif mode != OUTPUT_MODE_COPY:
+        raise ValueError(f"unknown output mode \"{mode}\", expected one of {OUTPUT_MODES}")
+    shutil.copy2(src, dst)
+
+
+def write_frame(recording_path: str, output_path: str, kinect_image_name: str, gaze_sample: dict,
+                output_mode: str = OUTPUT_MODE_COPY, container: KinectContainerReader = None) -> None:
+    """Function writing the folder of a single accepted kinect frame into the output folder.
+
+    The kinect files of a recording in a container are written from its chunks, whatever the output mode.
+    """
+    # TODO: dont let it override
+    post_path = output_path
+    # create recording directory if none exist
+    os.makedirs(post_path, exist_ok=True)
+    if (os.path.exists(post_path + "/" + kinect_image_name)):
+        # remove frame to replace it if already exists
+        shutil.rmtree(post_path + "/" + kinect_image_name)
+
+    os.mkdir(post_path + "/" + kinect_image_name)    # create dir for frame
+    if container is not None:
+        write_container_files(container, post_path + "/" + kinect_image_name, kinect_image_name)
+    else:
+        place_frame_files(recording_path, post_path, kinect_image_name, output_mode)
+
+    imu_file = open(post_path + "/" + kinect_image_name + "/gaze_data.json ", 'w')
+    imu_file.write(str(gaze_sample))
+    imu_file.close()
+
+
+def write_container_files(container: KinectContainerReader, frame_dir: str, kinect_image_name: str) -> None:
+    """Function writing the color image and the depth of a frame of a container as the files they were recorded as"""
+    for stream in (STREAM_COLOR, STREAM_DEPTH):
+        if stream not in container.streams or container.find(stream, int(kinect_image_name)) is None:
+            raise FileNotFoundError(f"no {stream} of kinect frame {kinect_image_name} in the recording container")
+        with open(os.path.join(frame_dir, kinect_image_name + container.streams[stream]), "wb") as f:
+            f.write(container.read(stream, int(kinect_image_name)))
+
+
+def place_frame_files(recording_path: str, post_path: str, kinect_image_name: str, output_mode: str) -> None:
+    """Function placing the color image and the depth file of a frame folder in the output folder of the frame"""
+    # the color image is copied as png or as the jpg the kinect sent
+    color_path = find_color_file(recording_path + "/Kinect/" + kinect_image_name, kinect_image_name)
+    if color_path is None:
+        raise FileNotFoundError("no color image for kinect frame " + kinect_image_name)
+    place_file(color_path,
+               post_path + "/" + kinect_image_name + "/" + os.path.basename(color_path),
+               output_mode)
+    # the depth is copied in whichever format it was recorded in
+    depth_path = find_depth_file(recording_path + "/Kinect/" + kinect_image_name, kinect_image_name)
+    if depth_path is None:
+        raise FileNotFoundError("no depth file for kinect frame " + kinect_image_name)
+    place_file(depth_path,
+               post_path + "/" + kinect_image_name + "/" + os.path.basename(depth_path),
+               output_mode)
+
+
+class FrameWriter:
+    """Bounded background writer running output jobs in a thread pool.
+
+    submit blocks while max_pending jobs are queued or running, so a slow disk slows down the
+    producer instead of piling up jobs in memory. Leaving the with block waits for all jobs,
+    and raises the first error if any job failed.
+    """
+
+    def __init__(self, threads: int = 4, max_pending: int = 64):
+        self.threads = threads      # 0 runs every job right away in the calling thread
+        self.written = 0            # jobs that finished successfully
+        self.errors: list = []      # exceptions raised by failed jobs
+        self._executor: concurrent.futures.ThreadPoolExecutor = None
+        if threads > 0:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads,
+                                                                   thread_name_prefix="frame_writer")
+        self._slots = threading.Semaphore(max(max_pending, 1))
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        if exc_type is not None:
+            # already failing, finish the queued jobs without hiding the original error
+            self.wait()
+            return False
+        self.close()
+        return False
+
+    def submit(self, job, *args) -> None:
+        """Function queueing job(*args), blocking while the queue is full"""
+        if self._executor is None:
+            job(*args)
+            self.written += 1
+            return
+        self._slots.acquire()
+        self._executor.submit(self._run, job, args)
+
+    def _run(self, job, args) -> None:
+        try:
+            job(*args)
+            with self._lock:
+                self.written += 1
+        except Exception as exception:
+            with self._lock:
+                self.errors.append(exception)
+        finally:
+            self._slots.release()
+
+    def wait(self) -> None:
+        """Function waiting for all queued jobs to finish"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def close(self) -> None:
+        """Function flushing all queued jobs and raising the first error if any job failed"""
+        self.wait()
+        if self.errors:
+            for exception in self.errors:
+                print("Error: failed writing frame: " + repr(exception))
+            raise self.errors[0]
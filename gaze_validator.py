@@ -0,0 +1,245 @@
+"""Module validating the gaze window of every kinect frame at once"""
+import numpy as np
+
+# statistics closer than this to a threshold are recomputed exactly like FrameData.validate_sample
+NEAR_THRESHOLD_TOLERANCE = 10**-9
+
+
+class GazeThresholds:
+    """Class holding the thresholds deciding if the gaze data of a kinect frame can be trusted"""
+
+    def __init__(self, gaze_time_threshold: float = 1, gaze_time_epsilon: float = 0.1,
+                 gaze_distance_epsilon: float = .5, variance_epsilon: float = 0.5):
+        self.gaze_time_threshold: float = gaze_time_threshold       # seconds, earliest gaze delta time to compare against
+        self.gaze_time_epsilon: float = gaze_time_epsilon           # seconds, earliest gaze delta time to consider saving
+        self.gaze_distance_epsilon: float = gaze_distance_epsilon   # largest distance of the latest gaze from the mean gaze
+        self.variance_epsilon: float = variance_epsilon             # largest variance of the gaze directions
+
+
+def normalize(v):
+    norm = np.linalg.norm(v)
+    if norm == 0:
+        return v    # problem!
+    return np.divide(v, norm)
+
+
+def validate_gaze_window(kinect_time: float, timestamps: np.ndarray, gaze3d: np.ndarray, valid: np.ndarray,
+                         time_epsilon: float, distance_epsilon: float, variance_epsilon: float) -> bool:
+    """Function validating a single gaze window, sample by sample.
+
+    Args:
+        kinect_time (float): Timestamp of the kinect image in seconds.
+        timestamps (np.ndarray): Timestamps of the gaze samples in the window, in seconds.
+        gaze3d (np.ndarray): (n, 3) gaze vectors of the samples in the window.
+        valid (np.ndarray): Whether each sample holds gaze data at all.
+        time_epsilon (float): Largest allowed delay of the latest gaze sample.
+        distance_epsilon (float): Largest allowed distance of the latest gaze from the mean gaze.
+        variance_epsilon (float): Largest allowed variance of the gaze directions.
+
+    Returns:
+        bool: True if the window can be trusted.
+    """
+    if len(timestamps) == 0:
+        # not enough gaze samples
+        return False
+    if not np.all(valid):
+        return False
+
+    direction_list = []
+    for sample in gaze3d:
+        direction_list.append(normalize(sample))
+
+    # verify most recent gaze data is not too far
+    if abs(kinect_time - timestamps[-1]) > time_epsilon:
+        return False
+
+    # verify most recent gaze data is not too far from the mean
+    sum_gaze = np.zeros(3)
+    for gaze in direction_list:
+        sum_gaze += gaze
+    mean_gaze = np.divide(sum_gaze, len(direction_list))
+    if np.linalg.norm(mean_gaze - direction_list[-1]) > distance_epsilon:
+        return False
+
+    # verify not too much movement happened
+    if np.var(direction_list) > variance_epsilon:
+        return False
+
+    return True
+
+
+def find_gaze_windows(kinect_times: np.ndarray, gaze_timestamps: np.ndarray, time_threshold: float):
+    """Function finding the [start, end) gaze sample range of every kinect frame.
+
+    A window holds every gaze sample up to and including the kinect timestamp, that is not
+    further than time_threshold seconds from it.
+    """
+    end = np.searchsorted(gaze_timestamps, kinect_times, side="right")
+    start = np.searchsorted(gaze_timestamps, kinect_times - time_threshold, side="left")
+    # searchsorted works on the subtracted bound, fix samples where rounding disagrees with |k - t|
+    while True:
+        prev = np.maximum(start - 1, 0)
+        widen = (start > 0) & ~(np.abs(kinect_times - gaze_timestamps[prev]) > time_threshold)
+        current = np.minimum(start, len(gaze_timestamps) - 1)
+        shrink = (start < end) & (np.abs(kinect_times - gaze_timestamps[current]) > time_threshold)
+        if not widen.any() and not shrink.any():
+            break
+        start = start - widen + shrink
+    return start, end
+
+
+def validate_gaze_windows(kinect_times: np.ndarray, gaze_timestamps: np.ndarray, gaze3d: np.ndarray,
+                          valid: np.ndarray, time_threshold: float, time_epsilon: float,
+                          distance_epsilon: float, variance_epsilon: float) -> np.ndarray:
+    """Function validating the gaze windows of all kinect frames with array operations.
+
+    The decisions are the same as validating every frame with validate_gaze_window, frames whose
+    statistics land next to a threshold are recomputed with it to keep rounding from flipping them.
+
+    Args:
+        kinect_times (np.ndarray): Sorted timestamps of the kinect images in seconds.
+        gaze_timestamps (np.ndarray): Sorted timestamps of all gaze samples in seconds.
+        gaze3d (np.ndarray): (n, 3) gaze vectors, zeros where a sample has no gaze data.
+        valid (np.ndarray): Whether each sample holds gaze data at all.
+        time_threshold (float): Oldest gaze sample to consider for a frame, in seconds.
+
+    Returns:
+        np.ndarray: Boolean array with the decision for every kinect frame.
+    """
+    kinect_times = np.asarray(kinect_times, dtype=float)
+    frames_count = len(kinect_times)
+    accepted = np.zeros(frames_count, dtype=bool)
+    if frames_count == 0 or len(gaze_timestamps) == 0:
+        return accepted
+
+    start, end = find_gaze_windows(kinect_times, gaze_timestamps, time_threshold)
+    sizes = end - start
+    invalid_count = np.concatenate(([0], np.cumsum(~valid)))
+    latest = np.maximum(end - 1, 0)
+
+    accepted = (sizes > 0) & (invalid_count[end] - invalid_count[start] == 0)
+    accepted &= ~(np.abs(kinect_times - gaze_timestamps[latest]) > time_epsilon)
+
+    norms = np.linalg.norm(gaze3d, axis=1)
+    directions = np.divide(gaze3d, np.where(norms == 0, 1, norms)[:, None])
+
+    # running sums over the windows, one window offset at a time for all frames
+    sum_gaze = np.zeros((frames_count, 3))
+    sum_flat = np.zeros(frames_count)
+    for offset in range(int(sizes.max())):
+        in_window = offset < sizes
+        sum_gaze[in_window] += directions[start[in_window] + offset]
+    count = np.maximum(sizes, 1)
+    mean_gaze = sum_gaze / count[:, None]
+    distance = np.linalg.norm(mean_gaze - directions[latest], axis=1)
+
+    # variance over all the components of the window, as np.var does on the list of directions
+    mean_flat = sum_gaze.sum(axis=1) / (3 * count)
+    for offset in range(int(sizes.max())):
+        in_window = offset < sizes
+        deviation = directions[start[in_window] + offset] - mean_flat[in_window, None]
+        sum_flat[in_window] += (deviation * deviation).sum(axis=1)
+    variance = sum_flat / (3 * count)
+
+    decided = accepted.copy()
+    accepted &= ~(distance > distance_epsilon) & ~(variance > variance_epsilon)
+
+    # recompute the frames that rounding could have flipped
+    near = decided & ((np.abs(distance - distance_epsilon) <= NEAR_THRESHOLD_TOLERANCE * max(1, abs(distance_epsilon)))
+                      | (np.abs(variance - variance_epsilon) <= NEAR_THRESHOLD_TOLERANCE * max(1, abs(variance_epsilon))))
+    for i in np.flatnonzero(near):
+        accepted[i] = validate_gaze_window(kinect_times[i], gaze_timestamps[start[i]:end[i]],
+                                           gaze3d[start[i]:end[i]], valid[start[i]:end[i]],
+                                           time_epsilon, distance_epsilon, variance_epsilon)
+    return accepted
+
+
+class GazeWindowView:
+    """Read-only view over the samples currently held by a GazeWindow.
+    The view is only valid until the window is updated again."""
+    __slots__ = ("timestamps", "gaze3d", "valid", "_latest_sample")
+
+    def __init__(self, timestamps: np.ndarray, gaze3d: np.ndarray, valid: np.ndarray, latest_sample: dict):
+        self.timestamps = timestamps
+        self.gaze3d = gaze3d
+        self.valid = valid
+        self._latest_sample = latest_sample
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def latest(self) -> dict:
+        """Function returning the raw latest gaze sample of the view"""
+        return self._latest_sample
+
+
+class GazeWindow:
+    """Sliding window of gaze samples, kept as index bounds into preallocated arrays.
+
+    Samples are appended at the end and dropped from the start by moving the start index,
+    the live samples are moved back to the front of the arrays only when the end is reached.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self._timestamps = np.zeros(capacity)
+        self._gaze3d = np.zeros((capacity, 3))
+        self._valid = np.zeros(capacity, dtype=bool)
+        self._samples: list = [None] * capacity
+        self._start: int = 0
+        self._end: int = 0
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def append(self, sample: dict) -> None:
+        """Function adding a raw gaze sample at the end of the window"""
+        if sample["data"]:
+            self.append_values(sample["timestamp"], sample["data"]["gaze3d"], True, sample)
+        else:
+            self.append_values(sample["timestamp"], 0, False, sample)
+
+    def append_values(self, timestamp: float, gaze3d, valid: bool, sample) -> None:
+        """Function adding a gaze sample already parsed into values, sample is what latest returns for it"""
+        if self._end == len(self._timestamps):
+            self._make_room()
+        self._timestamps[self._end] = timestamp
+        self._gaze3d[self._end] = gaze3d
+        self._valid[self._end] = valid
+        self._samples[self._end] = sample
+        self._end += 1
+
+    def drop_older(self, kinect_time: float, time_threshold: float) -> None:
+        """Function dropping samples from the start that are further than time_threshold from kinect_time"""
+        while self._start < self._end and abs(kinect_time - self._timestamps[self._start]) > time_threshold:
+            # gaze sample too far to be considered
+            self._samples[self._start] = None
+            self._start += 1
+
+    def view(self) -> GazeWindowView:
+        """Function returning a read-only view of the current samples, without copying them"""
+        timestamps = self._timestamps[self._start:self._end]
+        gaze3d = self._gaze3d[self._start:self._end]
+        valid = self._valid[self._start:self._end]
+        for array in (timestamps, gaze3d, valid):
+            array.flags.writeable = False
+        latest_sample = self._samples[self._end - 1] if self._end > self._start else None
+        return GazeWindowView(timestamps, gaze3d, valid, latest_sample)
+
+    def _make_room(self) -> None:
+        """Function moving the live samples to the front, growing the arrays when they are mostly full"""
+        size = len(self)
+        capacity = len(self._timestamps)
+        if size > capacity // 2:
+            capacity *= 2
+            timestamps = np.zeros(capacity)
+            gaze3d = np.zeros((capacity, 3))
+            valid = np.zeros(capacity, dtype=bool)
+        else:
+            timestamps, gaze3d, valid = self._timestamps, self._gaze3d, self._valid
+        timestamps[:size] = self._timestamps[self._start:self._end]
+        gaze3d[:size] = self._gaze3d[self._start:self._end]
+        valid[:size] = self._valid[self._start:self._end]
+        self._samples = self._samples[self._start:self._end] + [None] * (capacity - size)
+        self._timestamps, self._gaze3d, self._valid = timestamps, gaze3d, valid
+        self._start = 0
+        self._end = size
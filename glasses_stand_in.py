@@ -0,0 +1,142 @@
+"""Module serving recordings over http the way the Glasses3 unit does, to try the downloads without the glasses.
+
+A folder of recordings is served as the glasses serve theirs: the meta data of a recording at
+/recordings/<name> and its files at /recordings/<name>/<file name>, with http range requests.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COPY_CHUNK_SIZE = 1 << 20   # bytes sent at once
+
+
+class GlassesRequestHandler(BaseHTTPRequestHandler):
+    """Class answering the recording requests of the downloader from the folder of the server"""
+
+    protocol_version = "HTTP/1.1"   # keeps the connections open like the glasses
+
+    def do_GET(self) -> None:
+        parts = [part for part in self.path.split("?")[0].split("/") if part]
+        if len(parts) < 2 or parts[0] != "recordings" or any(part in (".", "..") for part in parts):
+            self.send_error(404)
+            return
+        recording_dir = os.path.join(self.server.recordings_dir, parts[1])
+        if not os.path.isdir(recording_dir):
+            self.send_error(404)
+            return
+        if len(parts) == 2:
+            self.send_meta_data(recording_dir)
+        elif len(parts) == 3 and os.path.isfile(os.path.join(recording_dir, parts[2])):
+            self.send_recording_file(os.path.join(recording_dir, parts[2]))
+        else:
+            self.send_error(404)
+
+    def send_meta_data(self, recording_dir: str) -> None:
+        created = datetime.fromtimestamp(os.path.getmtime(recording_dir), timezone.utc)
+        body = json.dumps({"name": os.path.basename(recording_dir),
+                           "created": created.strftime("%Y-%m-%dT%H:%M:%S.%fZ")}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_recording_file(self, path: str) -> None:
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        requested_range = self.headers.get("Range")
+        if requested_range is not None and requested_range.startswith("bytes="):
+            first, _, last = requested_range[len("bytes="):].partition("-")
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end + 1 - start))
+        self.end_headers()
+        remaining = end + 1 - start
+        if self.server.cut_after is not None and remaining > self.server.cut_after:
+            # drop the connection part way, like a glasses wifi dropping out
+            remaining = self.server.cut_after
+            self.close_connection = True
+        with open(path, "rb") as f:
+            f.seek(start)
+            while remaining > 0:
+                chunk = f.read(min(COPY_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+class GlassesServer(ThreadingHTTPServer):
+    """Class of the stand-in http server, quiet about downloads the client stops part way"""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address) -> None:
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class GlassesStandIn:
+    """Class running the stand-in server on its own thread, http_url is what the downloader is given.
+
+    Args:
+        recordings_dir (str): Folder with a folder of files per recording.
+        port (int): Port to listen on, 0 picks a free one.
+        cut_after (int): Bytes of a file sent before dropping the connection, to try resumed downloads.
+    """
+
+    def __init__(self, recordings_dir: str, host: str = "127.0.0.1", port: int = 0, cut_after: int = None):
+        self.server = GlassesServer((host, port), GlassesRequestHandler)
+        self.server.recordings_dir = recordings_dir
+        self.server.cut_after = cut_after
+        self.http_url: str = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, name="glasses_stand_in", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        self.close()
+        return False
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a folder of recordings over http like the Glasses3 unit")
+    parser.add_argument("recordings_dir", help="folder with a folder of files per recording")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on (default: %(default)s)")
+    parser.add_argument("--cut-after", type=int, default=None, metavar="BYTES",
+                        help="drop the connection after sending this many bytes of a file, to try resumed downloads")
+    args = parser.parse_args()
+    stand_in = GlassesStandIn(args.recordings_dir, args.host, args.port, args.cut_after)
+    print(f"Serving the recordings of {args.recordings_dir} at {stand_in.http_url}, press Ctrl+C to stop.")
+    try:
+        stand_in.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stand_in.server.server_close()
@@ -2,7 +2,7 @@
 
 # pylint: disable=no-member
 import pykinect_azure as pykinect
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QPalette, QColor
 # import numpy as np
 import cv2
@@ -10,16 +10,41 @@ import threading
 import time
 import os
 from datetime import datetime
-import concurrent.futures
 import numpy as np
-from pykinect_azure.k4a import Device, Capture, Image, Configuration
-from pykinect_azure.k4a._k4a import (
-    k4a_image_get_device_timestamp_usec,
-)
+from pykinect_azure.k4a import Device, Image, Configuration
 from PyQt5.QtWidgets import QPushButton, QWidget, QLabel, QVBoxLayout, QHBoxLayout, QSizePolicy
 from qasync import QEventLoop
 
 from imports import rec_manager
+from depth_io import DEPTH_FORMAT_NPY, DEPTH_FORMATS, colorize_depth
+from custom_made_libs.frame_write_queue import FrameWriteQueue, OVERFLOW_BLOCK, queue_capacity
+from custom_made_libs.mkv_recorder import MkvRecorder, device_configuration_from_record, get_record_configuration
+from custom_made_libs.record_configuration import RecordConfiguration
+from custom_made_libs.frame_preview import FramePreview, to_preview_image
+from custom_made_libs.capture_telemetry import CaptureTelemetry, TELEMETRY_FILE_NAME
+from custom_made_libs.imu_capture import ImuCapture
+from custom_made_libs.frame_pool import CaptureFrame, FRAME_POOL_MARGIN, FramePool
+from custom_made_libs.recording_writer import RecordingWriter
+from custom_made_libs.replay_device import REPLAY_UNSUPPORTED_STAGES, ReplayDevice, open_replay_source
+from custom_made_libs.capture_pipeline import (
+    CapturePipeline,
+    STAGE_COLOR,
+    STAGE_IMU,
+    STAGE_PREVIEW,
+    STAGE_TRANSFORMED_DEPTH,
+    STAGE_WRITER,
+    parse_stages,
+)
+from mkv_extractor import MKV_FILE_NAME
+
+# capture stages of the kinect hub sessions, see custom_made_libs.capture_pipeline
+LIVE_VIEW_STAGES = (STAGE_COLOR, STAGE_PREVIEW)
+LIVE_VIEW_DEPTH_STAGES = (STAGE_COLOR, STAGE_TRANSFORMED_DEPTH, STAGE_PREVIEW)
+RECORDING_STAGES = (STAGE_COLOR, STAGE_IMU, STAGE_PREVIEW, STAGE_WRITER)
+RECORDING_DEPTH_STAGES = (STAGE_COLOR, STAGE_TRANSFORMED_DEPTH, STAGE_IMU, STAGE_PREVIEW, STAGE_WRITER)
+# the sdk writes the imu track of an mkv recording with the captures
+MKV_RECORDING_STAGES = (STAGE_COLOR, STAGE_PREVIEW)
+LIVE_VIEW_FPS = 30
 
 class KinectHub:
     """Class representing the Kinect Hub"""
@@ -47,6 +72,35 @@ class KinectHub:
             self.start_timestamp: datetime = None
             self.device_handle: int = None
             self.current_image: Image = None
+            # format of the raw depth frames, see depth_io.DEPTH_FORMATS
+            self.depth_format: str = DEPTH_FORMAT_NPY if "KINECT_DEPTH_FORMAT" not in os.environ else os.environ["KINECT_DEPTH_FORMAT"]
+            if self.depth_format not in DEPTH_FORMATS:
+                raise Exception(f"unknown KINECT_DEPTH_FORMAT \"{self.depth_format}\", expected one of {DEPTH_FORMATS}")
+            # frames held in memory between the capture and the writers, and what to do when it is full
+            self.write_queue_size: int = 30 if "KINECT_WRITE_QUEUE_SIZE" not in os.environ else int(os.environ["KINECT_WRITE_QUEUE_SIZE"])
+            self.write_overflow_policy: str = OVERFLOW_BLOCK if "KINECT_OVERFLOW_POLICY" not in os.environ else os.environ["KINECT_OVERFLOW_POLICY"]
+            # "container" appends the frames to chunk files, "directories" writes a folder per frame,
+            # "mkv" lets the sdk write an mkv recording that is extracted offline by mkv_extractor
+            self.recording_layout: str = "container" if "KINECT_RECORDING_LAYOUT" not in os.environ else os.environ["KINECT_RECORDING_LAYOUT"]
+            if self.recording_layout not in ("container", "directories", "mkv"):
+                raise Exception(f"unknown KINECT_RECORDING_LAYOUT \"{self.recording_layout}\", expected container, directories or mkv")
+            # "mjpg" saves the color frames as the jpeg the device sends, "png" decodes and saves them as png
+            self.color_encoding: str = "mjpg" if "KINECT_COLOR_ENCODING" not in os.environ else os.environ["KINECT_COLOR_ENCODING"]
+            if self.color_encoding not in ("mjpg", "png"):
+                raise Exception(f"unknown KINECT_COLOR_ENCODING \"{self.color_encoding}\", expected mjpg or png")
+            # the recording preview is shown at most this often and this wide, or not at all when headless
+            self.preview_fps: float = 10 if "KINECT_PREVIEW_FPS" not in os.environ else float(os.environ["KINECT_PREVIEW_FPS"])
+            self.preview_width: int = 640 if "KINECT_PREVIEW_WIDTH" not in os.environ else int(os.environ["KINECT_PREVIEW_WIDTH"])
+            self.headless: bool = False if "KINECT_HEADLESS" not in os.environ else os.environ["KINECT_HEADLESS"].lower() in ("1", "true", "yes")
+            # stages added to every recording, for example "colored_depth,ir,imu", see capture_pipeline.STAGES
+            self.extra_stages: tuple = () if "KINECT_EXTRA_STAGES" not in os.environ else parse_stages(os.environ["KINECT_EXTRA_STAGES"])
+            # replay a recording instead of using the device, "synthetic" for generated frames, see replay_device
+            self.replay: str = None if "KINECT_REPLAY" not in os.environ else os.environ["KINECT_REPLAY"] or None
+            self.replay_realtime: bool = True if "KINECT_REPLAY_REALTIME" not in os.environ else os.environ["KINECT_REPLAY_REALTIME"].lower() in ("1", "true", "yes")
+            if self.replay is not None and self.recording_layout == "mkv":
+                raise Exception("KINECT_REPLAY can not record the mkv layout, the sdk writes it from the device")
+            # telemetry of the current or last recording
+            self.telemetry: CaptureTelemetry = None
             self.kinect_hub_widget: QWidget = kinect_hub_widget
             # define the device configuration
             self.device_config: Configuration = self.get_low_res_configuration()
@@ -62,16 +116,40 @@ class KinectHub:
 
     def start_recording(self, recording_folder_name) -> None:
         """Function to start recording the kinect camera"""
+        self.start_recording_session(recording_folder_name, RECORDING_STAGES, with_depth=False)
+
+    def start_recording_depth(self, recording_folder_name) -> None:
+        """Function to start recording the kinect camera with depth"""
+        self.start_recording_session(recording_folder_name, RECORDING_DEPTH_STAGES, with_depth=True)
+
+    def start_recording_session(self, recording_folder_name, stages: tuple, with_depth: bool) -> None:
+        """Function to start recording the kinect camera with the given capture stages in a seperate thread"""
         if self.is_live_view:
             print("not able to start recording when in live view")
             return
         self.FILEPATH = self.configure_recordings_file(recording_folder_name)
-        self.configure_camera()
+        record_configuration: RecordConfiguration = None
+        if self.recording_layout == "mkv":
+            # the sdk writes the tracks, the pipeline only feeds it and the preview
+            record_configuration = get_record_configuration(with_depth)
+            self.configure_camera(device_config=device_configuration_from_record(record_configuration))
+            stages = MKV_RECORDING_STAGES
+        else:
+            self.configure_camera()
+            stages = stages + self.extra_stages
         if self.device is None:
             return
+        if self.replay is not None:
+            stages = tuple(stage for stage in stages if stage not in REPLAY_UNSUPPORTED_STAGES)
+        if self.headless:
+            # nothing to show, and the color image is not needed for anything else in an mkv recording
+            stages = tuple(stage for stage in stages if stage != STAGE_PREVIEW
+                           and (stage != STAGE_COLOR or record_configuration is None))
         self.is_recording = True
         self.record_manager.kinect_is_recording = True
-        start_recording_thread : threading.Thread = threading.Thread(target=self.start_recording_thread)
+        start_recording_thread: threading.Thread = threading.Thread(
+            target=self.recording_thread, args=(stages, record_configuration)
+        )
         start_recording_thread.start()
 
     def stop_recording(self) -> None:
@@ -86,261 +164,136 @@ class KinectHub:
         os.makedirs("recordings/" + file_name + "/Kinect")
         return "recordings/" + file_name + "/Kinect/"
 
-    def save_image(self, image: np.ndarray, timestamp: str) -> None:
-        filename = f"{self.FILEPATH}{timestamp}/{timestamp}.png"
-        cv2.imwrite(filename, image)
-
-    def save_depth_image(
-        self, depth_image: np.ndarray, timestamp: str, single_channel: bool
-    ) -> None:
-        if single_channel:
-            filename = f"{self.FILEPATH}{timestamp}/{timestamp}_depth_greyscale.png"
-        else:
-            filename = f"{self.FILEPATH}{timestamp}/{timestamp}_depth.png"
-        cv2.imwrite(filename, depth_image)
-
-    def save_depth_csv(self, depth_image: np.ndarray, timestamp: str) -> None:
-        filename = f"{self.FILEPATH}{timestamp}/{timestamp}_depth.csv"
-        np.savetxt(filename, depth_image, delimiter=",",fmt='%d')
-
-    def start_recording_thread(self) -> None:
-        """Function to start recording the kinect camera"""
-        cv2.namedWindow("Recording", cv2.WINDOW_NORMAL)
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            while True:
-                capture: Capture = self.device.update()
-                # imu: ImuSample = ImuSample(self.device.get_imu_sample())
-                ret: bool
-                raw_color_image: Image
-                # Get the color image from the capture
-                img_obj = capture.get_color_image_object()
-                ret, raw_color_image = img_obj.to_numpy()
-                # if the capture did not succeed, then continue
-                if not ret:
-                    continue
-                # time_imu = imu.get_gyro_time()
-                # get the timestamp from the image
-                time_offset_image = k4a_image_get_device_timestamp_usec(img_obj.handle())
-                # save the image to a file
-                executor.submit(self.write_all_imagees, raw_color_image, None, None, str(time_offset_image))
-                
-
-                # if the capture did not succeed, then continue
-                if not ret:
-                    continue
-                image: np.ndarray = cv2.putText(
-                    raw_color_image,
-                    "Recording",
-                    (50, 50),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    1,
-                    (255, 0, 0),
-                    2,
-                    cv2.LINE_AA,
-                )
-                cv2.imshow("Recording", image)
-
-                # Press q to exit
-                if cv2.waitKey(1) == ord("q") or not self.is_recording:
-                    break
-            # save a text file that has only the timestamp of the start of the recording
-            with open(self.FILEPATH + "start_timestamp.txt", "w") as file:
-                file.write(str(self.start_timestamp))
-            cv2.destroyWindow("Recording")
-            self.stop_kinect()
-            self.is_recording = False
-            self.record_manager.kinect_is_recording = False
-
-    def start_recording_depth(self, recording_folder_name) -> None:
-        """Function to start recording the kinect camera with depth"""
-        if self.is_live_view:
-            print("not able to start recording when in live view")
-            return
-        self.FILEPATH = self.configure_recordings_file(recording_folder_name)
-        self.configure_camera()
-        if self.device is None:
-            return
-        self.is_recording = True
-        self.record_manager.kinect_is_recording = True
-        start_recording_thread: threading.Thread = threading.Thread(
-            target=self.start_recording_depth_thread
+    def render_preview(self, frame: CaptureFrame, width: int, text: str, text_color: tuple) -> np.ndarray:
+        """Function rendering the preview of a frame, blended with its depth if it has any"""
+        image = to_preview_image(frame.color, width)
+        if image is None:
+            return None
+        depth_image = frame.transformed_depth
+        if depth_image is not None:
+            # colored at the size of the preview, the captured frames are never colored
+            depth_image = cv2.resize(depth_image, (image.shape[1], image.shape[0]), interpolation=cv2.INTER_NEAREST)
+            image = cv2.addWeighted(image, 0.5, colorize_depth(depth_image), 0.5, 0)
+        return cv2.putText(
+            image,
+            text,
+            (50, 50),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            1,
+            text_color,
+            2,
+            cv2.LINE_AA,
         )
-        start_recording_thread.start()
 
-    def write_all_imagees(self, colored_image, depth_image, greyscale_image, timestamp) -> None:
-        """Function to write all the images to the file"""
-        os.mkdir(self.FILEPATH + timestamp)
-        if colored_image is not None: self.save_image(colored_image, timestamp) 
-        if depth_image is not None: self.save_depth_image(depth_image, timestamp, False) 
-        if greyscale_image is not None: self.save_depth_image(greyscale_image, timestamp, True) 
-        if colored_image is not None and greyscale_image is not None: self.save_depth_csv(greyscale_image, timestamp)
-
-        
-
-
-    def start_recording_depth_thread(self) -> None:
-        """Function to start recording the kinect camera with depth"""
-        cv2.namedWindow("Recording Depth", cv2.WINDOW_NORMAL)
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            while True:
-                capture: Capture = self.device.update()
-                # Get the color image from the capture
-                img_obj = capture.get_color_image_object()
-                ret, raw_color_image = img_obj.to_numpy()
-                # Get the colored depth and the grey scale detpth images
-                ret_depth, transformed_depth_image = (
-                    capture.get_transformed_colored_depth_image()
-                )
-                ret_depth_greyscale, transformed_depth_image_greyscale = (
-                    capture.get_transformed_depth_image()
-                )
-                # if the capture did not succeed, then continue
-                if not ret or not ret_depth or not ret_depth_greyscale:
-                    continue
-                # get the timestamp from the image
-                time_offset_image = k4a_image_get_device_timestamp_usec(img_obj.handle())
-                # start a thread to save all of the images to a file
-                # self.write_all_images(raw_color_image, transformed_depth_image, transformed_depth_image_greyscale, str(time_offset_image))
-                executor.submit(self.write_all_imagees, raw_color_image, transformed_depth_image, transformed_depth_image_greyscale, str(time_offset_image))
-                # self.write_all_imagees(raw_color_image, transformed_depth_image, transformed_depth_image_greyscale, time_offset_image)
-
-                combined_image = cv2.addWeighted(
-                    raw_color_image[:, :, :3], 0.5, transformed_depth_image, 0.5, 0
-                )
-                cv2.imshow("Recording Depth", combined_image)
-
-                # Press q to exit
-                if cv2.waitKey(1) == ord("q") or not self.is_recording:
-                    break
+    def render_recording_preview(self, frame: CaptureFrame, width: int) -> np.ndarray:
+        return self.render_preview(frame, width, "Recording", (255, 0, 0))
+
+    def render_live_view_preview(self, frame: CaptureFrame, width: int) -> np.ndarray:
+        return self.render_preview(frame, width, "Live View", (0, 0, 255))
+
+    def recording_thread(self, stages: tuple, record_configuration: RecordConfiguration = None) -> None:
+        """Function recording the kinect camera with the given capture stages.
+
+        The frames are written by the write queue, or the captures are written to an mkv file by the sdk
+        when a record configuration is given.
+        """
+        preview: FramePreview = FramePreview("Recording", self.render_recording_preview, self.preview_fps,
+                                             self.preview_width, STAGE_PREVIEW not in stages, CaptureFrame.release)
+        frame_pool: FramePool = FramePool(queue_capacity(self.write_queue_size, self.write_overflow_policy) + FRAME_POOL_MARGIN)
+        decode_color: bool = self.color_encoding == "png"
+        self.telemetry = CaptureTelemetry()
+        recorder: MkvRecorder = None
+        imu_capture: ImuCapture = None
+        write_queue: FrameWriteQueue = None
+        recording_writer: RecordingWriter = None
+        try:
+            if record_configuration is not None:
+                recorder = MkvRecorder(self.device, record_configuration, self.FILEPATH + MKV_FILE_NAME)
+                capture_sinks = (recorder.write_capture, lambda capture: recorder.write_pending_imu_samples(self.device))
+                pipeline = CapturePipeline(self.device, stages, decode_color, preview=preview, telemetry=self.telemetry,
+                                           capture_sinks=capture_sinks, frame_pool=frame_pool)
+            else:
+                recording_writer = RecordingWriter(self.FILEPATH, self.recording_layout, self.depth_format, self.telemetry)
+                write_queue = FrameWriteQueue(recording_writer.write, self.write_queue_size, self.write_overflow_policy)
+                if STAGE_IMU in stages:
+                    imu_capture = ImuCapture(self.device, self.FILEPATH)
+                pipeline = CapturePipeline(self.device, stages, decode_color, write_queue, preview, self.telemetry,
+                                           imu_capture=imu_capture, frame_pool=frame_pool)
+            # a replayed recording also stops at its last frame
+            pipeline.run(lambda: self.is_recording and self.device.is_valid())
+        finally:
+            preview.close()
+            if recorder is not None:
+                recorder.close()
             # save a text file that has only the timestamp of the start of the recording
             with open(self.FILEPATH + "start_timestamp.txt", "w") as file:
                 file.write(str(self.start_timestamp))
-            # executor.shutdown(wait=True)
-            # self.convert_greyscale_to_csv()
-            cv2.destroyWindow("Recording Depth")
             self.stop_kinect()
             self.is_recording = False
             self.record_manager.kinect_is_recording = False
-            
-    def convert_greyscale_to_csv(self) -> None:
-        """Function to convert all of the images taken in greyscale to csv files"""
-        for folder in os.listdir(self.FILEPATH):
-            if not os.path.isfile(f"{self.FILEPATH}{folder}"):
-                for file in os.listdir(self.FILEPATH + folder):
-                    if file.endswith("_depth_greyscale.png"):
-                        greyscale_image = cv2.imread(f"{self.FILEPATH}{folder}/{file}", cv2.IMREAD_GRAYSCALE)
-                        index = file.find("_depth_greyscale.png")
-                        self.save_depth_csv(greyscale_image, file[:index])
+            if write_queue is not None:
+                # write the frames still queued
+                write_queue.close()
+            if recording_writer is not None:
+                recording_writer.close()
+        self.telemetry.write(self.FILEPATH + TELEMETRY_FILE_NAME)
+        if recorder is not None:
+            print(f"Kinect recording: {recorder.captures} captures and {recorder.imu_samples} imu samples written to {recorder.path}")
+        else:
+            print("Kinect recording: " + write_queue.report())
+        print("Kinect frames: " + frame_pool.report())
+        if imu_capture is not None:
+            print("Kinect imu: " + imu_capture.report())
+        print("Kinect telemetry: " + self.telemetry.readout())
 
+    def live_view(self) -> None:
+        """Function to open the live view in the kinect camera in a seperate thread"""
+        self.start_live_view("Live View", LIVE_VIEW_STAGES)
 
     def live_view_depth(self) -> None:
         """Function to open the live view in depth mode in the kinect camera in a seperate thread"""
-        if self.is_recording:
-            print("not able to start live view when recording")
-            return
-        self.configure_camera(True)
-        if self.device is None:
-            return
-        # Start the live view in a seperate thread
-        self.is_live_view = True
-        live_view_thread: threading.Thread = threading.Thread(
-            target=self.live_view_depth_thread, args=(self.device,)
-        )
-        live_view_thread.start()
-        # Stop the kinect
-        # self.stop_kinect()
-
-    def live_view_depth_thread(self, device: Device) -> None:
-        """Function to start the live view"""
-        cv2.namedWindow("Live View Depth", cv2.WINDOW_NORMAL)
-        # sys.stdout = open("output.txt", "w")
-        # Initialize the Open3d visualizer
-
-        while True:
-            # Get a capture from the device
-            capture: Capture = device.update()
-            ret: bool
-            depth_image: Image
-            color_image: Image
-            # Get the color image from the capture
-            # ret, depth_image = capture.get_ir_image()
-
-            # Get the color depth image from the capture
-            ret_depth, transformed_depth_image = (
-                capture.get_transformed_colored_depth_image()
-            )
-
-            # Get the colorred image
-            ret_color, color_image = capture.get_color_image()
-            if not ret_depth or not ret_color:
-                continue
-
-            combined_image = cv2.addWeighted(
-                color_image[:, :, :3], 0.5, transformed_depth_image, 0.5, 0
-            )
-
-            cv2.imshow("Live View Depth", combined_image)
-            # Press q to exit
-            if cv2.waitKey(1) == ord("q"):
-                cv2.destroyWindow("Live View Depth")                
-                break
-        self.stop_kinect()
-        self.is_live_view = False
+        self.start_live_view("Live View Depth", LIVE_VIEW_DEPTH_STAGES)
 
-
-
-    def live_view(self) -> None:
-        """Function to open the live view in the kinect camera in a seperate thread"""
+    def start_live_view(self, window_name: str, stages: tuple) -> None:
+        """Function to open a live view with the given capture stages in a seperate thread"""
         if self.is_recording:
             print("not able to start live view when recording")
             return
+        if self.headless:
+            print("not able to start live view when headless, unset KINECT_HEADLESS to show windows")
+            return
         self.configure_camera(True)
         if self.device is None:
             return
         # Start the live view in a seperate thread
         self.is_live_view = True
         live_view_thread: threading.Thread = threading.Thread(
-            target=self.live_view_thread, args=(self.device,)
+            target=self.live_view_thread, args=(window_name, stages)
         )
         live_view_thread.start()
-        # Stop the kinect
-        # self.stop_kinect()
-
-    def live_view_thread(self, device: Device) -> None:
-        """Function to start the live view"""
-        cv2.namedWindow("Live View", cv2.WINDOW_NORMAL)
-        # sys.stdout = open("output.txt", "w")
-        while True:
-            # Get a capture from the device
-            capture: Capture = device.update()
-            ret: bool
-            raw_color_image: Image
-            img_obj = capture.get_color_image_object()
-            ret, raw_color_image = img_obj.to_numpy()
-            # if the capture did not succeed, then continue
-            if not ret:
-                continue
-            image: np.ndarray = cv2.putText(
-                raw_color_image,
-                "Live View",
-                (50, 50),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                1,
-                (0, 0, 255),
-                2,
-                cv2.LINE_AA,
-            )
-            cv2.imshow("Live View", image)
-
-            # Press q to exit
-            if cv2.waitKey(1) == ord("q"):
-                cv2.destroyWindow("Live View")
-                break
+
+    def live_view_thread(self, window_name: str, stages: tuple) -> None:
+        """Function to show the live view until q is pressed in its window"""
+        preview: FramePreview = FramePreview(window_name, self.render_live_view_preview, LIVE_VIEW_FPS, self.preview_width,
+                                             release_function=CaptureFrame.release)
+        try:
+            pipeline = CapturePipeline(self.device, stages, self.color_encoding == "png", preview=preview)
+            pipeline.run(lambda: self.device.is_valid())
+        finally:
+            preview.close()
         self.stop_kinect()
         self.is_live_view = False
 
-    def configure_camera(self, is_live_view=False) -> None:
+    def configure_camera(self, is_live_view=False, device_config: Configuration = None) -> None:
         """Function to configure the camera"""
+        if device_config is None:
+            device_config = self.device_config
+        if self.replay is not None:
+            if self.device is None:
+                self.device = ReplayDevice(open_replay_source(self.replay), self.replay_realtime)
+            self.device.start(device_config)
+            self.start_timestamp = datetime.now()
+            return
         pykinect.initialize_libraries()
         try:
             if self.device is None:
@@ -349,11 +302,11 @@ class KinectHub:
 
                 # Start device
                 if is_live_view:
-                    self.device.start(self.device_config)
+                    self.device.start(device_config)
                 else:
-                    self.device.start(self.device_config, self.RECORD, self.FILEPATH)
+                    self.device.start(device_config, self.RECORD, self.FILEPATH)
             else:
-                self.device.start(self.device_config)
+                self.device.start(device_config)
             self.start_timestamp = datetime.now()
         except SystemExit as exception:
             print(exception)
@@ -404,6 +357,13 @@ class KinectHub:
         kinect_hub_title = QLabel("Kinect Hub", self.kinect_hub_widget)
         kinect_hub_title.setAlignment(Qt.AlignCenter)
 
+        # live telemetry of the recording, refreshed twice a second
+        self.telemetry_label = QLabel("", self.kinect_hub_widget)
+        self.telemetry_label.setAlignment(Qt.AlignCenter)
+        self.telemetry_timer = QTimer(self.kinect_hub_widget)
+        self.telemetry_timer.timeout.connect(self.update_telemetry_label)
+        self.telemetry_timer.start(500)
+
         live_view_btn = QPushButton("Live View", self.kinect_hub_widget)
         live_view_btn.setStyleSheet("background-color: lightblue;")
         live_view_btn.clicked.connect(self.live_view)
@@ -432,6 +392,7 @@ class KinectHub:
         hbox2.addWidget(start_rec_btn)
         hbox2.addWidget(start_rec_depth_btn)
         vbox.addLayout(hbox2)
+        vbox.addWidget(self.telemetry_label)
 
         self.kinect_hub_widget.setLayout(vbox)
 
@@ -440,4 +401,9 @@ class KinectHub:
         live_view_depth_btn.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         start_rec_btn.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         start_rec_depth_btn.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        kinect_hub_title.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
\ No newline at end of file
+        kinect_hub_title.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+    def update_telemetry_label(self) -> None:
+        """Function showing the live telemetry of the current recording"""
+        if self.is_recording and self.telemetry is not None:
+            self.telemetry_label.setText(self.telemetry.readout())
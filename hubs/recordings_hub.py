@@ -13,11 +13,10 @@ from g3pylib import Glasses3
 from imports import os
 from imports import cv2
 from g3pylib.recordings.recording import Recording
-from datetime import datetime, timedelta
 import threading
 import logging
-import requests
 import json
+from custom_made_libs.recording_downloader import DOWNLOAD_CHUNK_SIZE, download_recording
 
 
 def thread_function_async(func, func_arg1):
@@ -40,75 +39,11 @@ def thread_function(func):
 
 
 def download_recording_thread(rec_name: str, http_url, directory, glasses_offset = 3):
-    # send a request to the glasses to download the recording
-    r_recording = requests.get(
-        http_url + f"/recordings/{rec_name}" + "/scenevideo.mp4", stream=True
-    )
+    # bytes copied from the glasses to the files at once
+    chunk_size = DOWNLOAD_CHUNK_SIZE if "GLASSES_DOWNLOAD_CHUNK_SIZE" not in os.environ else int(os.environ["GLASSES_DOWNLOAD_CHUNK_SIZE"])
     print("Starting download of recording and gaze data. Please wait until it finishes")
-    if r_recording.status_code == 200:
-        # save the recording to the directory
-        path = os.path.join(directory, "scenevideo.mp4")
-        with open(path, "wb") as f:
-            for chunk in r_recording.iter_content(1024):
-                f.write(chunk)
-        print("Recording downloaded.")
-    else:
-        print("Recording not downloaded.")
-    r_gaze_data = requests.get(
-        http_url + f"/recordings/{rec_name}" + "/gazedata.gz", stream=True
-    )
-    if r_gaze_data.status_code == 200:
-        # save the recording to the directory
-        path = os.path.join(directory, "gazedata.gz")
-        with open(path, "wb") as f:
-            for chunk in r_gaze_data.iter_content(1024):
-                f.write(chunk)
-        print("Gaze data downloaded.")
-    else:
-        print("Gaze data not downloaded.")
-    r_event_data = requests.get(
-        http_url + f"/recordings/{rec_name}" + "/eventdata.gz", stream=True
-    )
-    if r_event_data.status_code == 200:
-        # save the recording to the directory
-        path = os.path.join(directory, "eventdata.gz")
-        with open(path, "wb") as f:
-            for chunk in r_event_data.iter_content(1024):
-                f.write(chunk)
-        print("Event data downloaded.")
-    else:
-        print("Event data not downloaded.")
-    r_imu_data = requests.get(
-        http_url + f"/recordings/{rec_name}" + "/imudata.gz", stream=True
-    )
-    if r_imu_data.status_code == 200:
-        # save the recording to the directory
-        path = os.path.join(directory, "imudata.gz")
-        with open(path, "wb") as f:
-            for chunk in r_imu_data.iter_content(1024):
-                f.write(chunk)
-        print("IMU data downloaded.")
-    else:
-        print("IMU data not downloaded.")
-    # get the meta data of the recording
-    r_meta_data = requests.get(http_url + f"/recordings/{rec_name}", stream=True)
-    if r_meta_data.status_code == 200:
-        # read the meta data as a json and extract the key "created"
-        meta_data = r_meta_data.json()
-        created = meta_data["created"]
-        # convert the created string to a datetime object
-        created = datetime.strptime(created, "%Y-%m-%dT%H:%M:%S.%fZ") + timedelta(
-            hours=glasses_offset
-        )
-
-        # created += datetime(hour=2) # offset timestamp
-        # save the creation date of the recording to a file
-        with open(os.path.join(directory, "start_timestamp.txt"), "w") as f:
-            f.write(str(created))
-        print("Meta data downloaded.")
-    else:
-        print("Meta data not downloaded.")
-
+    # all the files are downloaded at once over one session
+    download_recording(rec_name, http_url, directory, glasses_offset, chunk_size)
     print("Finished with all download attempts.")
 
 
@@ -0,0 +1,280 @@
+"""Module for the chunked container a kinect recording is written into.
+
+Every stream of a recording (color image, raw depth, ...) is appended to large chunk files in the Kinect
+folder, and every frame appends a fixed size record (timestamp, chunk, offset, length) to the index of
+its stream. A frame is saved as the exact content of the file it had in the per-frame folder layout, so
+exporting the container back to that layout only copies bytes.
+
+    Kinect/
+        container.json          - version and the file suffix of every stream
+        color.0000.chunk        - appended frames of the color stream, a new chunk every chunk_size bytes
+        color.index             - index records of the color stream
+        ...
+"""
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+
+from depth_io import DEPTH_RENDITIONS_DIR_NAME
+from kinect_imu import IMU_DIR_NAME
+
+CONTAINER_VERSION = 1
+CONTAINER_FILE_NAME = "container.json"
+CHUNK_SIZE = 1 << 30                # bytes per chunk file before starting the next one
+INDEX_FLUSH_INTERVAL = 30           # index records buffered before flushing, about a second of frames
+# record of the index of a stream, the payload of a frame is chunk file [offset, offset + length)
+INDEX_DTYPE = np.dtype([("timestamp", "<i8"), ("chunk", "<u4"), ("offset", "<u8"), ("length", "<u4")])
+
+# streams of a kinect recording, named after the file suffix they had in the per-frame folders
+STREAM_COLOR = "color"                      # timestamp.png
+STREAM_DEPTH = "depth"                      # timestamp_depth.npy / _depth16.png / _depth.csv
+STREAM_DEPTH_COLORED = "depth_colored"      # timestamp_depth.png
+STREAM_DEPTH_GREYSCALE = "depth_greyscale"  # timestamp_depth_greyscale.png
+STREAM_DEPTH_CAMERA = "depth_camera"        # timestamp_depth_camera.png, depth as seen by the depth camera
+STREAM_IR = "ir"                            # timestamp_ir.png
+
+
+def chunk_path(kinect_dir: str, stream: str, chunk: int) -> str:
+    """Function returning the path of a chunk file of a stream"""
+    return os.path.join(kinect_dir, f"{stream}.{chunk:04d}.chunk")
+
+
+def index_path(kinect_dir: str, stream: str) -> str:
+    """Function returning the path of the index of a stream"""
+    return os.path.join(kinect_dir, stream + ".index")
+
+
+def is_container(kinect_dir: str) -> bool:
+    """Function checking if a kinect recording folder was recorded into a container"""
+    return os.path.exists(os.path.join(kinect_dir, CONTAINER_FILE_NAME))
+
+
+class KinectContainerWriter:
+    """Class appending the frames of a kinect recording to the chunk files of their streams.
+
+    append can be called from several writer threads, the payloads are appended one after the other
+    so every file is written sequentially.
+    """
+
+    def __init__(self, kinect_dir: str, chunk_size: int = CHUNK_SIZE):
+        self.kinect_dir = kinect_dir
+        self.chunk_size: int = chunk_size
+        self.streams: dict = {}         # stream name -> file suffix
+        self.frames: int = 0            # appended payloads of all the streams
+        self.bytes_written: int = 0     # appended payload bytes of all the streams
+        self._chunks: dict = {}         # stream name -> [chunk number, open chunk file, offset in the chunk]
+        self._indexes: dict = {}        # stream name -> open index file
+        self._pending: int = 0          # records appended since the last flush
+        self._lock = threading.Lock()
+        os.makedirs(kinect_dir, exist_ok=True)
+        self._write_description()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        self.close()
+        return False
+
+    def append(self, stream: str, suffix: str, timestamp: int, payload: bytes) -> None:
+        """Function appending the content of a frame file to a stream.
+
+        Args:
+            stream (str): Stream name, one of the STREAM_ constants.
+            suffix (str): Name of the frame file after the timestamp, for example ".png" or "_depth.npy".
+            timestamp (int): Device timestamp of the frame in microseconds.
+            payload (bytes): Content of the frame file.
+        """
+        with self._lock:
+            if stream not in self.streams:
+                self._open_stream(stream, suffix)
+            chunk = self._chunks[stream]
+            if chunk[2] > 0 and chunk[2] + len(payload) > self.chunk_size:
+                chunk[1].close()
+                chunk[0] += 1
+                chunk[1] = open(chunk_path(self.kinect_dir, stream, chunk[0]), "ab")
+                chunk[2] = 0
+            chunk[1].write(payload)
+            record = np.array([(int(timestamp), chunk[0], chunk[2], len(payload))], dtype=INDEX_DTYPE)
+            self._indexes[stream].write(record.tobytes())
+            chunk[2] += len(payload)
+            self.frames += 1
+            self.bytes_written += len(payload)
+            self._pending += 1
+            if self._pending >= INDEX_FLUSH_INTERVAL:
+                self._flush()
+
+    def _open_stream(self, stream: str, suffix: str) -> None:
+        self.streams[stream] = suffix
+        self._write_description()
+        self._chunks[stream] = [0, open(chunk_path(self.kinect_dir, stream, 0), "ab"), 0]
+        self._indexes[stream] = open(index_path(self.kinect_dir, stream), "ab")
+
+    def _write_description(self) -> None:
+        path = os.path.join(self.kinect_dir, CONTAINER_FILE_NAME)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"version": CONTAINER_VERSION, "streams": self.streams}, f)
+        os.replace(path + ".tmp", path)
+
+    def _flush(self) -> None:
+        # the chunks are flushed first, so an index record never points past the written data
+        for chunk in self._chunks.values():
+            chunk[1].flush()
+        for index in self._indexes.values():
+            index.flush()
+        self._pending = 0
+
+    def close(self) -> None:
+        """Function flushing and closing all the chunk and index files"""
+        with self._lock:
+            self._flush()
+            for chunk in self._chunks.values():
+                chunk[1].close()
+            for index in self._indexes.values():
+                index.close()
+            self._chunks = {}
+            self._indexes = {}
+
+
+class KinectContainerReader:
+    """Class reading the frames of a kinect recording container.
+
+    The index of a stream is loaded once and sorted by timestamp, so a frame is found by binary search.
+    Records of a recording that was cut off before its data was written are ignored.
+    """
+
+    def __init__(self, kinect_dir: str):
+        self.kinect_dir = kinect_dir
+        with open(os.path.join(kinect_dir, CONTAINER_FILE_NAME), "r") as f:
+            description = json.load(f)
+        if description.get("version") != CONTAINER_VERSION:
+            raise Exception("unsupported kinect container version " + str(description.get("version")))
+        self.streams: dict = description["streams"]    # stream name -> file suffix
+        self._indexes: dict = {}
+
+    def index(self, stream: str) -> np.ndarray:
+        """Function returning the index records of a stream, sorted by timestamp"""
+        if stream not in self._indexes:
+            with open(index_path(self.kinect_dir, stream), "rb") as f:
+                content = f.read()
+            # drop a record that was only partly written
+            content = content[:len(content) - len(content) % INDEX_DTYPE.itemsize]
+            records = np.frombuffer(content, dtype=INDEX_DTYPE)
+            chunk_sizes = np.zeros(int(records["chunk"].max()) + 1 if len(records) else 0, dtype=np.uint64)
+            for chunk in range(len(chunk_sizes)):
+                path = chunk_path(self.kinect_dir, stream, chunk)
+                chunk_sizes[chunk] = os.path.getsize(path) if os.path.exists(path) else 0
+            if len(records):
+                records = records[records["offset"] + records["length"] <= chunk_sizes[records["chunk"]]]
+            # writer threads may append frames slightly out of order
+            self._indexes[stream] = records[np.argsort(records["timestamp"], kind="stable")]
+        return self._indexes[stream]
+
+    def timestamps(self, stream: str = STREAM_COLOR) -> np.ndarray:
+        """Function returning the sorted timestamps of the frames of a stream"""
+        return self.index(stream)["timestamp"]
+
+    def find(self, stream: str, timestamp: int) -> np.void:
+        """Function returning the index record of the frame with the given timestamp, or None"""
+        records = self.index(stream)
+        position = np.searchsorted(records["timestamp"], timestamp)
+        if position == len(records) or records["timestamp"][position] != timestamp:
+            return None
+        return records[position]
+
+    def nearest(self, stream: str, timestamp: int) -> int:
+        """Function returning the timestamp of the frame closest to the given timestamp, or None"""
+        timestamps = self.timestamps(stream)
+        if len(timestamps) == 0:
+            return None
+        position = int(np.searchsorted(timestamps, timestamp))
+        candidates = timestamps[max(position - 1, 0):position + 1]
+        return int(candidates[np.argmin(np.abs(candidates - timestamp))])
+
+    def read(self, stream: str, timestamp: int) -> bytes:
+        """Function returning the content of a frame file"""
+        record = self.find(stream, timestamp)
+        if record is None:
+            raise KeyError(f"no {stream} frame with timestamp {timestamp}")
+        return self.read_record(stream, record)
+
+    def read_record(self, stream: str, record: np.void) -> bytes:
+        """Function returning the payload an index record points to"""
+        with open(chunk_path(self.kinect_dir, stream, int(record["chunk"])), "rb") as f:
+            f.seek(int(record["offset"]))
+            return f.read(int(record["length"]))
+
+
+def read_kinect_timestamps(kinect_dir: str) -> list:
+    """Function returning the sorted timestamps of all the kinect frame folders, or of the frames of the recording container"""
+    if is_container(kinect_dir):
+        return np.unique(KinectContainerReader(kinect_dir).timestamps(STREAM_COLOR)).tolist()
+    kinect_images_timestamps = []
+    for entry in os.scandir(kinect_dir):    # frame folders, the other files of the recording are skipped
+        if entry.is_dir() and entry.name not in (IMU_DIR_NAME, DEPTH_RENDITIONS_DIR_NAME) and not entry.name.endswith(".tmp"):
+            # .tmp folders are frames the mkv extractor is still writing
+            try:
+                kinect_images_timestamps.append(int(entry.name))
+            except ValueError:
+                print("Warning: " + entry.name + " is not in the correct format for a Kinect recording file.")
+    kinect_images_timestamps.sort()
+    return kinect_images_timestamps
+
+
+def export_directories(kinect_dir: str, output_dir: str = None) -> int:
+    """Function writing the frames of a container in the per-frame folder layout.
+
+    Every frame gets a folder named after its timestamp with a file per stream, the files that already
+    exist with the right size are skipped, so an interrupted export can be run again.
+
+    Args:
+        kinect_dir (str): Kinect folder of a recording holding a container.
+        output_dir (str): Folder to export to, defaults to kinect_dir itself.
+
+    Returns:
+        int: Number of written frame files.
+    """
+    if output_dir is None:
+        output_dir = kinect_dir
+    reader = KinectContainerReader(kinect_dir)
+    written = 0
+    for stream, suffix in reader.streams.items():
+        records = reader.index(stream)
+        # read every chunk from start to end
+        records = records[np.lexsort((records["offset"], records["chunk"]))]
+        chunk_file = None
+        chunk = None
+        try:
+            for record in records:
+                name = str(int(record["timestamp"]))
+                path = os.path.join(output_dir, name, name + suffix)
+                if os.path.exists(path) and os.path.getsize(path) == record["length"]:
+                    continue
+                if chunk != int(record["chunk"]):
+                    if chunk_file is not None:
+                        chunk_file.close()
+                    chunk = int(record["chunk"])
+                    chunk_file = open(chunk_path(kinect_dir, stream, chunk), "rb")
+                chunk_file.seek(int(record["offset"]))
+                payload = chunk_file.read(int(record["length"]))
+                os.makedirs(os.path.join(output_dir, name), exist_ok=True)
+                with open(path + ".tmp", "wb") as f:
+                    f.write(payload)
+                os.replace(path + ".tmp", path)
+                written += 1
+        finally:
+            if chunk_file is not None:
+                chunk_file.close()
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a kinect recording container to a folder per frame")
+    parser.add_argument("recording_path", help="recording folder, for example ./recordings/recording_name")
+    parser.add_argument("--output-dir", default=None, help="folder to export to (default: the Kinect folder of the recording)")
+    args = parser.parse_args()
+    count = export_directories(os.path.join(args.recording_path, "Kinect"), args.output_dir)
+    print(f"Exported {count} kinect frame files.")
@@ -0,0 +1,89 @@
+"""Module for the columnar file the kinect IMU samples are saved in.
+
+Every column is a raw little endian file in the imu folder of the Kinect recording folder, appended to in
+blocks of samples, and loaded as a (memory mapped) numpy array.
+"""
+import json
+import os
+
+import numpy as np
+
+IMU_DIR_NAME = "imu"
+IMU_META_FILE_NAME = "meta.json"
+IMU_VERSION = 1
+# column name -> (dtype, number of components)
+IMU_COLUMNS = {
+    "acc_timestamp_usec": ("<u8", 1),   # device timestamp of the accelerometer sample
+    "acc": ("<f4", 3),                  # accelerometer in meters per second squared
+    "gyro_timestamp_usec": ("<u8", 1),  # device timestamp of the gyroscope sample
+    "gyro": ("<f4", 3),                 # gyroscope in radians per second
+    "temperature": ("<f4", 1),          # sensor temperature in celsius
+}
+
+
+def imu_column_path(kinect_dir: str, column: str) -> str:
+    """Function returning the path of the file of an imu column"""
+    return os.path.join(kinect_dir, IMU_DIR_NAME, column + ".bin")
+
+
+class ImuColumnWriter:
+    """Class appending blocks of imu samples to the column files of a recording"""
+
+    def __init__(self, kinect_dir: str):
+        self.kinect_dir = kinect_dir
+        self.samples: int = 0   # samples appended by this writer
+        os.makedirs(os.path.join(kinect_dir, IMU_DIR_NAME), exist_ok=True)
+        with open(os.path.join(kinect_dir, IMU_DIR_NAME, IMU_META_FILE_NAME), "w") as f:
+            json.dump({"version": IMU_VERSION, "columns": {name: list(column) for name, column in IMU_COLUMNS.items()}}, f)
+        self._files = {name: open(imu_column_path(kinect_dir, name), "ab") for name in IMU_COLUMNS}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        self.close()
+        return False
+
+    def append(self, columns: dict) -> None:
+        """Function appending a block of samples, given as an array per column with one row per sample"""
+        count = len(columns["acc_timestamp_usec"])
+        for name, (dtype, size) in IMU_COLUMNS.items():
+            array = np.ascontiguousarray(columns[name], dtype=dtype)
+            if array.shape != ((count,) if size == 1 else (count, size)):
+                raise ValueError(f"imu column {name} has shape {array.shape} for {count} samples")
+            self._files[name].write(array.tobytes())
+        self.samples += count
+
+    def flush(self) -> None:
+        """Function flushing the column files"""
+        for column_file in self._files.values():
+            column_file.flush()
+
+    def close(self) -> None:
+        """Function closing the column files"""
+        for column_file in self._files.values():
+            column_file.close()
+        self._files = {}
+
+
+def load_imu_columns(kinect_dir: str, mmap: bool = True) -> dict:
+    """Function loading the imu columns of a recording.
+
+    Returns:
+        dict: Column name -> array with a row per sample, the columns are cut to the number of samples
+        that were fully written.
+    """
+    sizes = {}
+    for name, (dtype, size) in IMU_COLUMNS.items():
+        sizes[name] = os.path.getsize(imu_column_path(kinect_dir, name)) // (np.dtype(dtype).itemsize * size)
+    count = min(sizes.values())
+    columns = {}
+    for name, (dtype, size) in IMU_COLUMNS.items():
+        shape = (count,) if size == 1 else (count, size)
+        if count == 0:
+            columns[name] = np.zeros(shape, dtype=dtype)
+        elif mmap:
+            columns[name] = np.memmap(imu_column_path(kinect_dir, name), dtype=dtype, mode="r", shape=shape)
+        else:
+            columns[name] = np.fromfile(imu_column_path(kinect_dir, name), dtype=dtype, count=count * size).reshape(shape)
+    return columns
@@ -0,0 +1,227 @@
+"""Module extracting a kinect recording into the folder per frame layout the frame processor reads.
+
+A replay source yields the frames and imu samples of a recording: MkvReplaySource reads the native mkv
+recording of the Azure Kinect SDK, SyntheticReplaySource generates frames so the extraction can be run
+without a recording or the SDK.
+"""
+import argparse
+import json
+import os
+import shutil
+
+import cv2
+import numpy as np
+
+from depth_io import DEPTH_FORMAT_NPY, DEPTH_FORMATS, write_depth
+from frame_writer import FrameWriter
+from kinect_imu import IMU_COLUMNS, IMU_DIR_NAME, ImuColumnWriter
+from processing_manifest import file_signature
+
+MKV_FILE_NAME = "recording.mkv"             # mkv recording inside the Kinect folder of a recording
+EXTRACTED_FILE_NAME = "extracted.json"      # written once the whole recording is extracted
+IMU_BLOCK_SIZE = 4096                       # imu samples per appended block
+
+
+class MkvReplaySource:
+    """Class replaying the captures and imu samples of an Azure Kinect mkv recording"""
+
+    def __init__(self, path: str):
+        # the sdk is only needed to read real recordings
+        import pykinect_azure as pykinect
+        pykinect.initialize_libraries()
+        self.path = path
+        self.playback = pykinect.start_playback(path)
+
+    def frames(self):
+        """Yield (timestamp in microseconds, color image, depth image) for every capture with a color image.
+
+        The color image is the jpeg buffer for mjpg recordings and a BGR array otherwise, the depth image is
+        the depth in millimeters transformed to the color camera, or None if the capture has no depth.
+        """
+        from pykinect_azure import K4A_IMAGE_FORMAT_COLOR_MJPG
+        from pykinect_azure.k4a._k4a import k4a_image_get_device_timestamp_usec
+        while True:
+            ret, capture = self.playback.update()
+            if not ret:
+                break
+            color_object = capture.get_color_image_object()
+            if not color_object.is_valid():
+                continue
+            timestamp = int(k4a_image_get_device_timestamp_usec(color_object.handle()))
+            if color_object.get_format() == K4A_IMAGE_FORMAT_COLOR_MJPG:
+                color_image = np.ctypeslib.as_array(color_object.buffer_pointer, shape=(color_object.get_size(),)).tobytes()
+            else:
+                ret_color, color_image = color_object.to_numpy()
+                if not ret_color:
+                    continue
+            depth_image = None
+            if capture.get_depth_image_object().is_valid():
+                ret_depth, depth_image = capture.get_transformed_depth_image()
+                if not ret_depth:
+                    depth_image = None
+            yield timestamp, color_image, depth_image
+
+    def imu_blocks(self):
+        """Yield the imu samples of the recording as blocks of columns, see kinect_imu.IMU_COLUMNS"""
+        from pykinect_azure.k4a import _k4a
+        from pykinect_azure.k4arecord import _k4arecord
+        imu_sample = _k4a.k4a_imu_sample_t()
+        block = new_imu_block(IMU_BLOCK_SIZE)
+        count = 0
+        while _k4arecord.k4a_playback_get_next_imu_sample(self.playback._handle, imu_sample) == _k4arecord.K4A_STREAM_RESULT_SUCCEEDED:
+            block["acc_timestamp_usec"][count] = imu_sample.acc_timestamp_usec
+            block["acc"][count] = imu_sample.acc_sample.v
+            block["gyro_timestamp_usec"][count] = imu_sample.gyro_timestamp_usec
+            block["gyro"][count] = imu_sample.gyro_sample.v
+            block["temperature"][count] = imu_sample.temperature
+            count += 1
+            if count == IMU_BLOCK_SIZE:
+                yield block
+                block = new_imu_block(IMU_BLOCK_SIZE)
+                count = 0
+        if count:
+            yield {name: column[:count] for name, column in block.items()}
+
+    def close(self) -> None:
+        self.playback.close()
+
+
+class SyntheticReplaySource:
+    """Class generating a recording of moving test patterns, in the same form as MkvReplaySource"""
+
+    def __init__(self, frame_count: int = 90, fps: int = 30, width: int = 640, height: int = 360,
+                 imu_rate: int = 1600, start_usec: int = 1000000):
+        self.frame_count: int = frame_count
+        self.fps: int = fps
+        self.width: int = width
+        self.height: int = height
+        self.imu_rate: int = imu_rate       # imu samples per second
+        self.start_usec: int = start_usec   # device timestamp of the first frame
+
+    def frames(self):
+        """Yield (timestamp in microseconds, jpeg buffer, depth image) for every generated frame"""
+        x = np.arange(self.width, dtype=np.uint16)[None, :]
+        y = np.arange(self.height, dtype=np.uint16)[:, None]
+        for index in range(self.frame_count):
+            timestamp = self.start_usec + index * 1000000 // self.fps
+            color_image = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+            color_image[:, :, 0] = (x + index * 4) % 256
+            color_image[:, :, 1] = (y + index * 2) % 256
+            color_image[:, :, 2] = index % 256
+            ret, jpeg_buffer = cv2.imencode(".jpg", color_image)
+            depth_image = (500 + (x * 3 + y * 2 + index * 10) % 4000).astype(np.uint16)
+            yield timestamp, jpeg_buffer.tobytes(), depth_image
+
+    def imu_blocks(self):
+        """Yield the generated imu samples as blocks of columns, see kinect_imu.IMU_COLUMNS"""
+        total = self.frame_count * self.imu_rate // self.fps
+        for start in range(0, total, IMU_BLOCK_SIZE):
+            count = min(IMU_BLOCK_SIZE, total - start)
+            index = np.arange(start, start + count)
+            block = new_imu_block(count)
+            block["acc_timestamp_usec"][:] = self.start_usec + index * 1000000 // self.imu_rate
+            block["gyro_timestamp_usec"][:] = block["acc_timestamp_usec"]
+            block["acc"][:] = np.stack([np.sin(index / 100), np.cos(index / 100), np.full(count, 9.81)], axis=1)
+            block["gyro"][:] = np.stack([np.sin(index / 50), np.zeros(count), np.cos(index / 50)], axis=1) * 0.1
+            block["temperature"][:] = 30.0
+            yield block
+
+    def close(self) -> None:
+        pass
+
+
+def new_imu_block(count: int) -> dict:
+    """Function returning empty imu columns for count samples"""
+    return {name: np.zeros((count,) if size == 1 else (count, size), dtype=dtype)
+            for name, (dtype, size) in IMU_COLUMNS.items()}
+
+
+def write_extracted_frame(kinect_dir: str, timestamp: int, color_image, depth_image: np.ndarray,
+                          depth_format: str) -> None:
+    """Function writing the folder of an extracted frame, the folder only appears once it is complete"""
+    name = str(timestamp)
+    temp_dir = os.path.join(kinect_dir, name + ".tmp")
+    if os.path.exists(temp_dir):
+        shutil.rmtree(temp_dir)
+    os.mkdir(temp_dir)
+    if isinstance(color_image, bytes):
+        with open(os.path.join(temp_dir, name + ".jpg"), "wb") as f:
+            f.write(color_image)
+    elif not cv2.imwrite(os.path.join(temp_dir, name + ".png"), color_image):
+        raise OSError("could not write the color image of frame " + name)
+    if depth_image is not None:
+        write_depth(temp_dir, name, depth_image, depth_format)
+    os.rename(temp_dir, os.path.join(kinect_dir, name))
+
+
+def extract_recording(source, kinect_dir: str, depth_format: str = DEPTH_FORMAT_NPY, writer_threads: int = 4) -> int:
+    """Function writing the frames and imu samples of a replay source into a Kinect recording folder.
+
+    Frames that already have a folder are skipped, so an interrupted extraction can be run again.
+
+    Args:
+        source: MkvReplaySource or SyntheticReplaySource.
+        kinect_dir (str): Kinect folder to write a folder per frame and the imu columns into.
+        depth_format (str): Format of the depth files, one of depth_io.DEPTH_FORMATS.
+        writer_threads (int): Threads encoding and writing the frames.
+
+    Returns:
+        int: Number of written frames.
+    """
+    if depth_format not in DEPTH_FORMATS:
+        raise ValueError(f"unknown depth format \"{depth_format}\", expected one of {DEPTH_FORMATS}")
+    os.makedirs(kinect_dir, exist_ok=True)
+    written = 0
+    with FrameWriter(writer_threads) as writer:
+        for timestamp, color_image, depth_image in source.frames():
+            if os.path.isdir(os.path.join(kinect_dir, str(timestamp))):
+                continue
+            writer.submit(write_extracted_frame, kinect_dir, timestamp, color_image, depth_image, depth_format)
+            written += 1
+    # the imu columns are small, they are always written again
+    if os.path.exists(os.path.join(kinect_dir, IMU_DIR_NAME)):
+        shutil.rmtree(os.path.join(kinect_dir, IMU_DIR_NAME))
+    with ImuColumnWriter(kinect_dir) as imu_writer:
+        for block in source.imu_blocks():
+            imu_writer.append(block)
+    return written
+
+
+def is_extracted(kinect_dir: str) -> bool:
+    """Function checking if the mkv recording of a Kinect folder was completely extracted since it last changed"""
+    marker_path = os.path.join(kinect_dir, EXTRACTED_FILE_NAME)
+    if not os.path.exists(marker_path):
+        return False
+    with open(marker_path, "r") as f:
+        marker = json.load(f)
+    return marker.get("source") == file_signature(os.path.join(kinect_dir, MKV_FILE_NAME))
+
+
+def extract_mkv(kinect_dir: str, depth_format: str = DEPTH_FORMAT_NPY, writer_threads: int = 4) -> int:
+    """Function extracting the mkv recording of a Kinect folder next to it, returns the number of written frames"""
+    mkv_path = os.path.join(kinect_dir, MKV_FILE_NAME)
+    source = MkvReplaySource(mkv_path)
+    try:
+        written = extract_recording(source, kinect_dir, depth_format, writer_threads)
+    finally:
+        source.close()
+    with open(os.path.join(kinect_dir, EXTRACTED_FILE_NAME), "w") as f:
+        json.dump({"source": file_signature(mkv_path), "depth_format": depth_format}, f)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract the mkv kinect recording of a recording into a folder per frame")
+    parser.add_argument("recording_path", help="recording folder, for example ./recordings/recording_name")
+    parser.add_argument("--depth-format", default=DEPTH_FORMAT_NPY, choices=DEPTH_FORMATS,
+                        help="format of the extracted depth files (default: %(default)s)")
+    parser.add_argument("--writer-threads", type=int, default=4, help="threads writing the frames (default: %(default)s)")
+    parser.add_argument("--synthetic", type=int, default=None, metavar="FRAMES",
+                        help="extract this many generated frames instead of the mkv recording, to try the extraction without one")
+    args = parser.parse_args()
+    kinect_dir = os.path.join(args.recording_path, "Kinect")
+    if args.synthetic is not None:
+        count = extract_recording(SyntheticReplaySource(args.synthetic), kinect_dir, args.depth_format, args.writer_threads)
+    else:
+        count = extract_mkv(kinect_dir, args.depth_format, args.writer_threads)
+    print(f"Extracted {count} kinect frames into {kinect_dir}.")
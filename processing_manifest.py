@@ -0,0 +1,202 @@
+"""Module keeping track of what the frame processor already wrote for a recording"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from depth_io import DEPTH_FORMAT_CSV, depth_file_path, find_depth_file
+from frame_writer import find_color_file
+from kinect_container import KinectContainerReader, STREAM_COLOR, STREAM_DEPTH
+
+MANIFEST_VERSION = 1
+MANIFEST_FILE_NAME = "manifest.json"
+JOURNAL_FILE_NAME = "manifest.journal"   # frames finished by a run that did not complete yet
+# recording files the accepted frames depend on
+INPUT_FILES = (
+    "Kinect/start_timestamp.txt",
+    "Glasses3/start_timestamp.txt",
+    "Glasses3/gazedata.gz",
+    "Glasses3/imudata.gz",
+)
+
+
+def file_signature(path: str) -> list:
+    """Function returning [size, mtime in nanoseconds] of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def frame_source_paths(recording_path: str, kinect_image_name: str) -> list:
+    """Function returning the kinect files copied into the output folder of a frame"""
+    frame_path = os.path.join(recording_path, "Kinect", kinect_image_name)
+    color_path = find_color_file(frame_path, kinect_image_name)
+    if color_path is None:
+        color_path = os.path.join(frame_path, kinect_image_name + ".png")
+    depth_path = find_depth_file(frame_path, kinect_image_name)
+    if depth_path is None:
+        depth_path = depth_file_path(frame_path, kinect_image_name, DEPTH_FORMAT_CSV)
+    return [color_path, depth_path]
+
+
+def frame_sources(recording_path: str, kinect_image_name: str, container: KinectContainerReader = None) -> list:
+    """Function returning the signatures of the kinect files copied into the output folder of a frame.
+
+    The frames of a container are signed by [chunk, offset, length] of their index records, the chunks
+    are only ever appended to.
+    """
+    if container is None:
+        return [file_signature(path) for path in frame_source_paths(recording_path, kinect_image_name)]
+    sources = []
+    for stream in (STREAM_COLOR, STREAM_DEPTH):
+        record = container.find(stream, int(kinect_image_name)) if stream in container.streams else None
+        sources.append(None if record is None else [int(record["chunk"]), int(record["offset"]), int(record["length"])])
+    return sources
+
+
+class ProcessingManifest:
+    """Class reading and writing the manifest of a processed recording.
+
+    The manifest holds the signatures of the recording files, the processing parameters and every
+    emitted frame with a key of everything its output folder depends on. Frames finished during a run
+    are appended to a journal, so an interrupted run can continue from where it stopped.
+    """
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.inputs: dict = None        # signatures of the recording files of the last run
+        self.parameters: dict = None    # processing parameters of the last run
+        self.complete: bool = False     # whether the last run finished
+        self.frames: dict = {}          # emitted frame name -> {"key": ..., "sources": [...]}
+        self.emitted: dict = {}         # frames emitted by the current run
+        self.reuse_frames: bool = True  # False to rewrite every frame even if its key did not change
+        self.reused_frames: int = 0     # frames of the current run kept from a previous run
+        self._lock = threading.Lock()
+        self._journal = None
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.output_path, MANIFEST_FILE_NAME)
+
+    @property
+    def journal_path(self) -> str:
+        return os.path.join(self.output_path, JOURNAL_FILE_NAME)
+
+    def load(self) -> None:
+        """Function loading the manifest and the journal of an interrupted run, if they exist"""
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                self.inputs = manifest["inputs"]
+                self.parameters = manifest["parameters"]
+                self.complete = manifest["complete"]
+                self.frames = manifest["frames"]
+        if os.path.exists(self.journal_path):
+            self.complete = False
+            with open(self.journal_path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # last line of a run killed while writing it
+                        continue
+                    self.frames[entry["name"]] = {"key": entry["key"], "sources": entry["sources"]}
+
+    @staticmethod
+    def input_signature(recording_path: str, kinect_images_timestamps: list) -> dict:
+        """Function returning the signatures of the recording files the output depends on"""
+        names = "\n".join(str(name) for name in kinect_images_timestamps)
+        inputs = {name: file_signature(os.path.join(recording_path, name)) for name in INPUT_FILES}
+        inputs["Kinect"] = hashlib.sha1(names.encode()).hexdigest()    # the list of kinect frames
+        return inputs
+
+    def is_up_to_date(self, recording_path: str, inputs: dict, parameters: dict,
+                      container: KinectContainerReader = None) -> bool:
+        """Function checking if the last run completed with the same inputs and parameters"""
+        if not self.complete or self.inputs != inputs or self.parameters != parameters:
+            return False
+        for name, frame in self.frames.items():
+            sources = frame_sources(recording_path, name, container)
+            if sources != frame["sources"] or not os.path.isdir(os.path.join(self.output_path, name)):
+                return False
+        return True
+
+    @staticmethod
+    def frame_key(sources: list, gaze_sample: dict, output_mode: str) -> str:
+        """Function returning a key of everything the output folder of a frame depends on"""
+        return hashlib.sha1(json.dumps([sources, str(gaze_sample), output_mode]).encode()).hexdigest()
+
+    def begin(self, inputs: dict, parameters: dict) -> None:
+        """Function starting a run, the frames of previous runs are kept until finish"""
+        os.makedirs(self.output_path, exist_ok=True)
+        self.inputs = inputs
+        self.parameters = parameters
+        self.complete = False
+        self.emitted = {}
+        self.reused_frames = 0
+        # fold the journal of an interrupted run into the manifest before starting a new one
+        self._write()
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._journal = open(self.journal_path, "a")
+
+    def is_frame_done(self, name: str, key: str) -> bool:
+        """Function checking if the output folder of a frame is already written with the same key"""
+        frame = self.frames.get(name)
+        return (self.reuse_frames and frame is not None and frame["key"] == key
+                and os.path.isdir(os.path.join(self.output_path, name)))
+
+    def keep_frame(self, name: str) -> None:
+        """Function keeping the folder of a frame written by a previous run"""
+        with self._lock:
+            self.emitted[name] = self.frames[name]
+            self.reused_frames += 1
+
+    def record_frame(self, name: str, key: str, sources: list) -> None:
+        """Function recording a frame of the current run, called once its folder is fully written"""
+        with self._lock:
+            self.emitted[name] = {"key": key, "sources": sources}
+            self._journal.write(json.dumps({"name": name, "key": key, "sources": sources}) + "\n")
+            self._journal.flush()
+
+    def finish(self) -> int:
+        """Function removing the frames no longer emitted and marking the run complete.
+
+        Returns:
+            int: Number of removed frame folders.
+        """
+        removed = 0
+        for name in self.frames:
+            if name not in self.emitted and os.path.isdir(os.path.join(self.output_path, name)):
+                shutil.rmtree(os.path.join(self.output_path, name))
+                removed += 1
+        self.frames = self.emitted
+        self.complete = True
+        self.close()
+        self._write()
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        return removed
+
+    def close(self) -> None:
+        """Function closing the journal of a run that did not finish, keeping it for the next run"""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _write(self) -> None:
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "inputs": self.inputs,
+            "parameters": self.parameters,
+            "complete": self.complete,
+            "frames": self.frames,
+        }
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self.manifest_path)
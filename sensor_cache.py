@@ -0,0 +1,167 @@
+"""Module caching the glasses sensor streams as memory-mappable column arrays.
+
+The columns of gazedata.gz and imudata.gz are saved as .npy files in a folder next to the source file
+(gazedata.gz -> gazedata.cache), together with the hash of the source file they were built from.
+Timestamps are kept in the glasses clock, values missing from a sample are NaN.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".cache"
+META_FILE_NAME = "meta.json"
+
+# column name -> (path of the value inside the sample data, number of components)
+GAZE_COLUMNS = {
+    "gaze2d": (("gaze2d",), 2),
+    "gaze3d": (("gaze3d",), 3),
+    "eyeleft_gazeorigin": (("eyeleft", "gazeorigin"), 3),
+    "eyeleft_gazedirection": (("eyeleft", "gazedirection"), 3),
+    "eyeleft_pupildiameter": (("eyeleft", "pupildiameter"), 1),
+    "eyeright_gazeorigin": (("eyeright", "gazeorigin"), 3),
+    "eyeright_gazedirection": (("eyeright", "gazedirection"), 3),
+    "eyeright_pupildiameter": (("eyeright", "pupildiameter"), 1),
+}
+GLASSES_IMU_COLUMNS = {
+    "accelerometer": (("accelerometer",), 3),
+    "gyroscope": (("gyroscope",), 3),
+    "magnetometer": (("magnetometer",), 3),
+}
+
+
+def file_hash(path: str) -> str:
+    """Function returning the sha1 of a file's content"""
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def cache_path(source_path: str) -> str:
+    """Function returning the cache folder of a source file"""
+    return os.path.splitext(source_path)[0] + CACHE_SUFFIX
+
+
+def parse_columns(source_path: str, columns: dict) -> dict:
+    """Function parsing a gzipped glasses json stream into column arrays.
+
+    Returns:
+        dict: "timestamp" and "valid" (whether the sample has any data) arrays, and an array per column.
+    """
+    timestamps = []
+    valid = []
+    values = {name: [] for name in columns}
+    missing = {name: [np.nan] * size for name, (_, size) in columns.items()}
+    with gzip.open(source_path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            sample = json.loads(line)
+            data = sample["data"]
+            timestamps.append(sample["timestamp"])
+            valid.append(bool(data))
+            for name, (keys, size) in columns.items():
+                value = data
+                for key in keys:
+                    value = value.get(key) if isinstance(value, dict) else None
+                if value is None:
+                    value = missing[name]
+                elif size == 1:
+                    value = [value]
+                values[name].append(value)
+    arrays = {
+        "timestamp": np.array(timestamps, dtype=float),
+        "valid": np.array(valid, dtype=bool),
+    }
+    for name, (_, size) in columns.items():
+        array = np.array(values[name], dtype=float).reshape(-1, size)
+        arrays[name] = array[:, 0] if size == 1 else array
+    return arrays
+
+
+def build_cache(source_path: str, columns: dict, source_hash: str) -> None:
+    """Function writing the column cache of a source file, replacing an existing one"""
+    path = cache_path(source_path)
+    temp_path = path + ".tmp"
+    if os.path.exists(temp_path):
+        shutil.rmtree(temp_path)
+    os.makedirs(temp_path)
+    for name, array in parse_columns(source_path, columns).items():
+        np.save(os.path.join(temp_path, name + ".npy"), array)
+    stat = os.stat(source_path)
+    meta = {
+        "version": CACHE_VERSION,
+        "columns": list(columns),
+        "source_hash": source_hash,
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+    }
+    with open(os.path.join(temp_path, META_FILE_NAME), "w") as f:
+        json.dump(meta, f)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.rename(temp_path, path)
+
+
+def is_cache_fresh(source_path: str, columns: dict) -> bool:
+    """Function checking if the cache of a source file was built from its current content.
+
+    The hash is only recomputed when the size or modification time of the source changed.
+    """
+    meta_path = os.path.join(cache_path(source_path), META_FILE_NAME)
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+    if meta.get("version") != CACHE_VERSION or meta.get("columns") != list(columns):
+        return False
+    stat = os.stat(source_path)
+    if stat.st_size == meta["source_size"] and stat.st_mtime_ns == meta["source_mtime_ns"]:
+        return True
+    if file_hash(source_path) != meta["source_hash"]:
+        return False
+    # same content with a new modification time, no need to hash it again next time
+    meta["source_size"] = stat.st_size
+    meta["source_mtime_ns"] = stat.st_mtime_ns
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    return True
+
+
+def load_columns(source_path: str, columns: dict, mmap_mode: str = "r") -> dict:
+    """Function returning the column arrays of a source file, building or rebuilding its cache if needed.
+
+    Args:
+        source_path (str): Path of the gzipped glasses json stream.
+        columns (dict): GAZE_COLUMNS or GLASSES_IMU_COLUMNS.
+        mmap_mode (str): Memory map mode passed to np.load, None reads the arrays into memory.
+
+    Returns:
+        dict: Column name -> array, with the "timestamp" and "valid" columns.
+    """
+    if not is_cache_fresh(source_path, columns):
+        try:
+            build_cache(source_path, columns, file_hash(source_path))
+        except OSError as exception:
+            # the recording folder may be read only, parse without caching
+            print("Warning: could not write the cache of " + source_path + ": " + str(exception))
+            return parse_columns(source_path, columns)
+    path = cache_path(source_path)
+    names = ["timestamp", "valid"] + list(columns)
+    return {name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode) for name in names}
+
+
+def load_gaze_columns(gaze_path: str, mmap_mode: str = "r") -> dict:
+    """Function returning the cached columns of a gazedata.gz file"""
+    return load_columns(gaze_path, GAZE_COLUMNS, mmap_mode)
+
+
+def load_glasses_imu_columns(imu_path: str, mmap_mode: str = "r") -> dict:
+    """Function returning the cached columns of an imudata.gz file, kinect_imu.load_imu_columns reads the kinect imu"""
+    return load_columns(imu_path, GLASSES_IMU_COLUMNS, mmap_mode)
@@ -0,0 +1,39 @@
+"""Tests of the kinect recording pipeline run on a replayed recording, without the device"""
+import pytest
+
+from capture_benchmark import run_benchmark
+from kinect_container import read_kinect_timestamps
+from custom_made_libs.recording_writer import RECORDING_LAYOUTS
+from custom_made_libs.replay_device import ReplayDevice, open_replay_source
+
+FRAME_COUNT = 20
+
+
+@pytest.mark.parametrize("layout", RECORDING_LAYOUTS)
+def test_run_benchmark_records_every_synthetic_frame(tmp_path, layout):
+    kinect_dir = str(tmp_path / "Kinect")
+    device = ReplayDevice(open_replay_source(f"synthetic:{FRAME_COUNT}"), realtime=False)
+    try:
+        result = run_benchmark(device, kinect_dir, layout=layout)
+    finally:
+        device.close()
+    assert result["frames"] == FRAME_COUNT
+    assert result["write_queue"].written_frames == FRAME_COUNT
+    assert result["write_queue"].dropped_frames == 0
+    assert len(read_kinect_timestamps(kinect_dir)) == FRAME_COUNT
+
+    # the recording replays with a depth image for every frame
+    frames = list(open_replay_source(kinect_dir).frames())
+    assert len(frames) == FRAME_COUNT
+    assert all(depth_image is not None for _, _, depth_image in frames)
+
+
+def test_replay_device_stops_after_the_last_frame():
+    device = ReplayDevice(open_replay_source("synthetic:3"), realtime=False)
+    device.start()
+    for _ in range(3):
+        assert device.is_valid()
+        assert device.update().is_valid()
+    assert not device.is_valid()
+    with pytest.raises(Exception):
+        device.update()
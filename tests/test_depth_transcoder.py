@@ -0,0 +1,37 @@
+"""Tests of converting depth files between the formats of depth_io"""
+import os
+
+import numpy as np
+
+from depth_io import DEPTH_FORMAT_CSV, DEPTH_FORMAT_NPY, depth_file_path, load_depth, write_depth
+from depth_transcoder import transcode_frame
+
+TIMESTAMP = "1000150"
+
+
+def write_frame(frame_dir) -> np.ndarray:
+    depth_image = np.random.default_rng(0).integers(0, 5000, size=(24, 32), dtype=np.uint16)
+    write_depth(str(frame_dir), TIMESTAMP, depth_image, DEPTH_FORMAT_CSV)
+    return depth_image
+
+
+def test_converted_frame_is_skipped(tmp_path):
+    depth_image = write_frame(tmp_path)
+    source_path = depth_file_path(str(tmp_path), TIMESTAMP, DEPTH_FORMAT_CSV)
+    assert transcode_frame(str(tmp_path), TIMESTAMP, source_path, DEPTH_FORMAT_NPY).converted == 1
+    assert transcode_frame(str(tmp_path), TIMESTAMP, source_path, DEPTH_FORMAT_NPY).skipped == 1
+    assert np.array_equal(load_depth(depth_file_path(str(tmp_path), TIMESTAMP, DEPTH_FORMAT_NPY)), depth_image)
+
+
+def test_broken_target_is_rewritten_before_removing_the_source(tmp_path):
+    depth_image = write_frame(tmp_path)
+    source_path = depth_file_path(str(tmp_path), TIMESTAMP, DEPTH_FORMAT_CSV)
+    target_path = depth_file_path(str(tmp_path), TIMESTAMP, DEPTH_FORMAT_NPY)
+    transcode_frame(str(tmp_path), TIMESTAMP, source_path, DEPTH_FORMAT_NPY)
+    # a target cut off by an interrupted run, newer than its source
+    with open(target_path, "r+b") as f:
+        f.truncate(os.path.getsize(target_path) // 2)
+    result = transcode_frame(str(tmp_path), TIMESTAMP, source_path, DEPTH_FORMAT_NPY, remove_source=True)
+    assert result.converted == 1 and result.skipped == 0
+    assert not os.path.exists(source_path)
+    assert np.array_equal(load_depth(target_path), depth_image)
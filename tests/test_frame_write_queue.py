@@ -0,0 +1,91 @@
+"""Tests of the overflow policies of the write queue between the capture loop and the frame writers"""
+import threading
+
+import numpy as np
+
+from custom_made_libs.frame_pool import FramePool
+from custom_made_libs.frame_write_queue import (
+    OVERFLOW_BLOCK,
+    OVERFLOW_DROP_DEPTH,
+    OVERFLOW_DROP_OLDEST,
+    FrameWriteQueue,
+    queue_capacity,
+)
+
+MAX_FRAMES = 2
+TIMEOUT = 5
+
+
+class HeldWriter:
+    """Writer holding on to the first frame until it is let go, so the queue fills up behind it"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.go = threading.Event()
+        self.written = {}   # timestamp -> whether the frame was written with its depth
+
+    def write(self, frame) -> None:
+        self.started.set()
+        self.go.wait(TIMEOUT)
+        self.written[frame.timestamp_usec] = frame.transformed_depth is not None
+
+
+def make_frame(pool: FramePool, timestamp_usec: int):
+    frame = pool.acquire(timestamp_usec)
+    frame.color = np.zeros((2, 2, 3), dtype=np.uint8)
+    frame.transformed_depth = np.ones((2, 2), dtype=np.uint16)
+    return frame
+
+
+def fill_queue(overflow_policy: str, frames_count: int):
+    """Function putting frames_count frames into a queue whose single writer is held on the first one.
+
+    Every frame is also retained for a preview, returns the queue, the writer, the frames and whether the
+    puts returned without waiting.
+    """
+    pool = FramePool(queue_capacity(MAX_FRAMES, overflow_policy) + frames_count)
+    writer = HeldWriter()
+    queue = FrameWriteQueue(writer.write, MAX_FRAMES, overflow_policy, writers=1)
+    frames = [make_frame(pool, timestamp_usec) for timestamp_usec in range(1, frames_count + 1)]
+    queue.put(frames[0].retain())
+    assert writer.started.wait(TIMEOUT)
+    putter = threading.Thread(target=lambda: [queue.put(frame.retain()) for frame in frames[1:]], daemon=True)
+    putter.start()
+    putter.join(0.5)
+    returned = not putter.is_alive()
+    writer.go.set()
+    putter.join(TIMEOUT)
+    queue.close()
+    return queue, writer, frames, returned
+
+
+def test_block_waits_for_the_writers():
+    queue, writer, frames, returned = fill_queue(OVERFLOW_BLOCK, 1 + MAX_FRAMES + 1)
+    assert not returned
+    assert writer.written == {1: True, 2: True, 3: True, 4: True}
+    assert (queue.written_frames, queue.dropped_frames, queue.dropped_depth, queue.max_depth) == (4, 0, 0, MAX_FRAMES)
+
+
+def test_drop_oldest_drops_whole_frames():
+    queue, writer, frames, returned = fill_queue(OVERFLOW_DROP_OLDEST, 1 + MAX_FRAMES + 2)
+    assert returned
+    assert writer.written == {1: True, 4: True, 5: True}
+    assert (queue.written_frames, queue.dropped_frames, queue.dropped_depth) == (3, 2, 0)
+
+
+def test_drop_depth_strips_queued_frames_before_dropping_any():
+    queue, writer, frames, returned = fill_queue(OVERFLOW_DROP_DEPTH, 1 + 2 * MAX_FRAMES)
+    assert returned
+    # the two oldest queued frames lost their depth to make room for the two newest
+    assert writer.written == {1: True, 2: False, 3: False, 4: True, 5: True}
+    assert (queue.written_frames, queue.dropped_frames, queue.dropped_depth) == (5, 0, 2)
+    # the frames shared with the preview keep their depth
+    assert all(frame.transformed_depth is not None for frame in frames)
+
+
+def test_drop_depth_drops_whole_frames_once_full():
+    queue, writer, frames, returned = fill_queue(OVERFLOW_DROP_DEPTH, 1 + 2 * MAX_FRAMES + 1)
+    assert returned
+    assert writer.written == {1: True, 3: False, 4: False, 5: True, 6: True}
+    assert (queue.written_frames, queue.dropped_frames, queue.dropped_depth) == (5, 1, 3)
+    assert queue.max_depth == queue.capacity == 2 * MAX_FRAMES
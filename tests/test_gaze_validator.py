@@ -0,0 +1,101 @@
+"""Tests of validating the gaze windows of all kinect frames at once against FrameData.validate_sample"""
+import numpy as np
+import pytest
+
+from frame_processor import SOURCE_GAZE, FrameData, kinect_events, merge_sources
+from gaze_validator import GazeThresholds, find_gaze_windows, normalize, validate_gaze_windows
+
+KINECT_MUL = 10**-6
+
+
+def make_samples(rng, count: int, noise: float) -> list:
+    """Function returning raw gaze samples on a millisecond grid, so timestamps repeat and meet the kinect ones.
+    Some samples have no gaze data and some have a zero gaze vector."""
+    timestamps = np.sort(rng.integers(0, 3000, count)) * 10**-3
+    direction = np.array([0.1, -0.2, 1.0])
+    samples = []
+    for timestamp in timestamps.tolist():
+        kind = rng.random()
+        if kind < 0.03:
+            samples.append({"type": "gaze", "timestamp": timestamp, "data": {}})
+        elif kind < 0.06:
+            samples.append({"type": "gaze", "timestamp": timestamp, "data": {"gaze3d": [0.0, 0.0, 0.0]}})
+        else:
+            gaze3d = (direction + rng.normal(0, noise, 3)) * rng.uniform(0.5, 2)
+            samples.append({"type": "gaze", "timestamp": timestamp, "data": {"gaze3d": gaze3d.tolist()}})
+    return samples
+
+
+def make_kinect_names(rng, samples: list, count: int) -> list:
+    """Function returning kinect timestamps in microseconds, half of them on a gaze timestamp"""
+    names = rng.integers(0, 3_000_000, count).tolist()
+    names += [int(round(sample["timestamp"] * 10**6)) for sample in rng.choice(samples, count)]
+    return sorted(set(names))
+
+
+def per_frame_decisions(samples: list, kinect_names: list, thresholds: GazeThresholds) -> list:
+    """Function validating every kinect frame on the merged timeline, the way the frame processor did before"""
+    frame = FrameData("", "", thresholds)
+    decisions = []
+    gaze = ((sample["timestamp"], SOURCE_GAZE, sample) for sample in samples)
+    for timestamp, source, payload in merge_sources(gaze, kinect_events(kinect_names)):
+        if source == SOURCE_GAZE:
+            frame.update_glasses_gaze(payload)
+        else:
+            frame.update_kinect_image(payload)
+            decisions.append(frame.validate_sample())
+    return decisions
+
+
+def batch_decisions(samples: list, kinect_names: list, thresholds: GazeThresholds) -> list:
+    timestamps = np.array([sample["timestamp"] for sample in samples])
+    valid = np.array([bool(sample["data"]) for sample in samples])
+    gaze3d = np.array([sample["data"]["gaze3d"] if sample["data"] else [0, 0, 0] for sample in samples], dtype=float)
+    return validate_gaze_windows(np.array(kinect_names, dtype=float) * KINECT_MUL, timestamps, gaze3d, valid,
+                                 thresholds.gaze_time_threshold, thresholds.gaze_time_epsilon,
+                                 thresholds.gaze_distance_epsilon, thresholds.variance_epsilon).tolist()
+
+
+def window_statistics(samples: list, kinect_names: list, time_threshold: float) -> list:
+    """Function returning the (distance, variance) of every complete kinect frame window, as validate_gaze_window computes them"""
+    timestamps = np.array([sample["timestamp"] for sample in samples])
+    start, end = find_gaze_windows(np.array(kinect_names, dtype=float) * KINECT_MUL, timestamps, time_threshold)
+    statistics = []
+    for first, last in zip(start.tolist(), end.tolist()):
+        window = samples[first:last]
+        if not window or not all(sample["data"] for sample in window):
+            continue
+        direction_list = [normalize(np.array(sample["data"]["gaze3d"], dtype=float)) for sample in window]
+        sum_gaze = np.zeros(3)
+        for gaze in direction_list:
+            sum_gaze += gaze
+        mean_gaze = np.divide(sum_gaze, len(direction_list))
+        statistics.append((np.linalg.norm(mean_gaze - direction_list[-1]), np.var(direction_list)))
+    return statistics
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_windows_match_per_frame_validation(seed):
+    rng = np.random.default_rng(seed)
+    samples = make_samples(rng, 400, noise=rng.choice([0.01, 0.05, 0.2]))
+    kinect_names = make_kinect_names(rng, samples, 60)
+    thresholds = GazeThresholds(gaze_time_threshold=rng.choice([0.05, 0.1, 0.25]), gaze_time_epsilon=rng.choice([0.01, 0.05]),
+                                gaze_distance_epsilon=rng.uniform(0.01, 0.3), variance_epsilon=rng.uniform(0.2, 0.3))
+    assert batch_decisions(samples, kinect_names, thresholds) == per_frame_decisions(samples, kinect_names, thresholds)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_near_threshold_windows_match_per_frame_validation(seed):
+    rng = np.random.default_rng(100 + seed)
+    samples = make_samples(rng, 400, noise=0.05)
+    kinect_names = make_kinect_names(rng, samples, 60)
+    statistics = window_statistics(samples, kinect_names, 0.1)
+    assert statistics
+    # thresholds set to the exact statistics of a window, and one step below and above them
+    for distance, variance in [statistics[i] for i in rng.choice(len(statistics), 5)]:
+        for distance_epsilon, variance_epsilon in [(distance, 1), (1, variance), (distance, variance),
+                                                   (np.nextafter(distance, 0), 1), (1, np.nextafter(variance, 0)),
+                                                   (np.nextafter(distance, 1), np.nextafter(variance, 1))]:
+            thresholds = GazeThresholds(gaze_time_threshold=0.1, gaze_time_epsilon=0.05,
+                                        gaze_distance_epsilon=float(distance_epsilon), variance_epsilon=float(variance_epsilon))
+            assert batch_decisions(samples, kinect_names, thresholds) == per_frame_decisions(samples, kinect_names, thresholds)
@@ -0,0 +1,76 @@
+"""Tests of the glasses recording downloads, served by the glasses stand-in"""
+import os
+
+import pytest
+
+from glasses_stand_in import GlassesStandIn
+from custom_made_libs import recording_downloader
+from custom_made_libs.recording_downloader import GLASSES_ARTIFACTS, download_recording
+
+RECORDING_NAME = "0b4c31e5-recording"
+
+
+@pytest.fixture
+def recordings_dir(tmp_path):
+    """Folder of recordings with a single recording of random files"""
+    recording_dir = tmp_path / "glasses" / RECORDING_NAME
+    recording_dir.mkdir(parents=True)
+    for i, file_name in enumerate(GLASSES_ARTIFACTS):
+        (recording_dir / file_name).write_bytes(os.urandom(350000 + 1000 * i))
+    return tmp_path / "glasses"
+
+
+def assert_same_files(recordings_dir, directory):
+    for file_name in GLASSES_ARTIFACTS:
+        assert (directory / file_name).read_bytes() == (recordings_dir / RECORDING_NAME / file_name).read_bytes()
+        assert not (directory / (file_name + ".part")).exists()
+
+
+def test_download_recording_is_byte_identical(recordings_dir, tmp_path):
+    directory = tmp_path / "download"
+    directory.mkdir()
+    with GlassesStandIn(str(recordings_dir)) as stand_in:
+        results = download_recording(RECORDING_NAME, stand_in.http_url, str(directory), chunk_size=4096)
+    assert all(results.values())
+    assert set(results) == set(GLASSES_ARTIFACTS) | {"start_timestamp.txt"}
+    assert_same_files(recordings_dir, directory)
+    assert (directory / "start_timestamp.txt").exists()
+
+
+def test_dropped_download_is_resumed(recordings_dir, tmp_path, monkeypatch, capsys):
+    directory = tmp_path / "download"
+    directory.mkdir()
+    pauses = []
+    monkeypatch.setattr(recording_downloader.time, "sleep", pauses.append)
+    with GlassesStandIn(str(recordings_dir), cut_after=100000) as stand_in:
+        results = download_recording(RECORDING_NAME, stand_in.http_url, str(directory), chunk_size=4096)
+    assert all(results.values())
+    assert_same_files(recordings_dir, directory)
+    # every file was cut three times, and each try got further so the pause never grew
+    assert len(pauses) == 3 * len(GLASSES_ARTIFACTS)
+    assert set(pauses) == {recording_downloader.DOWNLOAD_BACKOFF}
+    assert "download failed" in capsys.readouterr().out
+
+
+def test_complete_download_is_not_fetched_again(recordings_dir, tmp_path, monkeypatch):
+    directory = tmp_path / "download"
+    directory.mkdir()
+    with GlassesStandIn(str(recordings_dir)) as stand_in:
+        download_recording(RECORDING_NAME, stand_in.http_url, str(directory))
+        for file_name in GLASSES_ARTIFACTS:
+            os.utime(directory / file_name, (1000000000, 1000000000))
+        probes = []
+        probe = recording_downloader.is_downloaded
+
+        def is_downloaded(session, url, path):
+            probes.append(probe(session, url, path))
+            return probes[-1]
+
+        monkeypatch.setattr(recording_downloader, "is_downloaded", is_downloaded)
+        results = download_recording(RECORDING_NAME, stand_in.http_url, str(directory))
+    assert all(results.values())
+    # the glasses answered 416 to a range after the last byte, and the files were left as they were
+    assert probes == [True] * len(GLASSES_ARTIFACTS)
+    for file_name in GLASSES_ARTIFACTS:
+        assert os.path.getmtime(directory / file_name) == 1000000000
+    assert_same_files(recordings_dir, directory)